@@ -0,0 +1,47 @@
+"""
+Checks the request coalescing of AsyncTTLCache: concurrent misses on one key
+share a single load, and cancelling one of the coalesced callers (a tool call
+hitting its deadline, a disconnected SSE client) leaves the others with the
+loaded value instead of a CancelledError.
+
+Usage:
+    python -m adhoc.bench_async_cache [CALLERS] [LOAD_LATENCY]
+"""
+import asyncio
+import sys
+import time
+
+from utils.async_cache import AsyncTTLCache
+
+
+async def run(callers: int, latency: float):
+    loads = 0
+
+    async def loader():
+        nonlocal loads
+        loads += 1
+        await asyncio.sleep(latency)
+        return "details"
+
+    cache = AsyncTTLCache(ttl=60)
+    start = time.perf_counter()
+    values = await asyncio.gather(*(cache.get("api", loader) for _ in range(callers)))
+    print(f"{callers} concurrent misses: {loads} load(s), {time.perf_counter() - start:.3f}s, stats {cache.stats()}")
+    assert loads == 1 and set(values) == {"details"}
+
+    # The first caller starts the load and is cancelled; the second only waits on it.
+    cache, loads = AsyncTTLCache(ttl=60), 0
+    first = asyncio.create_task(cache.get("api", loader))
+    await asyncio.sleep(0)
+    second = asyncio.create_task(cache.get("api", loader))
+    await asyncio.sleep(latency / 2)
+    first.cancel()
+    value = await second
+    print(f"first caller cancelled: first {'cancelled' if first.cancelled() else 'done'}, "
+          f"second got {value!r}, {loads} load(s), cached {await cache.get('api', loader)!r}")
+    assert first.cancelled() and value == "details" and loads == 1
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    asyncio.run(run(int(args[0]) if args else 50, float(args[1]) if len(args) > 1 else 0.05))
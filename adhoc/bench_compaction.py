@@ -0,0 +1,113 @@
+"""
+Measures how much compact_tool_result shrinks tool results before they go back
+to Gemini.
+
+Usage:
+    python -m adhoc.bench_compaction [PAYLOAD_DIR] [MAX_TOKENS]
+
+PAYLOAD_DIR holds recorded tool responses, one raw response body per file
+(e.g. captured from the digital-content or settings servers). Without it the
+benchmark uses generated payloads shaped like those responses.
+
+Every column/row table left in a compacted result is checked to still have as
+many values per row as it has columns.
+"""
+import base64
+import json
+import random
+import sys
+import time
+from pathlib import Path
+
+from utils.compaction import compact_tool_result, estimate_tokens
+
+
+def sample_payloads():
+    rng = random.Random(7)
+    listing = {
+        "data": {
+            "content": [
+                {
+                    "digitalContentId": f"{rng.getrandbits(96):024x}",
+                    "versionedContentId": f"{rng.getrandbits(96):024x}",
+                    "name": f"Payments API {i}",
+                    "contentType": "API",
+                    "status": "PUBLISHED",
+                    "description": "Create and track payments across channels." if i % 3 else None,
+                    "tags": ["payments", "finance"] if i % 2 else [],
+                    "logo": None,
+                    "fileContent": base64.b64encode(rng.randbytes(6000)).decode(),
+                    "createdAt": "2025-05-12T09:31:22Z",
+                    "updatedBy": "",
+                }
+                for i in range(40)
+            ],
+            "totalElements": 40,
+            "pageable": {"pageNumber": 0, "pageSize": 40, "sort": None},
+        },
+        "error": None,
+    }
+    settings = {
+        "data": {
+            "organisationId": "org-123",
+            "theme": {
+                "primaryColor": "#1D4ED8",
+                "secondaryColor": "#F59E0B",
+                "font": "Inter",
+                "logo": "data:image/png;base64," + base64.b64encode(rng.randbytes(20000)).decode(),
+                "favicon": base64.b64encode(rng.randbytes(2000)).decode(),
+            },
+            "menus": [
+                {"label": f"Menu {i}", "route": f"/menu/{i}", "icon": None, "visible": True, "children": []}
+                for i in range(25)
+            ],
+            "footer": {"links": [], "text": ""},
+        }
+    }
+    # Wider than it is long: the rows, not the columns, have to be cut.
+    wide_table = [{f"field_{key:02d}": f"value {row}-{key}" for key in range(60)} for row in range(40)]
+    return {
+        "digital_content_listing": json.dumps(listing),
+        "ui_customisation_settings": json.dumps(settings),
+        "wide_table": json.dumps(wide_table),
+    }
+
+
+def misaligned_tables(value):
+    """Tables in a compacted result whose rows do not have one value per column."""
+    if isinstance(value, dict):
+        if value.keys() == {"columns", "rows"}:
+            rows = [row for row in value["rows"] if not (isinstance(row, str) and row.startswith("<truncated "))]
+            return int(any(len(row) != len(value["columns"]) for row in rows))
+        return sum(misaligned_tables(item) for item in value.values())
+    if isinstance(value, list):
+        return sum(misaligned_tables(item) for item in value)
+    return 0
+
+
+def load_payloads(directory):
+    return {path.name: path.read_text() for path in sorted(Path(directory).iterdir()) if path.is_file()}
+
+
+def run(payloads, max_tokens):
+    total_before = total_after = 0
+    print(f"{'payload':40} {'tokens before':>14} {'tokens after':>13} {'reduction':>10} {'ms':>8} {'tables':>9}")
+    for name, raw in payloads.items():
+        start = time.perf_counter()
+        compacted = compact_tool_result(raw, max_tokens=max_tokens)
+        elapsed = (time.perf_counter() - start) * 1000
+        before, after = estimate_tokens(raw), estimate_tokens(compacted)
+        total_before += before
+        total_after += after
+        try:
+            tables = "misaligned" if misaligned_tables(json.loads(compacted)) else "aligned"
+        except ValueError:
+            tables = "cut"
+        print(f"{name:40} {before:>14} {after:>13} {1 - after / before:>9.1%} {elapsed:>8.2f} {tables:>9}")
+    print(f"{'total':40} {total_before:>14} {total_after:>13} {1 - total_after / total_before:>9.1%}")
+
+
+if __name__ == "__main__":
+    payloads = load_payloads(sys.argv[1]) if len(sys.argv) > 1 else sample_payloads()
+    max_tokens = int(sys.argv[2]) if len(sys.argv) > 2 else 4000
+    run(payloads, max_tokens)
@@ -0,0 +1,67 @@
+"""
+Exercises ContextCacheManager against the in-memory LocalCaches backend:
+first call misses and goes out uncached while the entry is created in the
+background, repeats hit, near-expiry entries are renewed, a catalog change
+rebuilds, and prompts the backend refuses to cache go out uncached.
+
+Usage:
+    python -m adhoc.bench_context_cache
+"""
+import asyncio
+
+from google.genai import types
+
+from services.context_cache import ContextCacheManager, LocalCaches
+from services.mcp_client import MODEL_NAME, SYSTEM_PROMPT
+
+
+def make_tools(*names):
+    return [
+        types.Tool(function_declarations=[{"name": name, "description": f"Tool {name}", "parameters": {"type": "object"}}])
+        for name in names
+    ]
+
+
+async def run():
+    caches = LocalCaches()
+    manager = ContextCacheManager(caches, model=MODEL_NAME, ttl=2, renew_margin=1)
+    catalog = make_tools("getAllRoles", "getAppVersion")
+
+    assert manager.get(SYSTEM_PROMPT, catalog) is None
+    assert manager.get(SYSTEM_PROMPT, catalog) is None
+    await manager.settle()
+    first = manager.get(SYSTEM_PROMPT, catalog)
+    for _ in range(10):
+        assert manager.get(SYSTEM_PROMPT, catalog) == first
+    print("after 13 calls:", manager.stats())
+    assert manager.stats()["misses"] == 2 and manager.stats()["hits"] == 11 and caches.created == 1
+
+    await asyncio.sleep(1.2)
+    assert manager.get(SYSTEM_PROMPT, catalog) == first
+    await manager.settle()
+    print("after renewal:", manager.stats())
+    assert manager.stats()["renewals"] == 1
+
+    assert manager.get(SYSTEM_PROMPT, catalog + make_tools("getAllVisibilities")) is None
+    await manager.invalidate()
+    await manager.settle()
+    assert first not in caches.contents and len(caches.contents) == 0
+    extended = catalog + make_tools("getAllVisibilities", "getAllRoles2")
+    assert manager.get(SYSTEM_PROMPT, extended) is None
+    await manager.settle()
+    rebuilt = manager.get(SYSTEM_PROMPT, extended)
+    assert rebuilt and rebuilt != first
+    print("after catalog change:", manager.stats())
+
+    refused = ContextCacheManager(LocalCaches(min_chars=10 ** 6), model=MODEL_NAME, max_entries=4)
+    for index in range(10):
+        assert refused.get(SYSTEM_PROMPT, make_tools(f"tool{index}")) is None
+        await refused.settle()
+    assert refused.get(SYSTEM_PROMPT, make_tools("tool9")) is None
+    await refused.settle()
+    print("below minimum size:", refused.stats())
+    assert refused.stats()["failures"] == 10 and len(refused._uncacheable) == 4
+
+
+if __name__ == "__main__":
+    asyncio.run(run())
@@ -0,0 +1,87 @@
+"""
+Compares the old blocking `requests` calls against the pooled DSHAdminClient
+on a local aiohttp stub of the DSH admin API.
+
+The stub adds STUB_LATENCY seconds per request and counts the TCP connections
+it accepts, so the output shows both throughput and connection reuse.
+
+Usage:
+    python -m adhoc.bench_dsh_client [N] [STUB_LATENCY]
+"""
+import asyncio
+import sys
+import time
+
+import requests
+from aiohttp import web
+
+from utils.dsh_apis import DSHAdminClient
+
+DETAIL_PATH = "/api/v1/digital-content/detail"
+CREDENTIALS_PATH = "/api/v1/digital-content/apis/fetch-credentials"
+
+
+async def start_stub(latency: float):
+    peers = set()
+
+    async def detail(request):
+        peers.add(request.transport.get_extra_info("peername"))
+        await asyncio.sleep(latency)
+        return web.json_response({"data": {"digitalContentModel": {"name": "Stub API", "contentType": "API"}}})
+
+    async def credentials(request):
+        peers.add(request.transport.get_extra_info("peername"))
+        await asyncio.sleep(latency)
+        return web.json_response({"data": {"productCredentials": [{"clientId": "stub-client-id"}]}})
+
+    app = web.Application()
+    app.router.add_get(DETAIL_PATH, detail)
+    app.router.add_post(CREDENTIALS_PATH, credentials)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    return runner, f"http://127.0.0.1:{port}", peers
+
+
+def blocking_call(base_url: str):
+    requests.get(f"{base_url}{DETAIL_PATH}?digitalContentId=d&versionedContentId=v", headers={"apikey": "k"}).json()
+    requests.post(f"{base_url}{CREDENTIALS_PATH}", headers={"apikey": "k"},
+                  json={"emailId": "bench@example.com", "apiVersionedContentId": "v"}).json()
+
+
+async def run(n: int, latency: float):
+    runner, base_url, peers = await start_stub(latency)
+    try:
+        # Baseline: what call_tool did before, blocking calls made one after another.
+        start = time.perf_counter()
+        for _ in range(n):
+            await asyncio.to_thread(blocking_call, base_url)
+        blocking = time.perf_counter() - start
+        blocking_connections = len(peers)
+        peers.clear()
+
+        client = DSHAdminClient(base_url=base_url)
+
+        async def pooled_call():
+            await client.request("GET", f"{DETAIL_PATH}?digitalContentId=d&versionedContentId=v", headers={"apikey": "k"})
+            await client.fetch_credentials("bench@example.com", "v", apikey="k")
+
+        start = time.perf_counter()
+        await asyncio.gather(*(pooled_call() for _ in range(n)))
+        pooled = time.perf_counter() - start
+        pooled_connections = len(peers)
+        await client.close()
+    finally:
+        await runner.cleanup()
+
+    print(f"{n} tool-call lookups (2 admin requests each) at {latency * 1000:.0f}ms stub latency")
+    print(f"blocking requests: {blocking:.3f}s, {blocking_connections} connections")
+    print(f"pooled async client: {pooled:.3f}s, {pooled_connections} connections (speedup {blocking / pooled:.1f}x)")
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    latency = float(sys.argv[2]) if len(sys.argv) > 2 else 0.02
+    asyncio.run(run(n, latency))
@@ -0,0 +1,82 @@
+"""
+Compares generated servers run over stdio (one interpreter each) with the same
+servers imported into this process (SERVER_TRANSPORT=memory): time to start
+each server, resident memory added by starting them, and per-call latency.
+
+Memory and spawn time are measured on the real scripts in generated_servers/
+(their tools call the DSH APIs, so they are not called). Call latency is
+measured on one fake server from adhoc.bench_server_startup whose tool answers
+locally, with CALLS sequential calls through MCPClient.call_tool and through
+the session alone. Each transport runs in a fresh interpreter so one does not
+inherit the other's imports.
+
+Usage:
+    python -m adhoc.bench_in_process [CALLS]
+"""
+import asyncio
+import glob
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import services.server_handle as server_handle_module
+from adhoc.bench_server_startup import SERVER_SCRIPT
+from services.mcp_client import MCPClient
+from services.server_handle import process_rss
+
+
+def total_rss_mb(mcp_client):
+    children = sum(state["rss_bytes"] or 0 for state in mcp_client.server_states())
+    return (process_rss(os.getpid()) + children) / 2 ** 20
+
+
+async def run_transport(transport, calls):
+    server_handle_module.SERVER_TRANSPORT = transport
+    mcp_client = MCPClient()
+    mcp_client.default_servers.append("v0_d0")
+    with tempfile.TemporaryDirectory() as directory:
+        bench_script = os.path.join(directory, "bench_0_server.py")
+        with open(bench_script, "w") as script_file:
+            script_file.write(SERVER_SCRIPT.format(name="v0_d0", index=0, import_delay=0))
+        try:
+            baseline = total_rss_mb(mcp_client)
+            spawns = []
+            start = time.perf_counter()
+            for path in sorted(glob.glob("generated_servers/*.py")) + [bench_script]:
+                timings = {}
+                ok, error = await mcp_client.connect_to_server(path, timings=timings)
+                assert ok, error
+                spawns.append(timings["start_s"] * 1000)
+            startup_s = time.perf_counter() - start
+            added = total_rss_mb(mcp_client) - baseline
+
+            client_ms, session_ms = [], []
+            session = mcp_client.server_handles["v0_d0"].session
+            for _ in range(calls):
+                step = time.perf_counter()
+                await mcp_client.call_tool("list_0", {"limit": 3}, "bench-user")
+                client_ms.append((time.perf_counter() - step) * 1000)
+                step = time.perf_counter()
+                await session.call_tool("list_0", {"limit": 3})
+                session_ms.append((time.perf_counter() - step) * 1000)
+
+            print(f"{transport:<6} {len(spawns)} servers, {len(mcp_client.registry.snapshot)} tools, "
+                  f"startup {startup_s:5.2f}s, spawn median {statistics.median(spawns):7.1f} ms, "
+                  f"+{added:6.1f} MB RSS ({added / len(spawns):5.1f} MB per server)")
+            print(f"{transport:<6} call median {statistics.median(client_ms):5.2f} ms via call_tool, "
+                  f"{statistics.median(session_ms):5.2f} ms on the session")
+        finally:
+            await mcp_client.cleanup()
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    calls = int(args[0]) if args else 200
+    if len(args) > 1:
+        asyncio.run(run_transport(args[1], calls))
+    else:
+        for transport in server_handle_module.TRANSPORTS:
+            subprocess.run([sys.executable, "-m", "adhoc.bench_in_process", str(calls), transport], check=True)
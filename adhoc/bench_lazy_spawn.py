@@ -0,0 +1,88 @@
+"""
+Compares eager and lazy (SERVER_SPAWN_MODE=lazy) startup on the fake bucket of
+adhoc.bench_server_startup: startup time, resident memory of the server
+processes, first-call latency of an idle server, and how many processes
+CONCURRENT simultaneous first calls to one idle server spawn.
+
+The fake bucket starts without tool manifests: the eager run lists every
+server's tools and writes its manifest back, which is what the lazy run
+registers tools from.
+
+Usage:
+    python -m adhoc.bench_lazy_spawn [SERVERS] [CALLED_SERVERS] [CONCURRENT] [IMPORT_DELAY]
+"""
+import asyncio
+import statistics
+import sys
+import tempfile
+import time
+
+import services.mcp_client as mcp_client_module
+from adhoc.bench_server_startup import FakeStorage
+from services.mcp_client import MCPClient
+from services.script_cache import ScriptCache
+
+
+def total_rss_mb(mcp_client):
+    return sum(state["rss_bytes"] or 0 for state in mcp_client.server_states()) / 2 ** 20
+
+
+def processes(mcp_client):
+    return sum(1 for handle in mcp_client.server_handles.values() if handle.running)
+
+
+async def timed_call(mcp_client, tool_name):
+    start = time.perf_counter()
+    response = await mcp_client.call_tool(tool_name, {"limit": 3}, "bench-user")
+    assert response.response.startswith("[0, 1, 2]"), response.response
+    return (time.perf_counter() - start) * 1000
+
+
+async def run_mode(mode, servers, called, concurrent, storage, cache_dir):
+    mcp_client_module.SERVER_SPAWN_MODE = mode
+    mcp_client = MCPClient()
+    mcp_client.script_cache = ScriptCache(cache_dir)
+    mcp_client._storage_client = storage
+    # Registered as default servers so calls skip the DSH admin API lookups.
+    mcp_client.default_servers.extend(f"v{index}_d{index}" for index in range(servers))
+    try:
+        start = time.perf_counter()
+        await mcp_client.reconcile_servers(bucket_name="bench-bucket")
+        startup_s = time.perf_counter() - start
+        print(f"{mode:<5} startup {startup_s:6.2f}s, {len(mcp_client.registry.snapshot)} tools, "
+              f"{processes(mcp_client)} processes, {total_rss_mb(mcp_client):7.1f} MB RSS")
+
+        first = [await timed_call(mcp_client, f"list_{index}") for index in range(called)]
+        warm = [await timed_call(mcp_client, f"list_{index}") for index in range(called) for _ in range(5)]
+        print(f"{mode:<5} first call median {statistics.median(first):8.1f} ms, "
+              f"warm call median {statistics.median(warm):6.1f} ms")
+
+        index = called
+        if index < servers:
+            before = processes(mcp_client)
+            latencies = await asyncio.gather(*(timed_call(mcp_client, f"list_{index}") for _ in range(concurrent)))
+            print(f"{mode:<5} {concurrent} concurrent first calls to v{index}_d{index}: "
+                  f"{processes(mcp_client) - before} process(es) spawned, max {max(latencies):.1f} ms")
+        print(f"{mode:<5} steady state after calling {min(index + 1, servers)}/{servers} servers: "
+              f"{processes(mcp_client)} processes, {total_rss_mb(mcp_client):7.1f} MB RSS")
+    finally:
+        await mcp_client.cleanup()
+
+
+async def run(servers, called, concurrent, import_delay):
+    mcp_client_module.SERVER_STARTUP_TIMEOUT = 30
+    storage = FakeStorage(servers, 0.0, import_delay)
+    del storage.bucket("bench-bucket").blobs["bench_broken_server.py"]
+    with tempfile.TemporaryDirectory() as cache_dir:
+        await run_mode("eager", servers, called, concurrent, storage, cache_dir)
+        await run_mode("lazy", servers, called, concurrent, storage, cache_dir)
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    asyncio.run(run(
+        int(args[0]) if len(args) > 0 else 8,
+        int(args[1]) if len(args) > 1 else 2,
+        int(args[2]) if len(args) > 2 else 10,
+        float(args[3]) if len(args) > 3 else 0.0,
+    ))
@@ -0,0 +1,114 @@
+"""
+Offline load test of the full query loop: the scripted LLM backend, a local
+stdio MCP server and in-memory (or real Mongo) session persistence.
+
+Each query makes the model call a tool on the local server and then answer, so
+every request goes through tool selection, dispatch, compaction and history.
+
+Usage:
+    python -m adhoc.bench_load [USERS] [QUERIES_PER_USER] [LLM_LATENCY] [--mongo]
+
+With --mongo, sessions are written to MONGO_DB_URI instead of memory.
+"""
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+import httpx
+
+from adhoc.bench_query_concurrency import MemorySessions
+from main import app
+from services.llm import ScriptedBackend
+from services.mcp_client import MCPClient
+
+SERVER_SCRIPT = '''
+import asyncio
+import json
+from mcp.server.fastmcp import FastMCP
+
+mcp = FastMCP("load-server")
+
+
+@mcp.tool()
+async def listRoles(limit: int = 10) -> str:
+    """Lists the roles defined in the tenant."""
+    await asyncio.sleep(0.05)
+    return json.dumps([{"id": i, "name": f"role-{i}", "description": None} for i in range(limit)])
+
+
+if __name__ == "__main__":
+    mcp.run(transport="stdio")
+'''
+
+SCENARIOS = [
+    {
+        "match": "roles",
+        "turns": [
+            {"function_calls": [{"name": "listRoles", "args": {"limit": 25}}]},
+            {"text": "There are 25 roles, named role-0 through role-24."}
+        ]
+    },
+    {"turns": [{"text": "I can help with roles."}]}
+]
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(int(len(values) * pct), len(values) - 1)]
+
+
+async def run(users: int, queries: int, latency: float, use_mongo: bool):
+    backend = ScriptedBackend(scenarios=SCENARIOS, latency=latency, token_latency=0.0)
+    mcp_client = MCPClient(llm=backend)
+    if not use_mongo:
+        mcp_client.sessions_collection = mcp_client.history.collection = MemorySessions()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        script_path = os.path.join(tmp, "load_server.py")
+        with open(script_path, "w") as script_file:
+            script_file.write(SERVER_SCRIPT)
+        connected, error = await mcp_client.connect_to_server(script_path)
+        assert connected, error
+        mcp_client.default_servers.append("load-server")
+        app.state.mcp_client = mcp_client
+
+        latencies = []
+        failures = 0
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+            async def user(u):
+                nonlocal failures
+                for q in range(queries):
+                    start = time.perf_counter()
+                    response = await client.post(
+                        "/query",
+                        json={"message": f"list the roles please ({q})", "consent": True},
+                        headers={"email": f"user{u}@example.com", "session_id": f"load-{u}"},
+                    )
+                    latencies.append(time.perf_counter() - start)
+                    if response.status_code != 200 or "role-24" not in response.text:
+                        failures += 1
+
+            start = time.perf_counter()
+            await asyncio.gather(*(user(u) for u in range(users)))
+            elapsed = time.perf_counter() - start
+
+        await mcp_client.cleanup()
+
+    total = users * queries
+    print(f"{total} queries from {users} users in {elapsed:.2f}s ({total / elapsed:.1f} queries/s)")
+    print(f"latency p50 {statistics.median(latencies) * 1000:.0f}ms, "
+          f"p95 {percentile(latencies, 0.95) * 1000:.0f}ms, max {max(latencies) * 1000:.0f}ms")
+    print(f"LLM calls: {backend.calls}, failures: {failures}")
+    assert failures == 0, f"{failures} queries did not complete the tool round trip"
+
+
+if __name__ == "__main__":
+    args = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+    users = int(args[0]) if len(args) > 0 else 10
+    queries = int(args[1]) if len(args) > 1 else 5
+    latency = float(args[2]) if len(args) > 2 else 0.2
+    asyncio.run(run(users, queries, latency, "--mongo" in sys.argv))
@@ -0,0 +1,82 @@
+"""
+Fires N parallel /query requests at the app with a scripted backend that takes
+LLM_LATENCY seconds per call, and checks they complete in roughly the time of one.
+
+Usage:
+    python -m adhoc.bench_query_concurrency [N] [LLM_LATENCY]
+"""
+import asyncio
+import sys
+import time
+
+import httpx
+
+from main import app
+from services.llm import ScriptedBackend
+from services.mcp_client import MCPClient
+
+
+class MemorySessions:
+    def __init__(self):
+        self.docs = {}
+
+    async def find_one(self, query, projection=None):
+        doc = self.docs.get(query["session_id"])
+        if doc is not None and "messages.0" in query and not doc.get("messages"):
+            return None
+        if doc is None or not projection:
+            return doc
+        # Only the projections HistoryManager uses: $slice on an array and the $size of messages.
+        projected = dict(doc)
+        for field, spec in projection.items():
+            if isinstance(spec, dict) and "$slice" in spec:
+                values, bounds = doc.get(field, []), spec["$slice"]
+                if isinstance(bounds, int):
+                    projected[field] = values[bounds:] if bounds < 0 else values[:bounds]
+                else:
+                    projected[field] = values[bounds[0]:bounds[0] + bounds[1]]
+            elif isinstance(spec, dict) and "$size" in spec:
+                projected[field] = len(doc.get("messages", []))
+        return projected
+
+    async def update_one(self, query, update, upsert=False):
+        doc = self.docs.setdefault(query["session_id"], {"session_id": query["session_id"]})
+        for field, value in update.get("$push", {}).items():
+            doc.setdefault(field, []).append(value)
+        doc.update(update.get("$set", {}))
+        for field, value in update.get("$addToSet", {}).items():
+            values = doc.setdefault(field, [])
+            values.extend(item for item in value["$each"] if item not in values)
+
+
+async def run(n: int, latency: float):
+    mcp_client = MCPClient(llm=ScriptedBackend(latency=latency))
+    mcp_client.sessions_collection = mcp_client.history.collection = MemorySessions()
+    app.state.mcp_client = mcp_client
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        async def one(i):
+            response = await client.post(
+                "/query",
+                json={"message": f"question {i}", "consent": True},
+                headers={"email": "bench@example.com", "session_id": f"bench-{i}"},
+            )
+            response.raise_for_status()
+
+        start = time.perf_counter()
+        await one(-1)
+        single = time.perf_counter() - start
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(n)))
+        parallel = time.perf_counter() - start
+
+    print(f"1 request: {single:.3f}s, {n} parallel requests: {parallel:.3f}s (ratio {parallel / single:.2f})")
+    assert parallel < single * 2, "parallel /query requests are being serialized on the event loop"
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    latency = float(sys.argv[2]) if len(sys.argv) > 2 else 0.5
+    asyncio.run(run(n, latency))
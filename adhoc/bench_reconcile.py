@@ -0,0 +1,66 @@
+"""
+Times reconcile_servers against a cold start, on the fake bucket of
+adhoc.bench_server_startup.
+
+Starts SERVERS fake servers, then deletes one blob, changes another and
+reconciles after each step, checking that only the affected server is
+stopped or restarted and that the others keep their processes.
+
+Usage:
+    python -m adhoc.bench_reconcile [SERVERS]
+"""
+import asyncio
+import sys
+import tempfile
+import time
+
+import services.mcp_client as mcp_client_module
+from adhoc.bench_server_startup import FakeBlob, FakeStorage, SERVER_SCRIPT
+from services.mcp_client import MCPClient
+from services.script_cache import ScriptCache
+
+
+def summary(report):
+    return (f"{report['started']} started, {report['stopped']} stopped, {report['unchanged']} unchanged, "
+            f"{report['failed']} failed, {report['downloads']} downloads")
+
+
+async def run(servers: int):
+    mcp_client_module.SERVER_STARTUP_TIMEOUT = 5
+    with tempfile.TemporaryDirectory() as cache_dir:
+        mcp_client = MCPClient()
+        mcp_client.script_cache = ScriptCache(cache_dir)
+        storage = mcp_client._storage_client = FakeStorage(servers, 0.0, 0.0)
+        blobs = storage.bucket("bench-bucket").blobs
+        del blobs["bench_broken_server.py"]
+        try:
+            start = time.perf_counter()
+            await mcp_client.reconcile_servers(bucket_name="bench-bucket")
+            print(f"cold start       {time.perf_counter() - start:7.3f}s  {summary(mcp_client.startup_report)}")
+            processes = {name: handle._task for name, handle in mcp_client.server_handles.items()}
+
+            start = time.perf_counter()
+            await mcp_client.reconcile_servers(bucket_name="bench-bucket")
+            print(f"no change        {time.perf_counter() - start:7.3f}s  {summary(mcp_client.startup_report)}")
+
+            del blobs["bench_0_server.py"]
+            start = time.perf_counter()
+            await mcp_client.reconcile_servers(bucket_name="bench-bucket")
+            print(f"delete one       {time.perf_counter() - start:7.3f}s  {summary(mcp_client.startup_report)}")
+
+            blobs["bench_1_server.py"] = FakeBlob(
+                "bench_1_server.py", SERVER_SCRIPT.format(name="v1_d1", index=1, import_delay=0) + "\n# v2\n", 0.0
+            )
+            start = time.perf_counter()
+            await mcp_client.reconcile_servers(bucket_name="bench-bucket")
+            print(f"change one       {time.perf_counter() - start:7.3f}s  {summary(mcp_client.startup_report)}")
+
+            kept = [name for name, handle in mcp_client.server_handles.items() if handle._task is processes.get(name)]
+            print(f"{len(kept)} of {len(mcp_client.server_handles)} servers kept their original process; "
+                  f"registry has {len(mcp_client.registry.snapshot)} tools")
+        finally:
+            await mcp_client.cleanup()
+
+
+if __name__ == "__main__":
+    asyncio.run(run(int(sys.argv[1]) if len(sys.argv) > 1 else 10))
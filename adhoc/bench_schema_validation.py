@@ -0,0 +1,104 @@
+"""
+Measures local argument validation against the round trip it replaces.
+
+Connects to a local stdio MCP server, compiles the validators of its tools the
+way add_tools does, then compares:
+  - validating a call locally (valid, coerced and invalid arguments),
+  - sending the invalid call to the server and waiting for its error.
+
+Usage:
+    python -m adhoc.bench_schema_validation [N]
+"""
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+from services.mcp_client import MCPClient
+
+SERVER_SCRIPT = '''
+from typing import List, Optional, Union
+from mcp.server.fastmcp import FastMCP
+
+mcp = FastMCP("validation-server")
+
+
+@mcp.tool()
+async def listUsers(limit: int = 10, active: bool = True, roles: Optional[List[str]] = None,
+                    API_KEY: Optional[str] = None) -> str:
+    """Lists the users of the tenant."""
+    return "[]"
+
+
+@mcp.tool()
+async def getUser(user_id: str, include_roles: bool = False, API_KEY: Optional[str] = None) -> str:
+    """Gets one user."""
+    return "{}"
+
+
+@mcp.tool()
+async def findUser(key: Union[str, int], API_KEY: Optional[str] = None) -> str:
+    """Finds a user by name or numeric ID."""
+    return "{}"
+
+
+if __name__ == "__main__":
+    mcp.run(transport="stdio")
+'''
+
+CASES = {
+    "valid": ("listUsers", {"limit": 5, "active": True, "roles": ["admin"]}),
+    "coerced": ("listUsers", {"limit": 5.0, "active": "true", "roles": ["admin", 3]}),
+    "invalid": ("listUsers", {"limit": "many", "roles": "admin"}),
+    "missing": ("getUser", {"include_roles": True}),
+    # anyOf [string, integer]: an integer must not be turned into a string.
+    "union": ("findUser", {"key": 5}),
+}
+
+
+def timed_us(fn, n):
+    start = time.perf_counter()
+    for _ in range(n):
+        fn()
+    return (time.perf_counter() - start) / n * 1e6
+
+
+async def run(n: int):
+    mcp_client = MCPClient()
+    with tempfile.TemporaryDirectory() as tmp:
+        script_path = os.path.join(tmp, "validation_server.py")
+        with open(script_path, "w") as script_file:
+            script_file.write(SERVER_SCRIPT)
+        connected, error = await mcp_client.connect_to_server(script_path)
+        assert connected, error
+        snapshot = mcp_client.registry.snapshot
+        tools = [snapshot.get(name) for name in ("listUsers", "getUser")]
+
+        compile_us = timed_us(lambda: [type(tool)(tool.name, tool.server, tool.description, tool.parameters)
+                                       for tool in tools], 200) / len(tools)
+        print(f"compile (declaration + validator, per tool): {compile_us:8.1f} us")
+
+        for case, (name, arguments) in CASES.items():
+            tool = snapshot.get(name)
+            coerced, errors = tool.validate(arguments)
+            per_call = timed_us(lambda: tool.validate(arguments), n)
+            print(f"validate {case:<8} {per_call:8.2f} us/call  -> {errors or coerced}")
+        assert snapshot.get("findUser").validate({"key": 5})[0]["key"] == 5
+
+        # What an invalid call cost before: a round trip to the server to learn it was malformed.
+        session = mcp_client._session_for("listUsers")[0]
+        name, arguments = CASES["invalid"]
+        round_trips = []
+        for _ in range(min(n, 200)):
+            start = time.perf_counter()
+            result = await session.call_tool(name, arguments)
+            round_trips.append((time.perf_counter() - start) * 1e6)
+        print(f"server round trip for the invalid call: median {statistics.median(round_trips):8.1f} us, "
+              f"isError={result.isError}")
+        await mcp_client.cleanup()
+
+
+if __name__ == "__main__":
+    asyncio.run(run(int(sys.argv[1]) if len(sys.argv) > 1 else 10000))
@@ -0,0 +1,149 @@
+"""
+Times connect_to_servers_from_directory on fake server scripts, sequentially
+(concurrency 1, what startup used to do), with bounded concurrency, and once
+more as a warm restart that finds every script in the local script cache.
+
+The bucket is a local stand-in for GCS that serves generated FastMCP scripts
+with DOWNLOAD_LATENCY seconds per download. Each script sleeps IMPORT_DELAY
+seconds before serving, like the heavy imports of a generated server, and one
+script is broken to show that its failure does not hold up the others: a
+server that exits before answering initialize() is only noticed when
+SERVER_STARTUP_TIMEOUT (set to STARTUP_TIMEOUT here) runs out, and it holds
+one startup slot meanwhile.
+
+Usage:
+    python -m adhoc.bench_server_startup [SERVERS] [CONCURRENCY] [DOWNLOAD_LATENCY] [IMPORT_DELAY] [STARTUP_TIMEOUT]
+"""
+import asyncio
+import base64
+import hashlib
+import sys
+import tempfile
+import time
+
+import services.mcp_client as mcp_client_module
+from services.mcp_client import MCPClient
+from services.script_cache import ScriptCache
+
+SERVER_SCRIPT = '''
+import json
+import time
+from mcp.server.fastmcp import FastMCP
+
+time.sleep({import_delay})
+mcp = FastMCP("{name}")
+
+
+@mcp.tool()
+async def list_{index}(limit: int = 10) -> str:
+    """Lists the items of fake API {index}."""
+    return json.dumps(list(range(limit)))
+
+
+@mcp.tool()
+async def get_{index}(item_id: str) -> str:
+    """Gets one item of fake API {index}."""
+    return json.dumps({{"id": item_id}})
+
+
+if __name__ == "__main__":
+    mcp.run(transport="stdio")
+'''
+
+
+class FakeBlob:
+    def __init__(self, name, content, latency):
+        self.name = name
+        self.latency = latency
+        self.generation = 0
+        self.upload_from_string(content)
+
+    def download_as_bytes(self, if_generation_match=None):
+        time.sleep(self.latency)
+        return self.content
+
+    def upload_from_string(self, content, content_type=None):
+        self.content = content.encode("utf-8") if isinstance(content, str) else content
+        self.generation += 1
+        self.md5_hash = base64.b64encode(hashlib.md5(self.content).digest()).decode()
+
+
+class FakeBucket:
+    def __init__(self, blobs):
+        self.blobs = blobs
+
+    def list_blobs(self, prefix=None):
+        return [blob for name, blob in self.blobs.items() if not prefix or name.startswith(prefix)]
+
+    def blob(self, name):
+        if name not in self.blobs:
+            self.blobs[name] = FakeBlob(name, b"", 0.0)
+        return self.blobs[name]
+
+    def get_blob(self, name):
+        return self.blobs.get(name)
+
+
+class FakeStorage:
+    def __init__(self, servers: int, download_latency: float, import_delay: float):
+        blobs = {}
+        for index in range(servers):
+            name = f"v{index}_d{index}"
+            blobs[f"bench_{index}_server.py"] = FakeBlob(
+                f"bench_{index}_server.py",
+                SERVER_SCRIPT.format(name=name, index=index, import_delay=import_delay),
+                download_latency
+            )
+        blobs["bench_broken_server.py"] = FakeBlob("bench_broken_server.py", "raise SystemExit(1)\n", download_latency)
+        self._bucket = FakeBucket(blobs)
+
+    def bucket(self, name):
+        return self._bucket
+
+
+async def no_default_server(timings=None):
+    """Stands in for quickchart, which needs node_modules, the way FakeStorage stands in for the bucket."""
+    if timings is not None:
+        timings.update(ok=True, total_s=0.0)
+    return (True, "")
+
+
+async def startup(servers, concurrency, download_latency, import_delay, startup_timeout, cache_dir):
+    mcp_client_module.SERVER_STARTUP_CONCURRENCY = concurrency
+    mcp_client_module.SERVER_STARTUP_TIMEOUT = startup_timeout
+    mcp_client = MCPClient()
+    mcp_client.script_cache = ScriptCache(cache_dir)
+    mcp_client._storage_client = FakeStorage(servers, download_latency, import_delay)
+    mcp_client.connect_default_servers = no_default_server
+    try:
+        await mcp_client.connect_to_servers_from_directory(bucket_name="bench-bucket")
+        return mcp_client.startup_report, len(mcp_client.registry.snapshot)
+    finally:
+        await mcp_client.cleanup()
+
+
+async def run(servers, concurrency, download_latency, import_delay, startup_timeout):
+    with tempfile.TemporaryDirectory() as cold_dir, tempfile.TemporaryDirectory() as warm_dir:
+        runs = (("sequential", 1, cold_dir), ("concurrent", concurrency, warm_dir), ("warm", concurrency, warm_dir))
+        for label, limit, cache_dir in runs:
+            report, tools = await startup(servers, limit, download_latency, import_delay, startup_timeout, cache_dir)
+            print(f"{label:<10} concurrency={limit:<3} total {report['total_s']:6.2f}s, "
+                  f"{report['started']} started, {report['failed']} failed, {report['stopped']} stopped, "
+                  f"{report['unchanged']} unchanged, {tools} tools, {report['downloads']} downloads")
+    print(f"{'script':<28} {'ok':<5} {'download':>8} {'start':>7} {'tools':>7} {'total':>7}")
+    for timings in report["servers"]:
+        print(f"{timings['script'].rsplit('/', 1)[-1]:<28} {str(timings.get('ok')):<5} "
+              f"{timings.get('download_s', 0):8.2f} {timings.get('start_s', 0):7.2f} "
+              f"{timings.get('tools_s', 0):7.2f} {timings['total_s']:7.2f}"
+              + (f"  {timings['error'][:60]}" if timings.get("error") else ""))
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    asyncio.run(run(
+        int(args[0]) if len(args) > 0 else 12,
+        int(args[1]) if len(args) > 1 else mcp_client_module.SERVER_STARTUP_CONCURRENCY,
+        float(args[2]) if len(args) > 2 else 0.2,
+        float(args[3]) if len(args) > 3 else 1.0,
+        float(args[4]) if len(args) > 4 else 10.0,
+    ))
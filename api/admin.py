@@ -0,0 +1,94 @@
+from fastapi import APIRouter, HTTPException, Request
+from services.audit import audit_pipeline
+from utils.dsh_apis import api_details_cache, credentials_cache
+
+router = APIRouter()
+
+
+@router.get("/admin/caches")
+async def cache_stats(request: Request):
+    """Hit/miss counters of the in-process caches"""
+    mcp_client = request.app.state.mcp_client
+    caches = {
+        "api_details": api_details_cache.stats(),
+        "credentials": credentials_cache.stats(),
+        "scripts": mcp_client.script_cache.stats(),
+    }
+    if mcp_client.tool_result_cache:
+        caches["tool_results"] = mcp_client.tool_result_cache.stats()
+    if mcp_client.response_cache:
+        caches["responses"] = mcp_client.response_cache.stats()
+    if mcp_client.context_cache:
+        caches["context"] = mcp_client.context_cache.stats()
+    return {"data": caches, "message": "Cache statistics"}
+
+
+@router.get("/admin/breakers")
+async def breakers(request: Request):
+    """Circuit breaker, bulkhead and timeout state per server"""
+    return {"data": request.app.state.mcp_client.resilience.stats(), "message": "Circuit breakers"}
+
+
+@router.get("/admin/tools")
+async def tools(request: Request):
+    """The current tool registry version and the schema hash of every tool"""
+    registry = request.app.state.mcp_client.registry
+    snapshot = registry.snapshot
+    data = registry.stats()
+    data["schemas"] = {name: {"server": tool.server, "schema_hash": tool.schema_hash} for name, tool in snapshot.tools.items()}
+    return {"data": data, "message": "Tool registry"}
+
+
+@router.get("/admin/metrics")
+async def metrics():
+    """Queue depth, drops and sink results of the audit pipeline"""
+    return {"data": {"audit": audit_pipeline.stats()}, "message": "Metrics"}
+
+
+@router.get("/admin/startup")
+async def startup_report(request: Request):
+    """Per-server download, spawn and tool listing times of the last server (re)connect"""
+    return {"data": request.app.state.mcp_client.startup_report, "message": "Server startup report"}
+
+
+@router.get("/admin/servers")
+async def servers(request: Request):
+    """PID, state, uptime and memory of every server process"""
+    return {"data": request.app.state.mcp_client.server_states(), "message": "Servers"}
+
+
+async def _server_action(request: Request, server_name: str, action: str):
+    mcp_client = request.app.state.mcp_client
+    try:
+        return await getattr(mcp_client, f"{action}_server")(server_name)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Server {server_name} not found")
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Could not {action} server {server_name}: {e}")
+
+
+@router.get("/admin/servers/{server_name}/health")
+async def server_health(request: Request, server_name: str):
+    """Pings one server"""
+    handle = request.app.state.mcp_client.server_handles.get(server_name)
+    if handle is None:
+        raise HTTPException(status_code=404, detail=f"Server {server_name} not found")
+    return {"data": await handle.health(), "message": f"Health of {server_name}"}
+
+
+@router.post("/admin/servers/{server_name}/stop")
+async def stop_server(request: Request, server_name: str):
+    """Stops one server and withdraws its tools until it is started again"""
+    return {"data": await _server_action(request, server_name, "stop"), "message": f"Server {server_name} stopped"}
+
+
+@router.post("/admin/servers/{server_name}/start")
+async def start_server(request: Request, server_name: str):
+    """Starts a stopped server"""
+    return {"data": await _server_action(request, server_name, "start"), "message": f"Server {server_name} started"}
+
+
+@router.post("/admin/servers/{server_name}/restart")
+async def restart_server(request: Request, server_name: str):
+    """Restarts one server's process"""
+    return {"data": await _server_action(request, server_name, "restart"), "message": f"Server {server_name} restarted"}
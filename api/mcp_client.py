@@ -1,6 +1,10 @@
 from fastapi import APIRouter, Request, HTTPException
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from services.mcp_client import MCPClient
+from schemas.query import QueryBudget
+import json
 import os
 
 router = APIRouter()
@@ -8,6 +12,7 @@ router = APIRouter()
 class QueryInput(BaseModel):
     message: str
     consent:bool | None = None
+    budget: QueryBudget | None = None
 
 @router.post("/query")
 async def handle_query(input: QueryInput, request: Request):
@@ -18,10 +23,33 @@ async def handle_query(input: QueryInput, request: Request):
     session_id = headers.get("session_id", None)
     consent = input.consent
 
-    result = await mcp_client.process_query(input.message, email=email, consent=consent, session_id=session_id)
+    result = await mcp_client.process_query(input.message, email=email, consent=consent, session_id=session_id,
+                                            budget=input.budget)
     return result
     # except Exception as e:
     #     raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.post("/query/stream")
+async def handle_query_stream(input: QueryInput, request: Request):
+    """Streams the query as Server-Sent Events: tokens, tool calls, tool results, sources and the final result."""
+    mcp_client = request.app.state.mcp_client
+    headers = request.headers
+    email = headers.get("email", None)
+    session_id = headers.get("session_id", None)
+    consent = input.consent
+
+    async def event_stream():
+        async for event in mcp_client.stream_query(input.message, email=email, consent=consent, session_id=session_id,
+                                                   budget=input.budget):
+            data = json.dumps(jsonable_encoder(event["data"]))
+            yield f"event: {event['event']}\ndata: {data}\n\n"
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
 
@@ -1,6 +1,7 @@
 from fastapi import APIRouter, Request, HTTPException
 from pydantic import BaseModel
 from services.server_management import list_gcs_modules
+import asyncio
 import os
 
 router = APIRouter()
@@ -9,11 +10,13 @@ router = APIRouter()
 #     message: str
 
 @router.get("/list_servers")
-async def list_servers():
+async def list_servers(request: Request):
     """Lists all servers"""
     # try:
-    servers = list_gcs_modules()
-    return {"data":{"servers":servers},"message":"List of servers"}
+    servers = await asyncio.to_thread(list_gcs_modules)
+    # Tools come from the registry, which startup filled from the manifests, not from the bucket.
+    tools = request.app.state.mcp_client.server_tools()
+    return {"data":{"servers":servers,"tools":tools},"message":"List of servers"}
     # except Exception as e:
     #     raise HTTPException(status_code=500, detail=str(e))
 
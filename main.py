@@ -5,7 +5,7 @@ from fastapi import FastAPI
 from api import server_generator
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from api import server_generator,mcp_client,server_management
+from api import server_generator,mcp_client,server_management,admin
 from services.mcp_client import MCPClient
 import os
 # from api.mcp_client import startup_event
@@ -35,6 +35,7 @@ app.add_middleware(
 # app.include_router(server_generator.router, prefix="/servers")
 app.include_router(mcp_client.router, tags=["MCP"])
 app.include_router(server_management.router, tags=["Server Management"])
+app.include_router(admin.router, tags=["Admin"])
 
 
 
@@ -83,7 +84,14 @@ async def create(file: ServerCreate):
         "message": "Server has been created successfully"
     }
     # startup_event()
-    created, error = await app.state.mcp_client.connect_to_server(server_script_path=data)
+    # Started through reconcile so it cannot race a reload of the same script.
+    report = await app.state.mcp_client.reconcile_servers(
+        bucket_name=BUCKET_NAME, prefix=data[len(f"gs://{BUCKET_NAME}/"):]
+    )
+    outcome = next((timings for timings in report["servers"] if timings["script"] == data), {"ok": True})
+    if data in report["skipped"]:
+        outcome = {"ok": False, "error": "This version of the server already failed to start"}
+    created, error = outcome.get("ok"), outcome.get("error")
 
     if created:
         response["status"] = "success"
@@ -110,7 +118,7 @@ async def delete_server(server:ServerName):
     """Deletes a server"""
     # try:
     result = await app.state.mcp_client.delete_server(server.server_name)
-    await app.state.mcp_client.connect_to_servers_from_directory(bucket_name=BUCKET_NAME)
+    await app.state.mcp_client.reconcile_servers(bucket_name=BUCKET_NAME)
     return {"data": None, "message": "Server deleted successfully"}
     # except Exception as e:
     #     raise HTTPException(status_code=500, detail=str(e))
@@ -0,0 +1,9 @@
+from pydantic import BaseModel, Field
+
+
+class QueryBudget(BaseModel):
+    max_iterations: int | None = Field(default=None, gt=0)
+    max_tool_calls: int | None = Field(default=None, gt=0)
+    max_input_tokens: int | None = Field(default=None, gt=0)
+    max_output_tokens: int | None = Field(default=None, gt=0)
+    deadline_seconds: float | None = Field(default=None, gt=0)
@@ -0,0 +1,244 @@
+import asyncio
+import json
+import logging
+import os
+import threading
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+AUDIT_SINK = os.environ.get("AUDIT_SINK", "cloud")
+AUDIT_LOG_PATH = os.environ.get("AUDIT_LOG_PATH", "/tmp/dsh_audit.jsonl")
+AUDIT_QUEUE_SIZE = int(os.environ.get("AUDIT_QUEUE_SIZE", "10000"))
+AUDIT_BATCH_SIZE = int(os.environ.get("AUDIT_BATCH_SIZE", "100"))
+AUDIT_FLUSH_INTERVAL = float(os.environ.get("AUDIT_FLUSH_INTERVAL", "1.0"))
+AUDIT_DRAIN_TIMEOUT = float(os.environ.get("AUDIT_DRAIN_TIMEOUT", "5"))
+AUDIT_LOGGER_NAME = "DSH_ASSISTANT"
+
+
+class CloudLoggingSink:
+    """Writes each batch to Cloud Logging in a single API call, reusing one client."""
+
+    def __init__(self, logger_name: str = AUDIT_LOGGER_NAME):
+        self.logger_name = logger_name
+        self._logger = None
+
+    def write(self, records: List[Dict[str, Any]]):
+        if self._logger is None:
+            from google.cloud import logging as cloud_logging
+            self._logger = cloud_logging.Client().logger(self.logger_name)
+        batch = self._logger.batch()
+        for record in records:
+            batch.log_text("AUDIT LOG", severity=record["severity"], labels=record["labels"])
+        batch.commit()
+
+
+class FileSink:
+    """Appends records as JSON lines to a local file."""
+
+    def __init__(self, path: str = AUDIT_LOG_PATH):
+        self.path = path
+
+    def write(self, records: List[Dict[str, Any]]):
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with open(self.path, "a") as audit_file:
+            audit_file.write("".join(json.dumps(record) + "\n" for record in records))
+            audit_file.flush()
+            os.fsync(audit_file.fileno())
+
+
+def _in_daemon_thread(fn, *args) -> asyncio.Future:
+    """
+    Like asyncio.to_thread, but in a daemon thread of its own: a sink call that
+    never returns (Cloud Logging unreachable) does not hold up interpreter exit,
+    which waits for the default executor's threads.
+    """
+    loop = asyncio.get_running_loop()
+    future = loop.create_future()
+
+    def resolve(result, error):
+        if not future.done():
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(result)
+
+    def run():
+        try:
+            result, error = fn(*args), None
+        except Exception as e:
+            result, error = None, e
+        try:
+            loop.call_soon_threadsafe(resolve, result, error)
+        except RuntimeError:
+            pass  # the loop is closed, nobody is waiting any more
+
+    threading.Thread(target=run, name="audit-sink", daemon=True).start()
+    return future
+
+
+class AuditPipeline:
+    """
+    Moves audit logging off the tool-call path.
+
+    `log` only puts the record on a bounded queue (dropping it, and counting the
+    drop, when the queue is full). A background task writes batches of up to
+    `batch_size` records, or whatever arrived within `flush_interval` seconds, to
+    `sink`; a batch the sink fails to write goes to `fallback` instead. Sinks are
+    blocking and run in a daemon thread. On shutdown each sink write gets
+    `drain_timeout` seconds; once one fails or times out, the rest of the queue
+    goes straight to the fallback.
+    """
+
+    def __init__(self, sink, fallback: Optional[FileSink] = None, max_queue: int = AUDIT_QUEUE_SIZE,
+                 batch_size: int = AUDIT_BATCH_SIZE, flush_interval: float = AUDIT_FLUSH_INTERVAL,
+                 drain_timeout: float = AUDIT_DRAIN_TIMEOUT):
+        self.sink = sink
+        self.fallback = fallback
+        self.max_queue = max_queue
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.drain_timeout = drain_timeout
+        self._queue: Optional[asyncio.Queue] = None
+        self._flusher: Optional[asyncio.Task] = None
+        self._pending: List[Dict[str, Any]] = []
+        self._writing: Optional[asyncio.Future] = None
+        self._writing_batch: List[Dict[str, Any]] = []
+        self.enqueued = 0
+        self.dropped = 0
+        self.written = 0
+        self.fallback_written = 0
+        self.failed_batches = 0
+        self.lost = 0
+
+    def log(self, record: Dict[str, Any]):
+        if self._queue is None:
+            self._queue = asyncio.Queue(maxsize=self.max_queue)
+        if self._flusher is None or self._flusher.done():
+            self._flusher = asyncio.create_task(self._flush_loop())
+        try:
+            self._queue.put_nowait(record)
+            self.enqueued += 1
+        except asyncio.QueueFull:
+            self.dropped += 1
+            if self.dropped == 1 or self.dropped % 1000 == 0:
+                logger.warning(f"Audit queue full, {self.dropped} records dropped so far")
+
+    async def _flush_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            self._pending = [await self._queue.get()]
+            deadline = loop.time() + self.flush_interval
+            while len(self._pending) < self.batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    self._pending.append(await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            batch, self._pending = self._pending, []
+            self._writing_batch = batch
+            # Shielded so a drain that cancels the flusher doesn't abandon a batch mid-write.
+            self._writing = asyncio.ensure_future(self._write(batch))
+            await asyncio.shield(self._writing)
+
+    async def _write(self, batch: List[Dict[str, Any]], timeout: Optional[float] = None) -> bool:
+        """Writes a batch to the sink, or to the fallback if that fails. Returns whether the sink took it."""
+        try:
+            await asyncio.wait_for(_in_daemon_thread(self.sink.write, batch), timeout)
+            self.written += len(batch)
+            return True
+        except asyncio.TimeoutError:
+            self.failed_batches += 1
+            logger.error(f"Audit sink did not write {len(batch)} records within {timeout:g}s")
+        except Exception as e:
+            self.failed_batches += 1
+            logger.error(f"Audit sink failed for {len(batch)} records: {e}")
+        await self._write_fallback(batch)
+        return False
+
+    async def _write_fallback(self, batch: List[Dict[str, Any]]):
+        if self.fallback is None or self.fallback is self.sink:
+            self.lost += len(batch)
+            return
+        try:
+            await asyncio.to_thread(self.fallback.write, batch)
+            self.fallback_written += len(batch)
+        except Exception as e:
+            self.lost += len(batch)
+            logger.error(f"Audit fallback sink failed, {len(batch)} records lost: {e}")
+
+    async def drain(self):
+        """Stops the flusher and writes out everything still queued. Called on shutdown."""
+        if self._flusher is not None:
+            self._flusher.cancel()
+            try:
+                await self._flusher
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._flusher = None
+        sink_responding = True
+        if self._writing is not None:
+            done, _ = await asyncio.wait({self._writing}, timeout=self.drain_timeout)
+            if not done:
+                sink_responding = False
+                logger.error(
+                    f"Audit batch in flight not written within {self.drain_timeout:g}s, "
+                    f"copying its {len(self._writing_batch)} records to the fallback"
+                )
+                await self._write_fallback(self._writing_batch)
+            self._writing = None
+        if self._queue is None:
+            return
+        while self._pending or not self._queue.empty():
+            while len(self._pending) < self.batch_size and not self._queue.empty():
+                self._pending.append(self._queue.get_nowait())
+            batch, self._pending = self._pending, []
+            if sink_responding:
+                sink_responding = await self._write(batch, timeout=self.drain_timeout)
+            else:
+                await self._write_fallback(batch)
+        logger.info(f"Audit pipeline drained: {self.stats()}")
+
+    def stats(self):
+        return {
+            "queue_depth": self._queue.qsize() if self._queue else 0,
+            "queue_capacity": self.max_queue,
+            "enqueued": self.enqueued,
+            "dropped": self.dropped,
+            "written": self.written,
+            "fallback_written": self.fallback_written,
+            "failed_batches": self.failed_batches,
+            "lost": self.lost,
+        }
+
+
+def audit_record(versioned_content_id, tool_name, tool_args, api_name, user_id, severity="INFO"):
+    """Builds the audit record for one tool call. Never includes the API key."""
+    tool_args = {name: value for name, value in tool_args.items() if name != "API_KEY"}
+    return {
+        "severity": severity,
+        "labels": {
+            "api_versioned_contentid": versioned_content_id,
+            "user_id": str(user_id),
+            "tool_name": str(tool_name),
+            "tool_args": str(tool_args),
+            "api_name": str(api_name),
+            "time_stamp": str(datetime.now())
+        }
+    }
+
+
+def _build_pipeline() -> AuditPipeline:
+    file_sink = FileSink(AUDIT_LOG_PATH)
+    if AUDIT_SINK == "file":
+        return AuditPipeline(sink=file_sink)
+    return AuditPipeline(sink=CloudLoggingSink(), fallback=file_sink)
+
+
+audit_pipeline = _build_pipeline()
@@ -4,8 +4,8 @@ from dotenv import load_dotenv
 
 load_dotenv()
 from schemas.authentication import GetApiKey
-import requests
-def authenticate_tool(user_credentials: GetApiKey):
+from utils.dsh_apis import dsh_client
+async def authenticate_tool(user_credentials: GetApiKey):
     """
     Authenticates a user by fetching an API key using their credentials.
 
@@ -19,7 +19,7 @@ def authenticate_tool(user_credentials: GetApiKey):
         FETCH_CRED_API_KEY: The API key used to authenticate the request to the external service.
 
     Raises:
-        requests.exceptions.RequestException: If the HTTP request fails.
+        aiohttp.ClientError: If the HTTP request still fails after retries.
         KeyError: If the expected keys are not found in the response JSON.
 
     """
@@ -27,22 +27,12 @@ def authenticate_tool(user_credentials: GetApiKey):
 
     FETCH_CRED_API_KEY = os.environ.get("FETCH_CRED_API_KEY")
     url = "https://kong-admin-api-preprod.dsh.digitalapicraft.com/api/v1/digital-content/apis/fetch-credentials"
-    headers = {
-        "accept": "application/json, text/plain, */*",
-        "apikey": FETCH_CRED_API_KEY,
-        "content-type": "application/json"
-    }
-    data = {
-        "emailId": user_credentials.email_id,
-        "apiVersionedContentId": user_credentials.versioned_content_id
-    }
-    response = requests.post(url, headers=headers, json=data)
-    response_json = response.json()
-    print(response_json)
-    if response_json.get('data') is None:
-        return None
-    api_key = response_json.get('data', {}).get('productCredentials', [])[0].get('clientId', None)
-    return api_key
+    return await dsh_client.fetch_credentials(
+        email_id=user_credentials.email_id,
+        versioned_content_id=user_credentials.versioned_content_id,
+        apikey=FETCH_CRED_API_KEY,
+        url=url
+    )
 
 # # Sample user credentials
 # user_credentials = GetApiKey(
@@ -51,7 +41,7 @@ def authenticate_tool(user_credentials: GetApiKey):
 # )
 #
 # # Call the authenticate function
-# api_key = authenticate(user_credentials)
+# api_key = asyncio.run(authenticate_tool(user_credentials))
 #
 # # Print the result
 # print("API Key:", api_key)
\ No newline at end of file
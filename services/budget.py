@@ -0,0 +1,94 @@
+import logging
+import os
+import time
+from typing import Optional
+
+from dotenv import load_dotenv
+
+from schemas.query import QueryBudget
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+load_dotenv()
+
+DEFAULT_BUDGET = QueryBudget(
+    max_iterations=int(os.environ.get("QUERY_MAX_ITERATIONS", "10")),
+    max_tool_calls=int(os.environ.get("QUERY_MAX_TOOL_CALLS", "20")),
+    max_input_tokens=int(os.environ.get("QUERY_MAX_INPUT_TOKENS", "200000")),
+    max_output_tokens=int(os.environ.get("QUERY_MAX_OUTPUT_TOKENS", "20000")),
+    deadline_seconds=float(os.environ.get("QUERY_DEADLINE_SECONDS", "120")),
+)
+
+
+class BudgetExceeded(Exception):
+    """Raised when a query has used up one of its limits."""
+
+
+class QueryBudgetTracker:
+    """
+    Tracks what one query has consumed against its limits.
+
+    A request budget can only tighten DEFAULT_BUDGET: each limit it sets is
+    capped at the default, and limits it leaves unset fall back to the default.
+    """
+
+    def __init__(self, budget: Optional[QueryBudget] = None):
+        overrides = budget.model_dump(exclude_none=True) if budget else {}
+        self.limits = DEFAULT_BUDGET.model_copy(update={
+            name: min(value, getattr(DEFAULT_BUDGET, name)) for name, value in overrides.items()
+        })
+        self.started_at = time.monotonic()
+        self.deadline = self.started_at + self.limits.deadline_seconds
+        self.iterations = 0
+        self.tool_calls = 0
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self.denied = None
+
+    def remaining_time(self) -> float:
+        return max(self.deadline - time.monotonic(), 0.0)
+
+    def exceeded(self) -> Optional[str]:
+        """Returns the name of the first limit that has been reached, or None."""
+        if self.denied:
+            return self.denied
+        if time.monotonic() >= self.deadline:
+            return "deadline"
+        if self.iterations >= self.limits.max_iterations:
+            return "max_iterations"
+        if self.input_tokens >= self.limits.max_input_tokens:
+            return "max_input_tokens"
+        if self.output_tokens >= self.limits.max_output_tokens:
+            return "max_output_tokens"
+        return None
+
+    def start_llm_call(self):
+        reason = self.exceeded()
+        if reason:
+            raise BudgetExceeded(reason)
+        self.iterations += 1
+
+    def charge_llm(self, usage_metadata):
+        if usage_metadata is None:
+            return
+        self.input_tokens += usage_metadata.prompt_token_count or 0
+        self.output_tokens += usage_metadata.candidates_token_count or 0
+
+    def start_tool_call(self):
+        if time.monotonic() >= self.deadline:
+            self.denied = "deadline"
+        elif self.tool_calls >= self.limits.max_tool_calls:
+            self.denied = "max_tool_calls"
+        if self.denied:
+            raise BudgetExceeded(self.denied)
+        self.tool_calls += 1
+
+    def usage(self):
+        return {
+            "iterations": self.iterations,
+            "tool_calls": self.tool_calls,
+            "input_tokens": self.input_tokens,
+            "output_tokens": self.output_tokens,
+            "elapsed_seconds": round(time.monotonic() - self.started_at, 3),
+            "limits": self.limits.model_dump(),
+        }
@@ -0,0 +1,186 @@
+import asyncio
+import hashlib
+import json
+import logging
+import time
+import uuid
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+from google.genai import types
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class CachedContentEntry:
+    def __init__(self, name: str, expires_at: float):
+        self.name = name
+        self.expires_at = expires_at
+
+
+class ContextCacheManager:
+    """
+    Keeps Gemini cached-content entries for the system instruction plus the tool
+    catalog, keyed by a hash of both.
+
+    Entries are created and renewed in the background, so a call never waits on
+    the caching API: calls with a key that has no entry yet go out uncached.
+    Entries are renewed when they get within `renew_margin` seconds of expiry and
+    are dropped by `invalidate` whenever the server catalog changes. If the backend
+    refuses to cache a prompt (e.g. below the minimum token count) the key is not
+    retried for `retry_after` seconds.
+    """
+
+    def __init__(self, caches, model: str, ttl: int = 3600, renew_margin: int = 300,
+                 max_entries: int = 32, retry_after: int = 600):
+        self.caches = caches
+        self.model = model
+        self.ttl = ttl
+        self.renew_margin = renew_margin
+        self.max_entries = max_entries
+        self.retry_after = retry_after
+        self._entries: "OrderedDict[str, CachedContentEntry]" = OrderedDict()
+        self._uncacheable: "OrderedDict[str, float]" = OrderedDict()
+        self._pending: Dict[str, asyncio.Task] = {}
+        # Bumped by invalidate, so a creation that was in flight meanwhile is thrown away.
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.renewals = 0
+        self.failures = 0
+
+    @staticmethod
+    def cache_key(system_prompt: str, tools: Optional[List[types.Tool]]) -> str:
+        declarations = [tool.model_dump(mode="json", exclude_none=True) for tool in tools or []]
+        payload = json.dumps({"system": system_prompt, "tools": declarations}, sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, system_prompt: str, tools: Optional[List[types.Tool]]) -> Optional[str]:
+        """Returns the cached-content name to reference for this prompt and tool set, or None."""
+        key = self.cache_key(system_prompt, tools)
+        now = time.monotonic()
+        if self._uncacheable.get(key, 0) > now:
+            return None
+
+        entry = self._entries.get(key)
+        if entry and now < entry.expires_at - self.renew_margin:
+            self.hits += 1
+            self._entries.move_to_end(key)
+            return entry.name
+
+        if key not in self._pending:
+            task = asyncio.create_task(self._refresh(key, system_prompt, tools, entry))
+            self._pending[key] = task
+            task.add_done_callback(lambda _, key=key: self._pending.pop(key, None))
+        if entry and now < entry.expires_at:
+            # Still usable while it is renewed.
+            self.hits += 1
+            return entry.name
+        self.misses += 1
+        return None
+
+    async def _refresh(self, key: str, system_prompt: str, tools: Optional[List[types.Tool]],
+                       entry: Optional[CachedContentEntry]):
+        generation = self._generation
+        now = time.monotonic()
+        try:
+            if entry and now < entry.expires_at:
+                await self.caches.update(
+                    name=entry.name,
+                    config=types.UpdateCachedContentConfig(ttl=f"{self.ttl}s")
+                )
+                entry.expires_at = now + self.ttl
+                self.renewals += 1
+                logger.info(f"Renewed context cache {entry.name}")
+                return
+
+            cached = await self.caches.create(
+                model=self.model,
+                config=types.CreateCachedContentConfig(
+                    system_instruction=system_prompt,
+                    tools=tools or None,
+                    ttl=f"{self.ttl}s"
+                )
+            )
+            entry = CachedContentEntry(cached.name, now + self.ttl)
+            if generation != self._generation:
+                await self._delete(entry)
+                return
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            logger.info(f"Created context cache {cached.name} for {len(tools or [])} tools")
+            await self._evict()
+        except Exception as e:
+            self.failures += 1
+            self._entries.pop(key, None)
+            self._uncacheable[key] = now + self.retry_after
+            self._uncacheable.move_to_end(key)
+            while len(self._uncacheable) > self.max_entries:
+                self._uncacheable.popitem(last=False)
+            logger.warning(f"Context caching unavailable, sending uncached: {e}")
+
+    async def _evict(self):
+        while len(self._entries) > self.max_entries:
+            _, entry = self._entries.popitem(last=False)
+            await self._delete(entry)
+
+    async def _delete(self, entry: CachedContentEntry):
+        try:
+            await self.caches.delete(name=entry.name)
+        except Exception as e:
+            logger.warning(f"Failed to delete context cache {entry.name}: {e}")
+
+    async def invalidate(self):
+        """Drops every entry so the next call rebuilds the cache for the new tool catalog."""
+        self._generation += 1
+        for task in self._pending.values():
+            task.cancel()
+        entries = list(self._entries.values())
+        self._entries.clear()
+        self._uncacheable.clear()
+        await asyncio.gather(*(self._delete(entry) for entry in entries))
+
+    async def settle(self):
+        """Waits for the creations and renewals in flight."""
+        await asyncio.gather(*self._pending.values(), return_exceptions=True)
+
+    def stats(self):
+        return {
+            "entries": len(self._entries),
+            "pending": len(self._pending),
+            "hits": self.hits,
+            "misses": self.misses,
+            "renewals": self.renewals,
+            "failures": self.failures,
+        }
+
+
+class LocalCaches:
+    """
+    An in-memory stand-in for `client.aio.caches` so the cache manager can be
+    exercised offline. Expiry uses the same monotonic clock as the manager.
+    """
+
+    def __init__(self, min_chars: int = 0):
+        self.min_chars = min_chars
+        self.contents = {}
+        self.created = 0
+
+    async def create(self, model: str, config: types.CreateCachedContentConfig):
+        size = len(str(config.system_instruction)) + sum(len(tool.model_dump_json()) for tool in config.tools or [])
+        if size < self.min_chars:
+            raise ValueError(f"Cached content is too small: {size} < {self.min_chars}")
+        name = f"cachedContents/{uuid.uuid4().hex}"
+        self.contents[name] = time.monotonic() + int(config.ttl.rstrip("s"))
+        self.created += 1
+        return types.CachedContent(name=name, model=model)
+
+    async def update(self, name: str, config: types.UpdateCachedContentConfig):
+        if self.contents.get(name, 0) < time.monotonic():
+            raise ValueError(f"{name} has expired")
+        self.contents[name] = time.monotonic() + int(config.ttl.rstrip("s"))
+        return types.CachedContent(name=name)
+
+    async def delete(self, name: str):
+        self.contents.pop(name, None)
@@ -0,0 +1,105 @@
+import logging
+from typing import Awaitable, Callable, Dict, List
+
+from google.genai import types
+
+from utils.compaction import estimate_tokens
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+SUMMARY_PREFIX = "Summary of the earlier conversation:\n"
+MESSAGE_COUNT = {"$size": {"$ifNull": ["$messages", []]}}
+
+
+class HistoryManager:
+    """
+    Builds the conversation history sent with each query from the session document.
+
+    Older turns are folded into a rolling `summary` stored on the session, with
+    `summarized_until` counting the messages it covers. The last `keep_messages`
+    messages stay verbatim, and the assembled history is trimmed to `token_budget`
+    so prompt size stays flat however long the session runs. Only the messages
+    that can still be needed are read from the session, so the read stays flat too.
+    """
+
+    def __init__(self, collection, summarize: Callable[[str, List[Dict[str, str]]], Awaitable[str]],
+                 keep_messages: int = 6, summarize_batch: int = 6, token_budget: int = 6000):
+        self.collection = collection
+        self.summarize = summarize
+        self.keep_messages = keep_messages
+        self.summarize_batch = summarize_batch
+        self.token_budget = token_budget
+        # Unsummarized messages, with room for a query's worth piling up before its update runs.
+        self.load_window = keep_messages + 2 * summarize_batch
+
+    async def has_history(self, session_id: str) -> bool:
+        session = await self.collection.find_one(
+            {"session_id": session_id, "messages.0": {"$exists": True}}, {"_id": 1}
+        )
+        return session is not None
+
+    async def load(self, session_id: str) -> List[types.Content]:
+        logger.debug(f"Fetching history for session: {session_id}")
+        session = await self.collection.find_one(
+            {"session_id": session_id},
+            {
+                "messages": {"$slice": -self.load_window},
+                "message_count": MESSAGE_COUNT,
+                "summary": 1,
+                "summarized_until": 1
+            }
+        )
+        if not session:
+            return []
+        summary = session.get("summary") or ""
+        messages = session.get("messages", [])
+        first_index = session.get("message_count", len(messages)) - len(messages)
+        messages = messages[max(session.get("summarized_until", 0) - first_index, 0):]
+
+        budget = self.token_budget - estimate_tokens(summary)
+        kept = []
+        for message in reversed(messages):
+            cost = estimate_tokens(message["content"])
+            if kept and cost > budget:
+                break
+            kept.append(message)
+            budget -= cost
+        kept.reverse()
+        if budget < 0 and summary:
+            summary = summary[:max(len(summary) + budget * 4, 0)]
+
+        history = []
+        if summary:
+            history.append(types.Content(role="user", parts=[types.Part.from_text(text=SUMMARY_PREFIX + summary)]))
+        history += [
+            types.Content(role=message["role"], parts=[types.Part.from_text(text=message["content"])])
+            for message in kept
+        ]
+        return history
+
+    async def update(self, session_id: str):
+        """Folds messages older than the verbatim window into the rolling summary once enough have piled up."""
+        try:
+            session = await self.collection.find_one(
+                {"session_id": session_id}, {"message_count": MESSAGE_COUNT, "summary": 1, "summarized_until": 1}
+            )
+            if not session:
+                return
+            summarized_until = session.get("summarized_until", 0)
+            new_until = session.get("message_count", 0) - self.keep_messages
+            if new_until - summarized_until < self.summarize_batch:
+                return
+
+            batch = await self.collection.find_one(
+                {"session_id": session_id},
+                {"messages": {"$slice": [summarized_until, new_until - summarized_until]}, "summarized_until": 1}
+            )
+            summary = await self.summarize(session.get("summary") or "", (batch or {}).get("messages", []))
+            await self.collection.update_one(
+                {"session_id": session_id, "summarized_until": session.get("summarized_until")},
+                {"$set": {"summary": summary, "summarized_until": new_until}}
+            )
+            logger.info(f"Summarized messages up to {new_until} for session: {session_id}")
+        except Exception as e:
+            logger.error(f"History summarization failed for session {session_id}: {e}")
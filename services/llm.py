@@ -0,0 +1,185 @@
+import asyncio
+import json
+import logging
+import os
+import re
+from abc import ABC, abstractmethod
+from functools import lru_cache
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from dotenv import load_dotenv
+from google import genai
+from google.genai import types
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+load_dotenv()
+
+DEFAULT_LOCATION = "us-central1"
+
+
+@lru_cache(maxsize=None)
+def get_genai_client(project: str, location: str = DEFAULT_LOCATION) -> genai.Client:
+    """
+    Returns the process-wide Gemini client for a project/location pair.
+
+    The client is created once and reused so that its async HTTP connection
+    pool is shared by every request instead of being rebuilt per generation.
+
+    Args:
+        project (str): The GCP project used for Vertex AI.
+        location (str, optional): The Vertex AI location. Defaults to us-central1.
+
+    Returns:
+        genai.Client: The shared client. Use `client.aio` for non-blocking calls.
+    """
+    logger.info(f"Creating Gemini client for project: {project}, location: {location}")
+    return genai.Client(vertexai=True, project=project, location=location)
+
+
+class LLMBackend(ABC):
+    """
+    The interface `MCPClient` and the server generator use to reach a model.
+
+    `caches` is the cached-content API used for context caching, or None when the
+    backend does not support it.
+    """
+
+    caches = None
+
+    @abstractmethod
+    async def generate(self, model: str, contents, config: types.GenerateContentConfig) -> types.GenerateContentResponse:
+        ...
+
+    @abstractmethod
+    async def generate_stream(self, model: str, contents, config: types.GenerateContentConfig
+                              ) -> AsyncIterator[types.GenerateContentResponse]:
+        ...
+
+
+class GeminiBackend(LLMBackend):
+    def __init__(self, project: str, location: str = DEFAULT_LOCATION):
+        self.client = get_genai_client(project=project, location=location)
+        self.caches = self.client.aio.caches
+
+    async def generate(self, model, contents, config):
+        return await self.client.aio.models.generate_content(model=model, contents=contents, config=config)
+
+    async def generate_stream(self, model, contents, config):
+        return await self.client.aio.models.generate_content_stream(model=model, contents=contents, config=config)
+
+
+class ScriptedBackend(LLMBackend):
+    """
+    A deterministic offline backend that replays canned model turns.
+
+    `scenarios` is a list of {"match": <regex on the user query>, "turns": [...]};
+    the first scenario whose pattern matches the latest user message is used, and
+    a scenario without "match" matches everything. Each turn is
+    {"text": "..."} and/or {"function_calls": [{"name": ..., "args": {...}}]}.
+    The n-th model turn of a query plays turns[n]; once they run out, or when the
+    request carries no tools, the backend answers with text only.
+
+    `latency` is added before every response and `token_latency` between streamed
+    words, so load tests see realistic timings.
+    """
+
+    def __init__(self, scenarios: Optional[List[Dict[str, Any]]] = None, latency: float = 0.0,
+                 token_latency: float = 0.0):
+        self.scenarios = scenarios or [{"turns": [{"text": "OK"}]}]
+        self.latency = latency
+        self.token_latency = token_latency
+        self.calls = 0
+
+    @classmethod
+    def from_file(cls, path: str) -> "ScriptedBackend":
+        with open(path) as script_file:
+            script = json.load(script_file)
+        return cls(
+            scenarios=script.get("scenarios"),
+            latency=script.get("latency", 0.0),
+            token_latency=script.get("token_latency", 0.0)
+        )
+
+    def _next_turn(self, contents, config) -> Dict[str, Any]:
+        query_index = max(
+            (index for index, content in enumerate(contents)
+             if content.role == "user" and any(part.text for part in content.parts or [])),
+            default=0
+        )
+        query = " ".join(part.text for part in contents[query_index].parts or [] if part.text) if contents else ""
+        step = sum(
+            1 for content in contents[query_index + 1:]
+            if any(part.function_response for part in content.parts or [])
+        )
+        scenario = next(
+            (scenario for scenario in self.scenarios
+             if re.search(scenario.get("match", ""), query, re.IGNORECASE)),
+            self.scenarios[-1]
+        )
+        turns = scenario["turns"]
+        turn = turns[step] if step < len(turns) else {"text": turns[-1].get("text") or "Done."}
+        if turn.get("function_calls") and (config is None or not config.tools):
+            turn = {"text": turn.get("text") or "Done."}
+        return turn
+
+    @staticmethod
+    def _response(parts, contents=None, output_text: str = "") -> types.GenerateContentResponse:
+        """Builds a response; usage is estimated at four characters per token and only attached when `contents` is given."""
+        usage_metadata = None
+        if contents is not None:
+            prompt_chars = sum(len(part.text or "") for content in contents for part in content.parts or [])
+            usage_metadata = types.GenerateContentResponseUsageMetadata(
+                prompt_token_count=prompt_chars // 4 + 1,
+                candidates_token_count=len(output_text) // 4 + 1
+            )
+        return types.GenerateContentResponse(
+            candidates=[types.Candidate(content=types.Content(role="model", parts=parts))],
+            usage_metadata=usage_metadata
+        )
+
+    @staticmethod
+    def _function_call_parts(turn) -> List[types.Part]:
+        return [
+            types.Part.from_function_call(name=call["name"], args=call.get("args", {}))
+            for call in turn.get("function_calls", [])
+        ]
+
+    async def generate(self, model, contents, config):
+        self.calls += 1
+        turn = self._next_turn(contents, config)
+        await asyncio.sleep(self.latency)
+        parts = ([types.Part.from_text(text=turn["text"])] if turn.get("text") else []) + self._function_call_parts(turn)
+        return self._response(parts, contents, turn.get("text", ""))
+
+    async def generate_stream(self, model, contents, config):
+        self.calls += 1
+        turn = self._next_turn(contents, config)
+
+        async def chunks():
+            await asyncio.sleep(self.latency)
+            words = re.findall(r"\S+\s*", turn.get("text", ""))
+            for word in words:
+                yield self._response([types.Part.from_text(text=word)])
+                await asyncio.sleep(self.token_latency)
+            function_calls = self._function_call_parts(turn)
+            if function_calls:
+                yield self._response(function_calls)
+            yield self._response([], contents, turn.get("text", ""))
+
+        return chunks()
+
+
+def get_llm_backend(project: str, location: str = DEFAULT_LOCATION) -> LLMBackend:
+    """
+    Returns the backend selected by LLM_BACKEND: "gemini" (default) or "scripted",
+    which replays the JSON script at LLM_SCRIPT_PATH.
+    """
+    backend = os.environ.get("LLM_BACKEND", "gemini")
+    if backend == "scripted":
+        script_path = os.environ.get("LLM_SCRIPT_PATH")
+        logger.info(f"Using scripted LLM backend from: {script_path}")
+        return ScriptedBackend.from_file(script_path) if script_path else ScriptedBackend()
+    if backend != "gemini":
+        raise ValueError(f"Unknown LLM_BACKEND '{backend}', expected 'gemini' or 'scripted'")
+    return GeminiBackend(project=project, location=location)
@@ -2,21 +2,44 @@ from fastapi import HTTPException
 import logging
 from typing import Optional, List, Dict, Any, Tuple
 from aiohttp import ClientSession
-from contextlib import AsyncExitStack
-from google import genai
 from google.genai import types
 import vertexai
 from mcp import ClientSession, StdioServerParameters
-from mcp.client.stdio import stdio_client
+from mcp.types import InitializeResult
 import os
+import asyncio
+import json
+import re
+import time
 from google.cloud import storage
 from dotenv import load_dotenv
 from services.authentication import authenticate_tool
 from schemas.authentication import GetApiKey
-from utils.dsh_apis import get_api_details, get_user_subscription_details
+from utils.dsh_apis import (
+    api_details_cache, dsh_client, get_api_details, get_user_subscription_details, prefetch_user_subscriptions
+)
+from services.llm import LLMBackend, get_llm_backend
+from services.tool_index import ToolIndex
+from services.tool_registry import RegisteredTool, ToolRegistry
+from services.context_cache import ContextCacheManager
+from services.response_cache import ResponseCache
+from services.tool_classification import is_mutating_tool, is_read_only_tool, load_tool_manifest
+from services.tool_result_cache import ToolResultCache, tool_result_key
+from services.budget import BudgetExceeded, QueryBudgetTracker
+from services.resilience import ResilienceManager, ToolFailure
+from services.history import HistoryManager
+from services.script_cache import ScriptCache, blob_version
+from services.server_handle import IDLE, STDIO, STOPPED, ServerHandle, server_transport
+from services.tool_manifest import (
+    MANIFEST_SUFFIX, build_manifest, is_manifest, manifest_matches, manifest_name, manifest_tools, read_manifest,
+    tool_entry, upload_manifest
+)
+from schemas.query import QueryBudget
 from motor.motor_asyncio import AsyncIOMotorClient
 from datetime import datetime
 from utils.utils import auditing_logs
+from services.audit import audit_pipeline
+from utils.compaction import compact_tool_result
 from schemas.servers import ToolCallResponse
 from schemas.servers import Source
 # Set up logging
@@ -25,14 +48,154 @@ logger = logging.getLogger(__name__)
 
 
 BASE_URL = os.environ.get("BASE_URL")
+MODEL_NAME = "gemini-2.0-flash-001"
+MAX_CONCURRENT_TOOL_CALLS = int(os.environ.get("MAX_CONCURRENT_TOOL_CALLS", "4"))
+TOOL_INDEX_TOP_K = int(os.environ.get("TOOL_INDEX_TOP_K", "12"))
+TOOL_INDEX_SCORER = os.environ.get("TOOL_INDEX_SCORER", "bm25")
+CONTEXT_CACHE_ENABLED = os.environ.get("GEMINI_CONTEXT_CACHE", "off").lower() in ("1", "on", "true")
+CONTEXT_CACHE_TTL = int(os.environ.get("GEMINI_CONTEXT_CACHE_TTL", "3600"))
+RESPONSE_CACHE_ENABLED = os.environ.get("RESPONSE_CACHE", "off").lower() in ("1", "on", "true")
+RESPONSE_CACHE_MAX_BYTES = int(os.environ.get("RESPONSE_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+RESPONSE_CACHE_TTL = int(os.environ.get("RESPONSE_CACHE_TTL", "300"))
+RESPONSE_CACHE_TOOL_TTLS = json.loads(os.environ.get("RESPONSE_CACHE_TOOL_TTLS", "{}"))
+RESPONSE_CACHE_SIMILARITY = float(os.environ.get("RESPONSE_CACHE_SIMILARITY", "0.9"))
+RESPONSE_CACHE_MIN_TERMS = int(os.environ.get("RESPONSE_CACHE_MIN_TERMS", "3"))
+TOOL_MANIFEST_PATH = os.environ.get("TOOL_MANIFEST_PATH")
+# Spawning a server is mostly interpreter start-up and imports, so more than a couple per core only adds contention.
+SERVER_STARTUP_CONCURRENCY = int(os.environ.get("SERVER_STARTUP_CONCURRENCY", str(min(8, 2 * (os.cpu_count() or 1)))))
+# "lazy" registers generated servers from their tool manifests and spawns them on their first call.
+SERVER_SPAWN_MODE = os.environ.get("SERVER_SPAWN_MODE", "eager").lower()
+SERVER_STARTUP_TIMEOUT = float(os.environ.get("SERVER_STARTUP_TIMEOUT", "60"))
+TOOL_ARGUMENT_VALIDATION = os.environ.get("TOOL_ARGUMENT_VALIDATION", "on").lower() in ("1", "on", "true")
+TOOL_RESULT_CACHE_ENABLED = os.environ.get("TOOL_RESULT_CACHE", "on").lower() in ("1", "on", "true")
+TOOL_RESULT_CACHE_TTL = int(os.environ.get("TOOL_RESULT_CACHE_TTL", "60"))
+TOOL_RESULT_CACHE_SERVER_TTLS = json.loads(os.environ.get("TOOL_RESULT_CACHE_SERVER_TTLS", "{}"))
+TOOL_RESULT_CACHE_MAX_BYTES = int(os.environ.get("TOOL_RESULT_CACHE_MAX_BYTES", str(16 * 1024 * 1024)))
+TOOL_RESULT_COMPACTION = os.environ.get("TOOL_RESULT_COMPACTION", "on").lower() not in ("0", "off", "false")
+TOOL_RESULT_MAX_TOKENS = int(os.environ.get("TOOL_RESULT_MAX_TOKENS", "4000"))
+HISTORY_KEEP_MESSAGES = int(os.environ.get("HISTORY_KEEP_MESSAGES", "6"))
+HISTORY_SUMMARIZE_BATCH = int(os.environ.get("HISTORY_SUMMARIZE_BATCH", "6"))
+HISTORY_TOKEN_BUDGET = int(os.environ.get("HISTORY_TOKEN_BUDGET", "6000"))
+HISTORY_SUMMARY_PROMPT = (
+    "Update the running summary of a conversation between a user and an API assistant.\n"
+    "Keep facts, names, IDs, decisions and open questions; drop pleasantries and formatting.\n"
+    "Reply with the updated summary only.\n\n"
+    "Current summary:\n{summary}\n\nNew messages:\n{transcript}"
+)
+BUDGET_SUMMARY_TIMEOUT = float(os.environ.get("QUERY_BUDGET_SUMMARY_TIMEOUT", "30"))
+BUDGET_SUMMARY_PROMPT = (
+    "The budget for this request is exhausted ({reason}). Do not call any more tools. "
+    "Answer the original question as well as possible from the information gathered so far "
+    "and state clearly what could not be completed."
+)
+
+SYSTEM_PROMPT = """
+You are a **reasoning-focused AI agent** designed to autonomously process user queries with minimal clarification. For every task, apply deep reasoning and structured thinking as follows:
+
+---
+
+### 🧠 Self-Directed Reasoning
+
+* Thoroughly **analyze the user’s request** without needing clarification.
+* Make **intelligent assumptions** where appropriate to reduce dependency on user input.
+* Use **step-by-step logical reasoning** to construct a complete and accurate response.
+* If a tool is required, **use it effectively**. Otherwise, rely on inbuilt reasoning and capabilities to complete the task.**.
+* Return the function call required, Don't run the tool by yourself
+* If a tool result is `{"error": {...}}`, read its `type`: retry a `retryable` error at most once, otherwise tell the user the service is unavailable instead of guessing the data.
+
+---
+
+### 📝 Professional Output Formatting
+
+* Format all responses in **clear, polished Markdown**.
+
+* Always structure content with:
+
+  * **Headings** and **subheadings** for clarity
+  * **Bullet points** for lists
+  * **Tables** for structured data
+  * **Code blocks** for code, logs, or technical outputs
+
+* When generating visual content or charts:
+
+  * Use embedded Markdown images:
+  ![Chart](image_url)
+
+    Example:
+    ```markdown
+    ![Chart](https://example.com/chart.png)
+    ```
+  * **Do not** show raw image URLs unless explicitly requested.
+
+---
+
+### 📊 Data Handling and Presentation
+
+* Default to **tables, charts, or structured summaries** for data.
+* Use visual organization to enhance **readability and professional presentation**.
+
+---
+
+### 🔐 API Keys and Tools
+
+* **Never ask the user for API keys.**
+* Assume all required credentials are **pre-configured** and available to tools.
+"""
+
+
+def _merge_text_parts(parts: List[types.Part]) -> List[types.Part]:
+    """Joins consecutive streamed text chunks back into single text parts."""
+    merged = []
+    for part in parts:
+        if part.text is not None and part.function_call is None and merged \
+                and merged[-1].text is not None and merged[-1].function_call is None:
+            merged[-1] = types.Part.from_text(text=merged[-1].text + part.text)
+        else:
+            merged.append(part)
+    return merged
+
+
+def _reported_failure(result) -> bool:
+    """
+    Whether the server reported the call as failed: isError, or the "Error: ..."
+    text that servers generated before failed API calls were raised return.
+    """
+    if result.isError:
+        return True
+    text = getattr(result.content[0], "text", None) if result.content else None
+    return isinstance(text, str) and text.startswith("Error")
+
+
+_SERVER_FAILURE = re.compile(
+    r"^Error(?: executing tool \S+)?:\s*(?:5\d\d\b|.*\b(?:cannot connect|connection|disconnected|timed out)\b)",
+    re.IGNORECASE,
+)
+
+
+def _server_failure(result) -> bool:
+    """
+    Whether a reported failure means the API behind the tool is down: a 5xx
+    status or a connection error. Argument errors and 4xx answers are the
+    caller's doing and do not count against the server's breaker.
+    """
+    if not _reported_failure(result):
+        return False
+    text = getattr(result.content[0], "text", None) if result.content else None
+    return isinstance(text, str) and _SERVER_FAILURE.match(text) is not None
 
 
 class MCPClient:
-    def __init__(self):
+    def __init__(self, llm: Optional[LLMBackend] = None):
         logger.info("Initializing MCPClient")
         self.sessions: Optional[List[Tuple[ClientSession, str]]] = []
-        self.exit_stack = AsyncExitStack()
-        self.client = genai.Client(vertexai=True, project="apimanager-12", location="us-central1")
+        self.server_handles: Dict[str, ServerHandle] = {}
+        self.startup_report: Optional[Dict[str, Any]] = None
+        self._storage_client = None
+        self.script_cache = ScriptCache()
+        self.failed_scripts: Dict[str, str] = {}
+        self._reconcile_lock = asyncio.Lock()
+        self._spawning: Dict[str, asyncio.Future] = {}
+        self.llm = llm or get_llm_backend(project="apimanager-12", location="us-central1")
         self.bucket_name = os.environ.get("SERVER_BUCKET_NAME")
 
         # MongoDB setup
@@ -40,15 +203,68 @@ class MCPClient:
         self.db = self.mongo_client.get_database("mcp_dac_assistant")
         self.sessions_collection = self.db.get_collection("user_sessions")
         self.default_servers = []
-        self.available_tools = []
-        self.tool_to_session = {}
-
-    async def _get_recent_messages(self, session_id: str) -> List[Dict[str, str]]:
-        logger.debug(f"Fetching recent messages for session: {session_id}")
-        session = await self.sessions_collection.find_one({"session_id": session_id})
-        if session and "messages" in session:
-            return session["messages"][-6:]
-        return []
+        self.registry = ToolRegistry()
+        self.server_sessions = {}
+        self.script_to_server = {}
+        self.tool_manifest = load_tool_manifest(TOOL_MANIFEST_PATH)
+        self.tool_index = ToolIndex(scorer=TOOL_INDEX_SCORER)
+        self.context_cache = None
+        if CONTEXT_CACHE_ENABLED and self.llm.caches is not None:
+            self.context_cache = ContextCacheManager(self.llm.caches, model=MODEL_NAME, ttl=CONTEXT_CACHE_TTL)
+        self.response_cache = None
+        self.resilience = ResilienceManager()
+        self.tool_result_cache = None
+        if TOOL_RESULT_CACHE_ENABLED:
+            self.tool_result_cache = ToolResultCache(
+                max_bytes=TOOL_RESULT_CACHE_MAX_BYTES,
+                default_ttl=TOOL_RESULT_CACHE_TTL,
+                server_ttls=TOOL_RESULT_CACHE_SERVER_TTLS
+            )
+        if RESPONSE_CACHE_ENABLED:
+            self.response_cache = ResponseCache(
+                max_bytes=RESPONSE_CACHE_MAX_BYTES,
+                default_ttl=RESPONSE_CACHE_TTL,
+                tool_ttls=RESPONSE_CACHE_TOOL_TTLS,
+                similarity_threshold=RESPONSE_CACHE_SIMILARITY,
+                min_terms=RESPONSE_CACHE_MIN_TERMS
+            )
+        self.history = HistoryManager(
+            self.sessions_collection,
+            self._summarize_history,
+            keep_messages=HISTORY_KEEP_MESSAGES,
+            summarize_batch=HISTORY_SUMMARIZE_BATCH,
+            token_budget=HISTORY_TOKEN_BUDGET
+        )
+        self._background_tasks = set()
+
+    async def _summarize_history(self, summary: str, messages: List[Dict[str, str]]) -> str:
+        transcript = "\n".join(f"{message['role']}: {message['content']}" for message in messages)
+        prompt = HISTORY_SUMMARY_PROMPT.format(summary=summary or "(none)", transcript=transcript)
+        # Called without the agent's system prompt and tools: this is a plain summarization request.
+        response = await self.llm.generate(
+            model=MODEL_NAME,
+            contents=[types.Content(role="user", parts=[types.Part.from_text(text=prompt)])],
+            config=types.GenerateContentConfig(temperature=0.2)
+        )
+        return response.text.strip()
+
+    def _run_in_background(self, coro):
+        task = asyncio.create_task(coro)
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
+
+    def _schedule_history_update(self, session_id: str):
+        self._run_in_background(self.history.update(session_id))
+
+    def _schedule_credentials_prefetch(self, email: str):
+        """Warms the credential cache for every connected API when a user starts a session."""
+        versioned_content_ids = {
+            server_name.split("_")[0]
+            for server_name in self.registry.snapshot.by_server
+            if server_name not in self.default_servers and server_name.count("_") == 1
+        }
+        if versioned_content_ids:
+            self._run_in_background(prefetch_user_subscriptions(email, versioned_content_ids))
 
     async def _save_message(self, session_id: str, role: str, content: str):
         await self.sessions_collection.update_one(
@@ -60,91 +276,485 @@ class MCPClient:
             upsert=True
         )
 
+    async def _get_used_tools(self, session_id: str) -> List[str]:
+        session = await self.sessions_collection.find_one({"session_id": session_id}, {"used_tools": 1})
+        if session and "used_tools" in session:
+            return session["used_tools"]
+        return []
+
+    async def _save_used_tools(self, session_id: str, tool_names: List[str]):
+        await self.sessions_collection.update_one(
+            {"session_id": session_id},
+            {"$addToSet": {"used_tools": {"$each": tool_names}}},
+            upsert=True
+        )
+
     async def add_tools(self, session,server_meta):
         logger.info(f"Adding tools from server: {server_meta.serverInfo.name}")
         try:
+            server_name = server_meta.serverInfo.name
             response = await session.list_tools()
-            for tool in response.tools:
-                self.tool_to_session[tool.name] = (session, server_meta.serverInfo.name)
-                self.available_tools.append(
-                    types.Tool(
-                        function_declarations=[{
-                            "name": tool.name,
-                            "description": tool.description,
-                            "parameters": {
-                                k: v for k, v in tool.inputSchema.items()
-                                if k not in ["additionalProperties", "$schema"]
-                            },
-                        }]
-                    )
-                )
+            self.server_sessions[server_name] = session
+            diff = self.registry.replace_server(
+                server_name, [RegisteredTool.from_mcp(tool, server_name) for tool in response.tools]
+            )
+            await self._apply_tool_diff(diff)
         except Exception as e:
             logger.error(f"Error adding tools from server {server_meta.serverInfo.name}: {e}")
             raise ValueError(f"Error adding tools")
 
-    async def connect_to_servers_from_directory(self, bucket_name: str, prefix: str = ""):
-        logger.info(f"Connecting to servers from bucket: {bucket_name}, prefix: {prefix}")
-        try:
-            self.sessions = []
-            storage_client = storage.Client()
-            bucket = storage_client.bucket(bucket_name)
-            blobs = bucket.list_blobs(prefix=prefix)
+    async def _apply_tool_diff(self, diff):
+        """Brings the tool index and context cache in line with a registry swap."""
+        if not diff:
+            return
+        snapshot = self.registry.snapshot
+        for name in diff.removed:
+            self.tool_index.remove(name)
+        for name in diff.added + diff.changed:
+            tool = snapshot.get(name)
+            self.tool_index.add(tool.name, tool.description, tool.parameters)
+        if self.context_cache:
+            await self.context_cache.invalidate()
+
+    def _snapshot(self, snapshot=None):
+        """The registry snapshot a query started with, else the current one."""
+        return self.registry.snapshot if snapshot is None else snapshot
+
+    def _validate_arguments(self, tool_name: str, arguments: Dict[str, Any], snapshot=None) -> Dict[str, Any]:
+        """
+        Checks and coerces the model's arguments against the tool's compiled schema,
+        so malformed calls fail here instead of after auth lookups and a server round trip.
+        """
+        tool = self._snapshot(snapshot).get(tool_name)
+        if tool is None or not TOOL_ARGUMENT_VALIDATION:
+            return arguments
+        arguments, errors = tool.validate(arguments)
+        if errors:
+            raise ToolFailure(
+                "invalid_arguments", tool.server, tool_name,
+                f"{'; '.join(errors)}. Expected {tool.signature()}", retryable=True
+            )
+        return arguments
 
-            script_files = [
-                f"gs://{bucket_name}/{blob.name}"
+    def _register_session(self, session: ClientSession, server_name: str):
+        """Records a connected server, replacing the entry of an earlier connection with the same name."""
+        self.sessions = [entry for entry in self.sessions if entry[1] != server_name] + [(session, server_name)]
+
+    def _session_for(self, tool_name: str, snapshot=None) -> Optional[Tuple[ClientSession, str]]:
+        tool = self._snapshot(snapshot).get(tool_name)
+        if tool is None or tool.server not in self.server_sessions:
+            return None
+        return self.server_sessions[tool.server], tool.server
+
+    def _storage(self):
+        if self._storage_client is None:
+            self._storage_client = storage.Client()
+        return self._storage_client
+
+    async def connect_to_servers_from_directory(self, bucket_name: str, prefix: str = ""):
+        """
+        Startup: starts every server script in the bucket and the default servers.
+        Scripts that failed to start before are retried.
+        """
+        self.failed_scripts = {}
+        await self.reconcile_servers(bucket_name, prefix, include_defaults=True)
+
+    async def reconcile_servers(self, bucket_name: str, prefix: str = "", include_defaults: bool = False):
+        """
+        Brings the running servers in line with the bucket: starts scripts that are
+        new, restarts the ones whose content changed (or whose process died), stops
+        the ones whose blob is gone and leaves everything else running. The tool
+        registry is updated only for the servers that changed.
+
+        Starts run at most SERVER_STARTUP_CONCURRENCY at a time and a server that
+        fails is reported and skipped; a script version that failed is not retried
+        until it changes or the client reconnects from scratch. A restarted server
+        keeps serving until its replacement is connected. The outcome, with
+        per-server timings, is returned and kept in `startup_report`.
+        """
+        async with self._reconcile_lock:
+            logger.info(f"Reconciling servers with bucket: {bucket_name}, prefix: {prefix}")
+            started = time.perf_counter()
+            try:
+                bucket = self._storage().bucket(bucket_name)
+                blobs = await asyncio.to_thread(lambda: list(bucket.list_blobs(prefix=prefix)))
+            except Exception as e:
+                logger.error(f"Failed to connect to servers: {e}")
+                raise RuntimeError(f"Failed to connect to servers: {e}")
+
+            desired = {
+                f"gs://{bucket_name}/{blob.name}": blob
                 for blob in blobs
                 if blob.name.endswith(".py") or blob.name.endswith(".js")
-            ]
+            }
+            manifests = {blob.name[:-len(MANIFEST_SUFFIX)]: blob for blob in blobs if is_manifest(blob.name)}
+            running = {
+                handle.script: handle for handle in self.server_handles.values()
+                if handle.script and handle.script.startswith(f"gs://{bucket_name}/{prefix}")
+            }
+
+            reports, connects, unchanged, skipped, retarget = [], [], 0, [], []
+            for path, blob in desired.items():
+                version = blob_version(blob)
+                handle = running.get(path)
+                if handle is not None and (
+                        handle.version == version and (handle.running or handle.state == IDLE) or handle.state == STOPPED
+                ):
+                    # Stopped through the admin API: left alone until started again or deleted,
+                    # but it starts the current version of the script.
+                    if handle.state == STOPPED and handle.version != version:
+                        retarget.append((handle, blob))
+                    unchanged += 1
+                elif self.failed_scripts.get(path) == version:
+                    skipped.append(path)
+                else:
+                    reports.append({"script": path, "action": "restart" if handle is not None else "start"})
+                    connects.append(
+                        lambda timings, path=path, blob=blob: self.connect_to_server(
+                            path, timings=timings, blob=blob, manifest_blob=manifests.get(blob.name)
+                        )
+                    )
+            if include_defaults and not self._default_server_running():
+                reports.append({"script": "quickchart-server", "action": "start"})
+                connects.append(self.connect_default_servers)
 
-            for server_script_path in script_files:
-                await self.connect_to_server(server_script_path)
-            await self.connect_default_servers()
+            removed = [handle.name for path, handle in running.items() if path not in desired]
+            await self._remove_servers(removed)
 
-        except Exception as e:
-            logger.error(f"Failed to connect to servers: {e}")
-            raise RuntimeError(f"Failed to connect to servers: {e}")
+            downloads = self.script_cache.downloads
+            semaphore = asyncio.Semaphore(SERVER_STARTUP_CONCURRENCY)
+
+            async def bounded(connect, timings):
+                async with semaphore:
+                    await connect(timings=timings)
+
+            await asyncio.gather(*(bounded(connect, timings) for connect, timings in zip(connects, reports)))
+            for handle, blob in retarget:
+                try:
+                    script_path = await asyncio.to_thread(self.script_cache.fetch, bucket_name, blob)
+                except Exception as e:
+                    logger.warning(f"Could not fetch the new version of stopped server {handle.name}: {e}")
+                    continue
+                handle.params = handle.params.model_copy(update={"args": [script_path]})
+                handle.version = blob_version(blob)
+
+            for timings in reports:
+                blob = desired.get(timings["script"])
+                if blob is None:
+                    continue
+                if timings.get("ok"):
+                    self.failed_scripts.pop(timings["script"], None)
+                else:
+                    self.failed_scripts[timings["script"]] = blob_version(blob)
+            try:
+                # Scripts that handles would start from are kept even if the bucket moved on.
+                in_use = [handle.params.args[0] for handle in self.server_handles.values() if handle.params.args]
+                await asyncio.to_thread(self.script_cache.prune, bucket_name, blobs, prefix, in_use)
+            except Exception as e:
+                logger.warning(f"Failed to prune the script cache: {e}")
+
+            failed = [timings for timings in reports if not timings.get("ok")]
+            self.startup_report = {
+                "finished_at": datetime.now().isoformat(),
+                "total_s": round(time.perf_counter() - started, 3),
+                "concurrency": SERVER_STARTUP_CONCURRENCY,
+                "started": len(reports) - len(failed),
+                "failed": len(failed),
+                "stopped": len(removed),
+                "unchanged": unchanged,
+                "skipped": skipped,
+                "downloads": self.script_cache.downloads - downloads,
+                "servers": reports,
+            }
+            logger.info(
+                f"Reconciled servers in {self.startup_report['total_s']}s: {len(reports) - len(failed)} started, "
+                f"{len(failed)} failed, {len(removed)} stopped, {unchanged} unchanged"
+                + (f", failed: {[timings['script'] for timings in failed]}" if failed else "")
+            )
+            return self.startup_report
+
+    def _default_server_running(self) -> bool:
+        handle = self.server_handles.get("quickchart-server")
+        return handle is not None and handle.running
+
+    async def _remove_servers(self, server_names):
+        """Stops servers and forgets them."""
+        server_names = {name for name in server_names if name}
+        if not server_names:
+            return
+        handles = [self.server_handles.pop(name) for name in server_names if name in self.server_handles]
+        await self._detach_servers(server_names)
+        await asyncio.gather(*(handle.stop() for handle in handles))
+        logger.info(f"Stopped servers: {sorted(server_names)}")
+
+    async def _detach_servers(self, server_names):
+        """Drops the sessions, tools and cached results of servers, leaving their handles alone."""
+        self.sessions = [entry for entry in self.sessions if entry[1] not in server_names]
+        self.server_sessions = {
+            server_name: session for server_name, session in self.server_sessions.items()
+            if server_name not in server_names
+        }
+        self.script_to_server = {
+            script: server_name for script, server_name in self.script_to_server.items()
+            if server_name not in server_names
+        }
+        await self._apply_tool_diff(self.registry.remove_servers(server_names))
+        for server_name in server_names:
+            self._invalidate_api_details(server_name)
+            self.resilience.reset(server_name)
+            if self.tool_result_cache:
+                self.tool_result_cache.invalidate(server=server_name)
+
+    async def stop_server(self, server_name: str):
+        """Stops one server and withdraws its tools. It stays stopped, also across reconciles, until started."""
+        handle = self._handle(server_name)
+        await self._detach_servers({server_name})
+        await handle.stop()
+        logger.info(f"Server {server_name} stopped")
+        return handle.describe()
+
+    async def start_server(self, server_name: str):
+        """Starts a stopped server again and registers its tools."""
+        handle = self._handle(server_name)
+        if handle.running:
+            return handle.describe()
+        await handle.start(timeout=SERVER_STARTUP_TIMEOUT)
+        await self._attach(handle, {})
+        return handle.describe()
+
+    async def restart_server(self, server_name: str):
+        """Restarts one server's process and registers its tools again."""
+        handle = self._handle(server_name)
+        await self._detach_servers({server_name})
+        await handle.restart(timeout=SERVER_STARTUP_TIMEOUT)
+        await self._attach(handle, {})
+        logger.info(f"Server {server_name} restarted")
+        return handle.describe()
+
+    def _handle(self, server_name: str) -> ServerHandle:
+        handle = self.server_handles.get(server_name)
+        if handle is None:
+            raise KeyError(server_name)
+        return handle
+
+    def server_states(self) -> List[Dict[str, Any]]:
+        return [handle.describe() for handle in self.server_handles.values()]
+
+    def server_tools(self) -> Dict[str, Dict[str, Any]]:
+        """Per bucket script, its server and tools as registered (from its manifest or list_tools())."""
+        snapshot = self.registry.snapshot
+        servers = {}
+        for handle in self.server_handles.values():
+            if not handle.script or not handle.script.startswith("gs://"):
+                continue
+            servers[handle.script[5:].split("/", 1)[1]] = {
+                "server": handle.name,
+                "state": handle.state,
+                "tools": [
+                    {"name": name, "read_only": self.is_read_only_tool(name)}
+                    for name in snapshot.by_server.get(handle.name, ())
+                ],
+            }
+        return servers
+
+    def _get_blob(self, server_script_path: str):
+        bucket_name, blob_name = server_script_path[5:].split("/", 1)
+        blob = self._storage().bucket(bucket_name).get_blob(blob_name)
+        if blob is None:
+            raise FileNotFoundError(f"{server_script_path} does not exist")
+        return blob
+
+    def _load_manifest(self, bucket_name: str, script_blob, manifest_blob=None) -> Optional[Dict[str, Any]]:
+        """The script's tool manifest if there is one and it was built from this version of the script."""
+        if manifest_blob is None:
+            manifest_blob = self._storage().bucket(bucket_name).get_blob(manifest_name(script_blob.name))
+        if manifest_blob is None:
+            return None
+        manifest = read_manifest(self.script_cache.fetch(bucket_name, manifest_blob))
+        if not manifest_matches(manifest, blob_version(script_blob)):
+            logger.info(f"Tool manifest of {script_blob.name} does not match the script, listing its tools instead")
+            return None
+        return manifest
+
+    def _save_manifest(self, bucket_name: str, script_blob, script_path: str, server_name: str):
+        """Writes the manifest of a script that had none (or a stale one) from the tools its server just listed."""
+        with open(script_path, "rb") as script_file:
+            manifest = build_manifest(server_name, self._listed_tools(server_name), script_file.read())
+        upload_manifest(self._storage().bucket(bucket_name), script_blob.name, manifest)
+        logger.info(f"Wrote tool manifest for {script_blob.name}")
+
+    async def _start_server(self, server_params: StdioServerParameters, label: str, timings: Dict[str, Any],
+                            script: Optional[str] = None, version: Optional[str] = None,
+                            manifest: Optional[Dict[str, Any]] = None, transport: str = STDIO) -> InitializeResult:
+        """
+        Spawns a server and registers it, replacing (and then stopping) an earlier
+        process of the same server. Its tools come from `manifest` when given,
+        otherwise from list_tools().
+        """
+        step = time.perf_counter()
+        handle = ServerHandle(server_params, label, script=script, version=version, transport=transport)
+        server_meta = await handle.start(timeout=SERVER_STARTUP_TIMEOUT)
+        timings.update(server=handle.name, start_s=round(time.perf_counter() - step, 3))
+
+        previous = self.server_handles.get(handle.name)
+        if manifest is not None and manifest["server"] == handle.name:
+            await self._apply_tool_diff(self.registry.replace_server(handle.name, manifest_tools(manifest)))
+            timings.update(manifest=True)
+            await self._attach(handle, timings, list_tools=False)
+        else:
+            await self._attach(handle, timings)
+        if previous is not None and previous is not handle:
+            await previous.stop()
+        return server_meta
+
+    async def _attach(self, handle: ServerHandle, timings: Dict[str, Any], list_tools: bool = True):
+        """
+        Routes calls to a started server, first listing and registering its tools
+        unless they were registered from its manifest. Stops the server if that fails.
+        """
+        server_name = handle.name
+        step = time.perf_counter()
+        if list_tools:
+            try:
+                await self.add_tools(handle.session, handle.server_meta)
+            except Exception:
+                await handle.stop()
+                raise
+        else:
+            self.server_sessions[server_name] = handle.session
+        timings.update(
+            tools_s=round(time.perf_counter() - step, 3),
+            tools=len(self.registry.snapshot.by_server.get(server_name, ()))
+        )
+        self.server_handles[server_name] = handle
+        self._register_session(handle.session, server_name)
+        self.resilience.reset(server_name)
 
-    async def connect_to_server(self, server_script_path: str):
+    async def connect_to_server(self, server_script_path: str, timings: Optional[Dict[str, Any]] = None, blob=None,
+                                manifest_blob=None):
         logger.info(f"Connecting to server from script: {server_script_path}")
         is_python = server_script_path.endswith(".py")
         is_js = server_script_path.endswith(".js")
         if not (is_python or is_js):
             raise ValueError("Server script must be a .py or .js file")
 
+        timings = timings if timings is not None else {}
+        started = time.perf_counter()
+        script, version, manifest = server_script_path, None, None
         try:
             if server_script_path.startswith("gs://"):
-                storage_client = storage.Client()
-                bucket_name, blob_name = server_script_path[5:].split("/", 1)
-                bucket = storage_client.bucket(bucket_name)
-                blob = bucket.blob(blob_name)
-                file_content = blob.download_as_text()
-
-                local_path = os.path.join("/tmp", os.path.basename(blob_name))
-                with open(local_path, "w") as temp_file:
-                    temp_file.write(file_content)
-                server_script_path = local_path
+                # Only a version that is not in the script cache yet is downloaded.
+                if blob is None:
+                    blob = await asyncio.to_thread(self._get_blob, server_script_path)
+                bucket_name = server_script_path[5:].split("/", 1)[0]
+                server_script_path = await asyncio.to_thread(self.script_cache.fetch, bucket_name, blob)
+                version = blob_version(blob)
+                try:
+                    manifest = await asyncio.to_thread(self._load_manifest, bucket_name, blob, manifest_blob)
+                except Exception as e:
+                    logger.warning(f"Could not load the tool manifest of {script}: {e}")
+                timings["download_s"] = round(time.perf_counter() - started, 3)
 
             load_dotenv()
             command = "python" if is_python else "node"
             server_params = StdioServerParameters(command=command, args=[server_script_path], env=os.environ.copy())
-
-            stdio_transport = await self.exit_stack.enter_async_context(stdio_client(server_params))
-            self.stdio, self.write = stdio_transport
-
-            session = await self.exit_stack.enter_async_context(ClientSession(self.stdio, self.write))
-            server_meta = await session.initialize()
-            self.sessions.append((session, server_meta.serverInfo.name))
-            await self.add_tools(session, server_meta)
-
+            label = os.path.basename(server_script_path)
+            transport = server_transport(label)
+            timings["transport"] = transport
+            if manifest is not None and SERVER_SPAWN_MODE == "lazy":
+                server_name = await self._register_idle(
+                    server_params, label, timings, script, version, manifest, transport=transport
+                )
+            else:
+                server_meta = await self._start_server(
+                    server_params, label, timings, script=script, version=version, manifest=manifest,
+                    transport=transport
+                )
+                server_name = server_meta.serverInfo.name
+                if version is not None and not timings.get("manifest"):
+                    try:
+                        await asyncio.to_thread(self._save_manifest, bucket_name, blob, server_script_path, server_name)
+                    except Exception as e:
+                        logger.warning(f"Could not write the tool manifest of {script}: {e}")
+            self.script_to_server[label] = server_name
+            self._invalidate_api_details(server_name)
 
             logger.info(f"Server added from {server_script_path}")
+            timings.update(ok=True, total_s=round(time.perf_counter() - started, 3))
             return (True, "")
         except Exception as e:
             logger.error(f"Error connecting to server {server_script_path}: {e}")
+            timings.update(ok=False, error=str(e) or type(e).__name__, total_s=round(time.perf_counter() - started, 3))
             return (False, str(e))
 
-    async def connect_default_servers(self):
+    def _listed_tools(self, server_name: str) -> List[Dict[str, Any]]:
+        snapshot = self.registry.snapshot
+        return [
+            tool_entry(tool.name, tool.description, tool.parameters, tool.annotations)
+            for tool in (snapshot.get(name) for name in snapshot.by_server.get(server_name, ()))
+        ]
+
+    async def _register_idle(self, server_params: StdioServerParameters, label: str, timings: Dict[str, Any],
+                             script: str, version: str, manifest: Dict[str, Any], transport: str = STDIO) -> str:
+        """Registers a server's tools from its manifest without spawning it; see `_acquire_session`."""
+        server_name = manifest["server"]
+        handle = ServerHandle(
+            server_params, label, script=script, version=version, name=server_name, transport=transport
+        )
+        handle.state = IDLE
+        handle.on_demand = True
+        tools = manifest_tools(manifest)
+        await self._apply_tool_diff(self.registry.replace_server(server_name, tools))
+        previous = self.server_handles.get(server_name)
+        self.server_handles[server_name] = handle
+        # A running process of an older version would now serve the new tool list, so it goes.
+        self.sessions = [entry for entry in self.sessions if entry[1] != server_name]
+        self.server_sessions.pop(server_name, None)
+        if previous is not None and previous is not handle:
+            await previous.stop()
+        timings.update(server=server_name, tools=len(tools), idle=True)
+        return server_name
+
+    async def _acquire_session(self, tool_name: str, snapshot=None) -> Optional[Tuple[ClientSession, str]]:
+        """
+        The session serving a tool, spawning its server first if it is idle (or
+        its process died). Concurrent first calls share one spawn.
+        """
+        snapshot = self._snapshot(snapshot)
+        session = self._session_for(tool_name, snapshot)
+        handle = self.server_handles.get(session[1]) if session else None
+        if session is not None and (handle is None or handle.running):
+            return session
+        tool = snapshot.get(tool_name)
+        handle = self.server_handles.get(tool.server) if tool else None
+        if handle is None or handle.running or handle.state == STOPPED:
+            return session
+        spawn = self._spawning.get(tool.server)
+        if spawn is None:
+            spawn = asyncio.ensure_future(self._spawn_on_demand(handle))
+            self._spawning[tool.server] = spawn
+            spawn.add_done_callback(lambda _, server_name=tool.server: self._spawning.pop(server_name, None))
+        try:
+            await asyncio.shield(spawn)
+        except Exception as e:
+            raise ToolFailure(
+                "unavailable", tool.server, tool_name, f"Server {tool.server} could not be started: {e}",
+                retryable=False
+            )
+        return self._session_for(tool_name, snapshot)
+
+    async def _spawn_on_demand(self, handle: ServerHandle):
+        started = time.perf_counter()
+        await handle.start(timeout=SERVER_STARTUP_TIMEOUT)
+        # The tools were registered from the manifest, which matched the script, so they are not listed again.
+        await self._attach(handle, {}, list_tools=False)
+        handle.spawn_s = round(time.perf_counter() - started, 3)
+        logger.info(f"Spawned {handle.name} on demand in {handle.spawn_s}s")
+
+    async def connect_default_servers(self, timings: Optional[Dict[str, Any]] = None):
         logger.info("Connecting to default servers")
+        timings = timings if timings is not None else {}
+        started = time.perf_counter()
         try:
             load_dotenv()
             # command = "mcp-server-chart"
@@ -153,21 +763,17 @@ class MCPClient:
             command = "node"
             args = ["node_modules/@gongrzhe/quickchart-mcp-server/build/index.js"]
 
-            self.default_servers.append("quickchart-server")
+            if "quickchart-server" not in self.default_servers:
+                self.default_servers.append("quickchart-server")
             server_params = StdioServerParameters(command=command, args=args, env=os.environ.copy())
-
-            stdio_transport = await self.exit_stack.enter_async_context(stdio_client(server_params))
-            self.stdio, self.write = stdio_transport
-
-            session = await self.exit_stack.enter_async_context(ClientSession(self.stdio, self.write))
-            server_meta = await session.initialize()
-            self.sessions.append((session, server_meta.serverInfo.name))
-            await self.add_tools(session, server_meta)
+            await self._start_server(server_params, "quickchart-server", timings)
 
             logger.info("Default server 'quickchart-server' has been added")
+            timings.update(ok=True, total_s=round(time.perf_counter() - started, 3))
             return (True, "")
         except Exception as e:
             logger.error(f"Error connecting to server mcp-server-chart: {e}")
+            timings.update(ok=False, error=str(e) or type(e).__name__, total_s=round(time.perf_counter() - started, 3))
             return (False, str(e))
 
     async def delete_server(self, server_name: str):
@@ -177,79 +783,115 @@ class MCPClient:
             bucket = client.bucket(self.bucket_name)
             blob = bucket.blob(server_name)
             blob.delete()
+            manifest_blob = bucket.get_blob(manifest_name(server_name))
+            if manifest_blob is not None:
+                manifest_blob.delete()
+            await asyncio.to_thread(self.script_cache.forget, self.bucket_name, server_name)
+            await asyncio.to_thread(self.script_cache.forget, self.bucket_name, manifest_name(server_name))
+            if self.context_cache:
+                await self.context_cache.invalidate()
+            self._invalidate_api_details(self.script_to_server.pop(os.path.basename(server_name), None))
             return True
         except Exception as e:
             logger.error(f"Error deleting server: {e}")
             return False
 
-    async def make_llm_call(self, messages, use_tools=False):
+    def _invalidate_api_details(self, server_name: Optional[str]):
+        """Drops cached API details for a generated server, named <versioned_content_id>_<digital_content_id>."""
+        if not server_name or server_name in self.default_servers or server_name.count("_") != 1:
+            return
+        api_details_cache.invalidate(tuple(server_name.split("_")))
+
+    async def _generation_config(self, use_tools=False, tools=None, snapshot=None):
+        snapshot = self._snapshot(snapshot)
+        if tools is None:
+            all_tools = snapshot.gemini_tool()
+            tools = [all_tools] if all_tools else []
+        tools = tools if use_tools else None
+        attached = sum(len(tool.function_declarations or []) for tool in tools or [])
+        # Only the whole catalog is cached: the subsets picked per query rarely repeat.
+        if self.context_cache and attached == len(snapshot):
+            cached_content = self.context_cache.get(SYSTEM_PROMPT, tools)
+            if cached_content:
+                return types.GenerateContentConfig(temperature=0.4, cached_content=cached_content)
+        return types.GenerateContentConfig(
+            temperature=0.4,
+            tools=tools,
+            system_instruction=[types.Part.from_text(text=SYSTEM_PROMPT)]
+        )
+
+    async def make_llm_call(self, messages, use_tools=False, tools=None, budget: QueryBudgetTracker = None,
+                            snapshot=None):
         logger.info("Making LLM call")
+        if budget:
+            budget.start_llm_call()
         try:
-            response = self.client.models.generate_content(
-                model="gemini-2.0-flash-001",
-                contents=messages,
-                config=types.GenerateContentConfig(
-                    temperature=0.4,
-                    tools=self.available_tools,
-                    system_instruction=[
-                        types.Part.from_text(text="""
-You are a **reasoning-focused AI agent** designed to autonomously process user queries with minimal clarification. For every task, apply deep reasoning and structured thinking as follows:
-
----
-
-### 🧠 Self-Directed Reasoning
-
-* Thoroughly **analyze the user’s request** without needing clarification.
-* Make **intelligent assumptions** where appropriate to reduce dependency on user input.
-* Use **step-by-step logical reasoning** to construct a complete and accurate response.
-* If a tool is required, **use it effectively**. Otherwise, rely on inbuilt reasoning and capabilities to complete the task.**.
-* Return the function call required, Don't run the tool by yourself
-
----
-
-### 📝 Professional Output Formatting
-
-* Format all responses in **clear, polished Markdown**.
-
-* Always structure content with:
-
-  * **Headings** and **subheadings** for clarity
-  * **Bullet points** for lists
-  * **Tables** for structured data
-  * **Code blocks** for code, logs, or technical outputs
-
-* When generating visual content or charts:
-
-  * Use embedded Markdown images:
-  ![Chart](image_url)
-
-    Example:
-    ```markdown
-    ![Chart](https://example.com/chart.png)
-    ```
-  * **Do not** show raw image URLs unless explicitly requested.
-
----
-
-### 📊 Data Handling and Presentation
-
-* Default to **tables, charts, or structured summaries** for data.
-* Use visual organization to enhance **readability and professional presentation**.
-
----
-
-### 🔐 API Keys and Tools
-
-* **Never ask the user for API keys.**
-* Assume all required credentials are **pre-configured** and available to tools.
-""")
-                    ]
-                )
+            response = await asyncio.wait_for(
+                self.llm.generate(
+                    model=MODEL_NAME,
+                    contents=messages,
+                    config=await self._generation_config(use_tools, tools, snapshot)
+                ),
+                timeout=budget.remaining_time() if budget else None
             )
+            if budget:
+                budget.charge_llm(response.usage_metadata)
             return response
+        except TimeoutError:
+            raise BudgetExceeded("deadline")
+        except Exception as e:
+            logger.error(f"LLM call failed: {e}")
+            raise RuntimeError(f"LLM call failed: {e}")
+
+    async def make_llm_stream(self, messages, use_tools=False, tools=None, budget: QueryBudgetTracker = None,
+                              snapshot=None):
+        """Streams the model response, yielding each part as soon as it arrives."""
+        logger.info("Making streaming LLM call")
+        if budget:
+            budget.start_llm_call()
+        usage_metadata = None
+        try:
+            stream = await asyncio.wait_for(
+                self.llm.generate_stream(
+                    model=MODEL_NAME,
+                    contents=messages,
+                    config=await self._generation_config(use_tools, tools, snapshot)
+                ),
+                timeout=budget.remaining_time() if budget else None
+            )
+            chunks = stream.__aiter__()
+            while True:
+                try:
+                    chunk = await asyncio.wait_for(chunks.__anext__(), timeout=budget.remaining_time() if budget else None)
+                except StopAsyncIteration:
+                    break
+                usage_metadata = chunk.usage_metadata or usage_metadata
+                if not chunk.candidates or not chunk.candidates[0].content:
+                    continue
+                for part in chunk.candidates[0].content.parts or []:
+                    yield part
+        except TimeoutError:
+            raise BudgetExceeded("deadline")
         except Exception as e:
             logger.error(f"LLM call failed: {e}")
             raise RuntimeError(f"LLM call failed: {e}")
+        finally:
+            if budget:
+                budget.charge_llm(usage_metadata)
+
+    async def _summarize_on_budget(self, messages, reason: str, budget: QueryBudgetTracker) -> Optional[str]:
+        """Runs one final tool-less turn so a query that ran out of budget still gets an answer."""
+        summary_request = messages + [
+            types.Content(role="user", parts=[types.Part.from_text(text=BUDGET_SUMMARY_PROMPT.format(reason=reason))])
+        ]
+        try:
+            response = await asyncio.wait_for(self.make_llm_call(summary_request), timeout=BUDGET_SUMMARY_TIMEOUT)
+        except Exception as e:
+            logger.error(f"Budget summary failed: {e}")
+            return None
+        budget.iterations += 1
+        budget.charge_llm(response.usage_metadata)
+        return response.text
 
     # async def autenticate_tool(self, email: str, versioned_content_id: str) -> str:
     #     logger.debug(f"Authenticating tool for email: {email}")
@@ -257,26 +899,94 @@ You are a **reasoning-focused AI agent** designed to autonomously process user q
     #     api_key = authenticate_tool(user_credentials)
     #     return api_key
 
-    async def call_tool(self, tool_name: str, arguments: Dict[str, Any], user_id: str, sources:list = []) -> ToolCallResponse:
-                logger.info(f"Calling tool: {tool_name} with user ID: {user_id}")
+    async def _invoke_tool(self, session, tool_name: str, arguments: Dict[str, Any], user_id: str,
+                           budget: QueryBudgetTracker = None, request_results: Optional[dict] = None,
+                           snapshot=None) -> str:
+        """
+        Calls the tool on its server. Results of read-only tools come from the tool
+        result cache when fresh, and identical read-only calls within one query
+        share a single call. A successful call to any other tool drops the user's
+        cached results for that server.
+        """
+        async def invoke():
+            return await self.resilience.call(
+                session[1], tool_name,
+                lambda: session[0].call_tool(tool_name, arguments=arguments),
+                deadline=budget.remaining_time() if budget else None,
+                is_failure=_server_failure
+            )
+
+        if not self.is_read_only_tool(tool_name, snapshot):
+            result = await invoke()
+            if self.tool_result_cache and not _reported_failure(result):
+                self.tool_result_cache.invalidate(server=session[1], user_id=user_id)
+            return str(result.content[0].text)
+
+        key = tool_result_key(tool_name, arguments, user_id)
+        if request_results is not None and key in request_results:
+            logger.info(f"Reusing result of identical call to {tool_name} in this query")
+            return await asyncio.shield(request_results[key])
+        cached = self.tool_result_cache.get(key) if self.tool_result_cache else None
+        if cached is not None:
+            logger.info(f"Tool result cache hit for {tool_name}")
+            return cached
+
+        async def load():
+            result = await invoke()
+            text = str(result.content[0].text)
+            if self.tool_result_cache and not _reported_failure(result):
+                self.tool_result_cache.put(key, session[1], text)
+            return text
+
+        call = asyncio.ensure_future(load())
+        if request_results is not None:
+            request_results[key] = call
+        return await asyncio.shield(call)
+
+    async def call_tool(self, tool_name: str, arguments: Dict[str, Any], user_id: str, sources:list = [],
+                        budget: QueryBudgetTracker = None, request_results: Optional[dict] = None,
+                        snapshot=None) -> ToolCallResponse:
+        """
+        Calls a tool for a user. With a budget, the whole call (API details and
+        subscription lookups, spawning an idle server, the call itself) has to
+        finish before the query's deadline. `snapshot` is the registry snapshot the
+        query started with, so a reload mid-query does not change its tools.
+        """
+        logger.info(f"Calling tool: {tool_name} with user ID: {user_id}")
+        if budget:
+            budget.start_tool_call()
+        try:
+            return await asyncio.wait_for(
+                self._call_tool(tool_name, arguments, user_id, sources, budget, request_results, snapshot),
+                timeout=budget.remaining_time() if budget else None
+            )
+        except TimeoutError:
+            raise BudgetExceeded("deadline")
+
+    async def _call_tool(self, tool_name: str, arguments: Dict[str, Any], user_id: str, sources: list,
+                         budget: QueryBudgetTracker = None, request_results: Optional[dict] = None,
+                         snapshot=None) -> ToolCallResponse:
                 action = None
                 versioned_content_id = None
                 digital_content_id =  None
                 source = Source()
 
-                if not self.sessions:
+                if not self.sessions and not self.server_handles:
                     raise ValueError("No server sessions available. Please connect to a server first.")
 
                 try:
-                    session = self.tool_to_session.get(tool_name)
+                    arguments = self._validate_arguments(tool_name, arguments, snapshot)
+                    session = await self._acquire_session(tool_name, snapshot)
+                    if session is None:
+                        raise ValueError(f"Tool {tool_name} not found in any connected server.")
                     if session[1] not in self.default_servers:
                         versioned_content_id, digital_content_id = session[1].split("_")
-                        api_details = get_api_details(
+                        api_details = await get_api_details(
                             versioned_content_id=versioned_content_id,
                             digital_content_id=digital_content_id
                         )
                         if api_details.auth_flag:
-                            subscription_key = get_user_subscription_details(
+                            subscription_key = await get_user_subscription_details(
                                 versioned_content_id=versioned_content_id,
                                 user_id=user_id
                             )
@@ -300,25 +1010,170 @@ You are a **reasoning-focused AI agent** designed to autonomously process user q
                             source.content_type = api_details.content_type
                             source.source_url = f"{BASE_URL}/home/discover-apis/details?digitalContentId={digital_content_id}&versionedContentId={versioned_content_id}"
 
-                    result = await session[0].call_tool(tool_name, arguments=arguments)
+                    result_text = await self._invoke_tool(
+                        session, tool_name, arguments, user_id, budget, request_results, snapshot
+                    )
                     if session[1] not in self.default_servers:
-                        source.data = str(result.content[0].text)
+                        source.data = result_text
                         sources.append(source)
 
                     return ToolCallResponse(
-                        response=str(result.content[0].text),
+                        response=result_text,
                         action=action,
                         versioned_content_id=versioned_content_id,
                         digital_content_id=digital_content_id
                     )
 
+                except (ToolFailure, BudgetExceeded):
+                    raise
                 except Exception as e:
                     logger.error(f"Error calling tool {tool_name}: {e}")
                     raise ValueError(f"Error calling tool {tool_name}: {e}")
         # raise ValueError(f"Tool {tool_name} not found in any connected server.")
 
-    async def process_query(self, query: str, session_id: str, email: str = None, consent: bool = None):
+    async def _dispatch_tool_calls(self, function_calls, user_id: str, budget: QueryBudgetTracker = None,
+                                   request_results: Optional[dict] = None, snapshot=None):
+        """
+        Runs the function calls of one model turn concurrently, at most
+        MAX_CONCURRENT_TOOL_CALLS at a time, yielding (index, ToolCallResponse, sources)
+        as each call finishes. A failing call yields an error response instead of
+        aborting the turn.
+        """
+        semaphore = asyncio.Semaphore(MAX_CONCURRENT_TOOL_CALLS)
+
+        async def run(index, function_call):
+            tool_sources = []
+            async with semaphore:
+                logger.info(f"Calling tool: {function_call.name}")
+                try:
+                    tool_result = await self.call_tool(
+                        function_call.name, dict(function_call.args or {}), user_id, tool_sources, budget,
+                        request_results, snapshot
+                    )
+                except BudgetExceeded as e:
+                    logger.warning(f"Tool {function_call.name} skipped, budget exhausted: {e}")
+                    tool_result = ToolCallResponse(response=f"Error: tool call skipped, request budget exhausted ({e})")
+                except ToolFailure as e:
+                    logger.error(f"Tool {function_call.name} failed ({e.kind}): {e}")
+                    tool_result = ToolCallResponse(response=e.to_response())
+                except Exception as e:
+                    logger.error(f"Tool {function_call.name} failed: {e}")
+                    tool_result = ToolCallResponse(response=f"Error: {e}")
+            return index, tool_result, tool_sources
+
+        tasks = [asyncio.create_task(run(index, function_call)) for index, function_call in enumerate(function_calls)]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    def select_tools(self, query: str, used_tools: List[str], snapshot=None):
+        """Scores the query against the tool index and returns the selection and the Tools to attach."""
+        snapshot = self._snapshot(snapshot)
+        selection = self.tool_index.select(query, top_k=TOOL_INDEX_TOP_K, always_include=used_tools)
+        tool = snapshot.gemini_tool(selection.names)
+        logger.info(f"Attaching {len(selection.names)} of {len(snapshot)} tools: {selection.names}")
+        return selection, [tool] if tool else []
+
+    def _log_tool_recall(self, session_id: str, selection, called_tools):
+        recall = selection.recall(called_tools)
+        if recall is None:
+            return
+        missed = [name for name in called_tools if name not in selection.ranking[:selection.top_k]]
+        logger.info(
+            f"Tool selection recall@{selection.top_k} for session {session_id}: {recall:.2f} "
+            f"(called: {sorted(called_tools)}, outside top-k: {missed})"
+        )
+
+    def _tool_annotations(self, tool_name: str, snapshot=None):
+        tool = self._snapshot(snapshot).get(tool_name)
+        return tool.annotations if tool else None
+
+    def is_mutating_tool(self, tool_name: str, snapshot=None) -> bool:
+        return is_mutating_tool(tool_name, self._tool_annotations(tool_name, snapshot))
+
+    def is_read_only_tool(self, tool_name: str, snapshot=None) -> bool:
+        return is_read_only_tool(tool_name, self._tool_annotations(tool_name, snapshot), self.tool_manifest)
+
+    async def _lookup_response(self, email: str, query: str, session_id: str):
+        """
+        Returns a cached answer for the query, unless it would most likely call a
+        mutating tool or continues a conversation: answers are only shared between
+        the first queries of sessions, whose meaning does not depend on earlier turns.
+        """
+        if self.response_cache is None or email is None or not self.response_cache.cacheable(query):
+            return None
+        predicted_tool = self.tool_index.best_match(query)
+        if predicted_tool and self.is_mutating_tool(predicted_tool):
+            logger.info(f"Response cache bypassed, query likely calls mutating tool {predicted_tool}")
+            self.response_cache.bypass()
+            return None
+        if await self.history.has_history(session_id):
+            logger.info("Response cache bypassed, the query follows earlier turns of the session")
+            self.response_cache.bypass()
+            return None
+        cached = self.response_cache.lookup(email, query)
+        logger.info(f"Response cache {'hit' if cached else 'miss'}, stats: {self.response_cache.stats()}")
+        return cached
+
+    def _cache_response(self, email: str, query: str, result: Dict[str, Any], called_tools, had_history: bool,
+                        snapshot=None):
+        if self.response_cache is None:
+            return
+        result["cache_hit"] = False
+        if email is None or had_history or result.get("action"):
+            return
+        if any(self.is_mutating_tool(name, snapshot) for name in called_tools):
+            return
+        self.response_cache.store(email, query, result, called_tools)
+
+    async def _stream_turn(self, messages, candidate: list, tools=None, budget: QueryBudgetTracker = None,
+                           snapshot=None):
+        """Streams one model turn, yielding token events and collecting its parts into `candidate`."""
+        async for part in self.make_llm_stream(messages=messages, use_tools=True, tools=tools, budget=budget,
+                                               snapshot=snapshot):
+            if part.text and part.function_call is None:
+                yield {"event": "token", "data": {"text": part.text}}
+            candidate.append(part)
+
+    async def stream_query(self, query: str, session_id: str, email: str = None, consent: bool = None,
+                           budget: QueryBudget = None):
+        """
+        Runs the query loop and yields events as they happen.
+
+        Events are dicts with an "event" name and a "data" payload:
+        "token" (incremental model text), "tool_call" (tool name and arguments),
+        "tool_result" (tool completion), "sources" (sources collected so far) and
+        a final "done" carrying the same result dict returned by `process_query`.
+
+        `budget` caps LLM turns, tool calls, tokens and wall-clock time for this
+        query; when a limit is hit the loop ends with one tool-less summary turn.
+        Once the query finishes the session history summary is updated in the background.
+        """
+        try:
+            async for event in self._run_query(query, session_id, email, consent, budget):
+                yield event
+        finally:
+            self._schedule_history_update(session_id)
+
+    async def _run_query(self, query: str, session_id: str, email: str, consent: bool, budget: QueryBudget):
         logger.info(f"Processing query for session: {session_id}")
+        cached = await self._lookup_response(email, query, session_id)
+        if cached:
+            await self._save_message(session_id, "user", query)
+            await self._save_message(session_id, "model", cached["message"])
+            cached["cache_hit"] = True
+            cached.pop("usage", None)
+            yield {"event": "token", "data": {"text": cached["message"]}}
+            yield {"event": "done", "data": cached}
+            return
+
+        budget = QueryBudgetTracker(budget)
+        request_results = {}
+        # The tools this query sees, kept for all its turns even if the servers are reloaded meanwhile.
+        snapshot = self.registry.snapshot
         final_text_parts = []
         used_tools = None
         action = None
@@ -326,13 +1181,15 @@ You are a **reasoning-focused AI agent** designed to autonomously process user q
         digital_content_id = None
         sources = []
 
-        messages = await self._get_recent_messages(session_id)
-        messages = [
-            types.Content(
-                role=message["role"],
-                parts=[types.Part.from_text(text=message["content"])]
-            ) for message in messages
-        ]
+        messages, used_tool_names = await asyncio.gather(
+            self.history.load(session_id),
+            self._get_used_tools(session_id)
+        )
+        had_history = bool(messages)
+        if email and not had_history:
+            self._schedule_credentials_prefetch(email)
+        selection, tools = self.select_tools(query, used_tool_names, snapshot)
+        called_tools = set()
         messages.append(
             types.Content(
                 role="user",
@@ -343,28 +1200,32 @@ You are a **reasoning-focused AI agent** designed to autonomously process user q
         await self._save_message(session_id, "user", query)
 
         try:
-            llm_response = await self.make_llm_call(messages=messages, use_tools=True)
+            candidate = []
+            async for event in self._stream_turn(messages, candidate, tools, budget, snapshot):
+                yield event
 
-            while llm_response and llm_response.candidates[0].content.parts:
-                candidate = llm_response.candidates[0].content.parts
+            while candidate:
+                candidate = _merge_text_parts(candidate)
 
                 if len(candidate) == 1 and getattr(candidate[0], "function_call", None) is None:
                     logger.debug("Final response without tool usage.")
                     final_text_parts.append(candidate[0].text)
                     await self._save_message(session_id, "model", candidate[0].text)
-                    return {
+                    self._log_tool_recall(session_id, selection, called_tools)
+                    result = {
                         "message": "\n".join(final_text_parts),
                         "action": action,
                         "versioned_content_id": versioned_content_id,
                         "digital_content_id": digital_content_id,
                         "tool_call": used_tools,
-                        "sources": sources
+                        "sources": sources,
+                        "usage": budget.usage()
                     }
+                    self._cache_response(email, query, result, called_tools, had_history, snapshot)
+                    yield {"event": "done", "data": result}
+                    return
 
-                # if getattr(llm_response, "text", None):
-                #     final_text_parts.append(llm_response.text)
-                #     await self._save_message(session_id, "model", llm_response.text)
-
+                function_calls = []
                 for part in candidate:
                     if getattr(part, "text", None):
                         final_text_parts.append(part.text)
@@ -372,34 +1233,42 @@ You are a **reasoning-focused AI agent** designed to autonomously process user q
 
                     function_call = getattr(part, "function_call", None)
                     if function_call:
-                        if not consent:
-                            prompt = (
-                                f"Please provide your consent to use your API keys to use tool {function_call.name} and try again'"
-                            )
-                            logger.warning(prompt)
-                            return {"message": prompt,
-                                    "tool_call": used_tools,
-                                    "action": "consent",
-                                    "versioned_content_id": versioned_content_id,
-                                    "digital_content_id": digital_content_id,
-                                    "sources": sources}
+                        function_calls.append(function_call)
 
+                if function_calls:
+                    if not consent:
+                        prompt = (
+                            f"Please provide your consent to use your API keys to use tool {function_calls[0].name} and try again'"
+                        )
+                        logger.warning(prompt)
+                        yield {"event": "done", "data": {
+                            "message": prompt,
+                            "tool_call": used_tools,
+                            "action": "consent",
+                            "versioned_content_id": versioned_content_id,
+                            "digital_content_id": digital_content_id,
+                            "sources": sources,
+                            "usage": budget.usage()
+                        }}
+                        return
+
+                    messages.append(
+                        types.Content(
+                            parts=[
+                                types.Part.from_function_call(
+                                    name=function_call.name,
+                                    args=function_call.args
+                                )
+                                for function_call in function_calls
+                            ]
+                        )
+                    )
+
+                    for function_call in function_calls:
                         used_tools = {
                             "name": function_call.name,
                             "parameters": function_call.args or {}
                         }
-
-                        messages.append(
-                            types.Content(
-                                parts=[
-                                    types.Part.from_function_call(
-                                        name=function_call.name,
-                                        args=function_call.args
-                                    )
-                                ]
-                            )
-                        )
-
                         final_text_parts.append(
                             f"#### Calling tool '{function_call.name}\n"
                             f"<details open>\n"
@@ -407,41 +1276,106 @@ You are a **reasoning-focused AI agent** designed to autonomously process user q
                             f"\n```\n{function_call.args}\n```\n"
                             f"</details>\n"
                         )
-                        logger.info(f"Calling tool: {function_call.name}")
-                        tool_result = await self.call_tool(function_call.name, function_call.args, email, sources)
-                        versioned_content_id = tool_result.versioned_content_id
-                        digital_content_id = tool_result.digital_content_id
-                        action = tool_result.action
+                        yield {"event": "tool_call", "data": used_tools}
+
+                    called_tools.update(function_call.name for function_call in function_calls)
+                    await self._save_used_tools(session_id, [function_call.name for function_call in function_calls])
+
+                    results = [None] * len(function_calls)
+                    async for index, tool_result, tool_sources in self._dispatch_tool_calls(
+                            function_calls, email, budget, request_results, snapshot):
+                        results[index] = (tool_result, tool_sources)
+                        yield {"event": "tool_result", "data": {
+                            "name": function_calls[index].name,
+                            "action": tool_result.action,
+                            "versioned_content_id": tool_result.versioned_content_id,
+                            "digital_content_id": tool_result.digital_content_id
+                        }}
+
+                    action = None
+                    sources_before = len(sources)
+                    response_parts = []
+                    for function_call, (tool_result, tool_sources) in zip(function_calls, results):
+                        sources.extend(tool_sources)
+                        if action is None:
+                            action = tool_result.action
+                            versioned_content_id = tool_result.versioned_content_id
+                            digital_content_id = tool_result.digital_content_id
                         logger.debug(f"Tool result: {tool_result.response}")
                         if tool_result.response:
-                            messages.append(
-                                types.Content(
-                                    parts=[
-                                        types.Part.from_function_response(
-                                            name=function_call.name,
-                                            response={"tool_response": tool_result.response},
-                                        )
-                                    ]
+                            tool_response = tool_result.response
+                            if TOOL_RESULT_COMPACTION:
+                                tool_response = compact_tool_result(tool_response, max_tokens=TOOL_RESULT_MAX_TOKENS)
+                                logger.info(
+                                    f"Compacted {function_call.name} result from {len(tool_result.response)} "
+                                    f"to {len(tool_response)} characters"
+                                )
+                            response_parts.append(
+                                types.Part.from_function_response(
+                                    name=function_call.name,
+                                    response={"tool_response": tool_response},
                                 )
                             )
-                llm_response = await self.make_llm_call(messages=messages, use_tools=True)
-
+                    if len(sources) > sources_before:
+                        yield {"event": "sources", "data": sources}
+                    if response_parts:
+                        messages.append(types.Content(parts=response_parts))
+
+                candidate = []
+                async for event in self._stream_turn(messages, candidate, tools, budget, snapshot):
+                    yield event
+
+        except BudgetExceeded as e:
+            logger.warning(f"Query budget exhausted ({e}) for session: {session_id}")
+            summary = await self._summarize_on_budget(messages, str(e), budget)
+            if summary:
+                final_text_parts.append(summary)
+                await self._save_message(session_id, "model", summary)
+                yield {"event": "token", "data": {"text": summary}}
+            yield {"event": "done", "data": {
+                "message": "\n".join(final_text_parts),
+                "tool_call": used_tools,
+                "action": action,
+                "versioned_content_id": versioned_content_id,
+                "digital_content_id": digital_content_id,
+                "sources": sources,
+                "budget_exhausted": str(e),
+                "usage": budget.usage()
+            }}
+            return
         except Exception as e:
             logger.error(f"Query processing failed: {e}")
-            return {"message": f"Query processing failed: {e}", "tool_call": used_tools}
+            yield {"event": "done", "data": {"message": f"Query processing failed: {e}", "tool_call": used_tools,
+                                             "usage": budget.usage()}}
+            return
 
-        return {
+        self._log_tool_recall(session_id, selection, called_tools)
+        result = {
             "message": "\n".join(final_text_parts),
             "tool_call": used_tools,
             "action": action,
             "versioned_content_id": versioned_content_id,
             "digital_content_id": digital_content_id,
-            "sources": sources
+            "sources": sources,
+            "usage": budget.usage()
         }
+        self._cache_response(email, query, result, called_tools, had_history)
+        yield {"event": "done", "data": result}
+
+    async def process_query(self, query: str, session_id: str, email: str = None, consent: bool = None,
+                            budget: QueryBudget = None):
+        result = None
+        async for event in self.stream_query(query, session_id=session_id, email=email, consent=consent, budget=budget):
+            if event["event"] == "done":
+                result = event["data"]
+        return result
 
     async def cleanup(self):
         logger.info("Cleaning up resources")
         try:
-            await self.exit_stack.aclose()
+            await asyncio.gather(*(handle.stop() for handle in self.server_handles.values()))
         except Exception as e:
             logger.error(f"Cleanup error: {e}")
+        self.server_handles = {}
+        await audit_pipeline.drain()
+        await dsh_client.close()
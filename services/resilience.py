@@ -0,0 +1,228 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from services.budget import BudgetExceeded
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+TOOL_TIMEOUT = float(os.environ.get("TOOL_TIMEOUT", "30"))
+TOOL_TIMEOUTS = json.loads(os.environ.get("TOOL_TIMEOUTS", "{}"))
+SERVER_TIMEOUTS = json.loads(os.environ.get("SERVER_TIMEOUTS", "{}"))
+SERVER_MAX_CONCURRENCY = int(os.environ.get("SERVER_MAX_CONCURRENCY", "8"))
+BULKHEAD_WAIT = float(os.environ.get("BULKHEAD_WAIT", "2"))
+BREAKER_FAILURE_THRESHOLD = int(os.environ.get("BREAKER_FAILURE_THRESHOLD", "5"))
+BREAKER_RESET_TIMEOUT = float(os.environ.get("BREAKER_RESET_TIMEOUT", "30"))
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class ToolFailure(Exception):
+    """
+    A tool call that failed for an infrastructure reason rather than inside the
+    tool. It is reported back to the model as a structured error so the model can
+    decide whether to retry, use another tool or explain the outage.
+    """
+
+    def __init__(self, kind: str, server: str, tool: str, message: str, retryable: bool,
+                 retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.kind = kind
+        self.server = server
+        self.tool = tool
+        self.retryable = retryable
+        self.retry_after = retry_after
+
+    def to_response(self) -> str:
+        error = {
+            "type": self.kind,
+            "server": self.server,
+            "tool": self.tool,
+            "message": str(self),
+            "retryable": self.retryable,
+        }
+        if self.retry_after is not None:
+            error["retry_after_seconds"] = round(self.retry_after, 1)
+        return json.dumps({"error": error})
+
+
+class CircuitBreaker:
+    """
+    Opens after `failure_threshold` consecutive failures and rejects calls for
+    `reset_timeout` seconds, then lets a single trial call through (half-open):
+    its success closes the breaker again, its failure re-opens it.
+    """
+
+    def __init__(self, name: str, failure_threshold: int = BREAKER_FAILURE_THRESHOLD,
+                 reset_timeout: float = BREAKER_RESET_TIMEOUT):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_at: Optional[float] = None
+        self.trial_in_flight = False
+        self.total_failures = 0
+        self.rejected = 0
+
+    def retry_after(self) -> float:
+        if self.state != OPEN:
+            return 0.0
+        return max(self.opened_at + self.reset_timeout - time.monotonic(), 0.0)
+
+    def allow(self) -> bool:
+        if self.state == OPEN and self.retry_after() <= 0:
+            self.state = HALF_OPEN
+        if self.state == CLOSED:
+            return True
+        if self.state == HALF_OPEN and not self.trial_in_flight:
+            self.trial_in_flight = True
+            return True
+        self.rejected += 1
+        return False
+
+    def record_success(self):
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.trial_in_flight = False
+
+    def record_failure(self):
+        self.total_failures += 1
+        self.consecutive_failures += 1
+        self.trial_in_flight = False
+        if self.state == HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+            if self.state != OPEN:
+                logger.warning(f"Circuit for {self.name} opened after {self.consecutive_failures} consecutive failures")
+            self.state = OPEN
+            self.opened_at = time.monotonic()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "total_failures": self.total_failures,
+            "rejected": self.rejected,
+            "retry_after_seconds": round(self.retry_after(), 1),
+        }
+
+
+class ServerGuard:
+    """The bulkhead (bounded concurrent calls) and circuit breaker of one server."""
+
+    def __init__(self, max_concurrency: int, breaker: CircuitBreaker):
+        self.max_concurrency = max_concurrency
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.breaker = breaker
+        self.in_flight = 0
+        self.bulkhead_rejected = 0
+        self.timeouts = 0
+        self.reported_failures = 0
+
+
+class ResilienceManager:
+    """
+    Wraps tool calls with a timeout (per tool, else per server, else the default),
+    a per-server bulkhead and a per-server circuit breaker.
+    """
+
+    def __init__(self, default_timeout: float = TOOL_TIMEOUT, tool_timeouts: Optional[Dict[str, float]] = None,
+                 server_timeouts: Optional[Dict[str, float]] = None, max_concurrency: int = SERVER_MAX_CONCURRENCY,
+                 bulkhead_wait: float = BULKHEAD_WAIT, failure_threshold: int = BREAKER_FAILURE_THRESHOLD,
+                 reset_timeout: float = BREAKER_RESET_TIMEOUT):
+        self.default_timeout = default_timeout
+        self.tool_timeouts = tool_timeouts if tool_timeouts is not None else TOOL_TIMEOUTS
+        self.server_timeouts = server_timeouts if server_timeouts is not None else SERVER_TIMEOUTS
+        self.max_concurrency = max_concurrency
+        self.bulkhead_wait = bulkhead_wait
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.guards: Dict[str, ServerGuard] = {}
+
+    def guard(self, server: str) -> ServerGuard:
+        if server not in self.guards:
+            self.guards[server] = ServerGuard(
+                self.max_concurrency, CircuitBreaker(server, self.failure_threshold, self.reset_timeout)
+            )
+        return self.guards[server]
+
+    def timeout_for(self, server: str, tool: str) -> float:
+        return float(self.tool_timeouts.get(tool, self.server_timeouts.get(server, self.default_timeout)))
+
+    def reset(self, server: str):
+        """Forgets a server's breaker state, e.g. after it was restarted."""
+        self.guards.pop(server, None)
+
+    async def call(self, server: str, tool: str, invoke: Callable[[], Awaitable[Any]],
+                   deadline: Optional[float] = None, is_failure: Optional[Callable[[Any], bool]] = None) -> Any:
+        """
+        Runs `invoke()` under the server's guard. `deadline` is the time left in
+        the request budget; running out of it raises BudgetExceeded and does not
+        count against the server. A result for which `is_failure` returns True is
+        still returned, but counts as a failure of the server.
+        """
+        guard = self.guard(server)
+        if not guard.breaker.allow():
+            raise ToolFailure(
+                "circuit_open", server, tool,
+                f"Server {server} is failing and temporarily disabled.",
+                retryable=True, retry_after=guard.breaker.retry_after()
+            )
+        try:
+            await asyncio.wait_for(guard.semaphore.acquire(), timeout=self.bulkhead_wait)
+        except asyncio.TimeoutError:
+            guard.bulkhead_rejected += 1
+            guard.breaker.trial_in_flight = False
+            raise ToolFailure(
+                "overloaded", server, tool,
+                f"Server {server} already has {guard.max_concurrency} calls in flight.",
+                retryable=True, retry_after=self.bulkhead_wait
+            )
+
+        timeout = self.timeout_for(server, tool)
+        budget_bound = deadline is not None and deadline < timeout
+        guard.in_flight += 1
+        try:
+            result = await asyncio.wait_for(invoke(), timeout=deadline if budget_bound else timeout)
+        except asyncio.TimeoutError:
+            if budget_bound:
+                guard.breaker.trial_in_flight = False
+                raise BudgetExceeded("deadline")
+            guard.timeouts += 1
+            guard.breaker.record_failure()
+            raise ToolFailure(
+                "timeout", server, tool, f"{tool} did not answer within {timeout:g}s.", retryable=True
+            )
+        except asyncio.CancelledError:
+            guard.breaker.trial_in_flight = False
+            raise
+        except Exception as e:
+            guard.breaker.record_failure()
+            raise ToolFailure("unavailable", server, tool, f"{tool} could not be called: {e}", retryable=False)
+        finally:
+            guard.in_flight -= 1
+            guard.semaphore.release()
+        if is_failure is not None and is_failure(result):
+            guard.reported_failures += 1
+            guard.breaker.record_failure()
+        else:
+            guard.breaker.record_success()
+        return result
+
+    def stats(self) -> Dict[str, Dict[str, Any]]:
+        return {
+            server: {
+                **guard.breaker.stats(),
+                "in_flight": guard.in_flight,
+                "max_concurrency": guard.max_concurrency,
+                "bulkhead_rejected": guard.bulkhead_rejected,
+                "timeouts": guard.timeouts,
+                "reported_failures": guard.reported_failures,
+            }
+            for server, guard in self.guards.items()
+        }
@@ -0,0 +1,134 @@
+import copy
+import json
+import logging
+import math
+import re
+import time
+from collections import Counter, OrderedDict
+from typing import Any, Dict, Iterable, Optional
+
+from services.tool_index import tokenize
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def normalize_query(query: str) -> str:
+    query = re.sub(r"[^\w\s]", " ", query.lower())
+    return " ".join(query.split())
+
+
+def _cosine(a: Counter, b: Counter) -> float:
+    dot = sum(count * b.get(term, 0) for term, count in a.items())
+    if not dot:
+        return 0.0
+    norm = math.sqrt(sum(c * c for c in a.values())) * math.sqrt(sum(c * c for c in b.values()))
+    return dot / norm
+
+
+class ResponseCacheEntry:
+    def __init__(self, key, vector: Counter, result: Dict[str, Any], expires_at: float, size: int):
+        self.key = key
+        self.vector = vector
+        self.result = result
+        self.expires_at = expires_at
+        self.size = size
+
+
+class ResponseCache:
+    """
+    An in-memory answer cache keyed on (user, normalized query).
+
+    A lookup first tries the exact normalized query, then the most similar recent
+    query of the same user by cosine similarity over query terms. An entry lives
+    for the shortest TTL of the tools used to answer it, and the least recently
+    used entries are evicted once the cache holds more than `max_bytes`. Queries
+    with fewer than `min_terms` terms ("yes", "the second one") mean nothing
+    without the conversation they belong to and are never cached.
+    """
+
+    def __init__(self, max_bytes: int = 32 * 1024 * 1024, default_ttl: int = 300,
+                 tool_ttls: Optional[Dict[str, int]] = None, similarity_threshold: float = 0.9,
+                 min_terms: int = 3):
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self.tool_ttls = tool_ttls or {}
+        self.similarity_threshold = similarity_threshold
+        self.min_terms = min_terms
+        self._entries: "OrderedDict[tuple, ResponseCacheEntry]" = OrderedDict()
+        self._by_user: Dict[str, Dict[tuple, ResponseCacheEntry]] = {}
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.bypasses = 0
+
+    def cacheable(self, query: str) -> bool:
+        return len(tokenize(normalize_query(query))) >= self.min_terms
+
+    def lookup(self, user_id: str, query: str) -> Optional[Dict[str, Any]]:
+        if not self.cacheable(query):
+            return None
+        normalized = normalize_query(query)
+        entry = self._entries.get((user_id, normalized))
+        if entry is None:
+            vector = Counter(tokenize(normalized))
+            best_score = 0.0
+            for candidate in self._by_user.get(user_id, {}).values():
+                score = _cosine(vector, candidate.vector)
+                if score > best_score:
+                    entry, best_score = candidate, score
+            if best_score < self.similarity_threshold:
+                entry = None
+
+        if entry is not None and entry.expires_at <= time.monotonic():
+            self._remove(entry.key)
+            entry = None
+        if entry is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self._entries.move_to_end(entry.key)
+        return copy.deepcopy(entry.result)
+
+    def store(self, user_id: str, query: str, result: Dict[str, Any], tools_used: Iterable[str]):
+        tools_used = list(tools_used)
+        ttl = min([self.tool_ttls.get(tool, self.default_ttl) for tool in tools_used] or [self.default_ttl])
+        if ttl <= 0 or not self.cacheable(query):
+            return
+        normalized = normalize_query(query)
+        key = (user_id, normalized)
+        size = len(json.dumps(result, default=str)) + len(normalized)
+        if size > self.max_bytes:
+            return
+        self._remove(key)
+        entry = ResponseCacheEntry(key, Counter(tokenize(normalized)), copy.deepcopy(result), time.monotonic() + ttl, size)
+        self._entries[key] = entry
+        self._by_user.setdefault(user_id, {})[key] = entry
+        self.size += size
+        while self.size > self.max_bytes:
+            self._remove(next(iter(self._entries)))
+
+    def bypass(self):
+        self.bypasses += 1
+
+    def _remove(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        self.size -= entry.size
+        user_entries = self._by_user.get(key[0], {})
+        user_entries.pop(key, None)
+        if not user_entries:
+            self._by_user.pop(key[0], None)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self.size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "bypasses": self.bypasses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
@@ -0,0 +1,123 @@
+import base64
+import logging
+import os
+import tempfile
+from typing import Iterable
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+SCRIPT_CACHE_DIR = os.environ.get("SCRIPT_CACHE_DIR", "/tmp/dsh_server_scripts")
+
+
+def blob_version(blob) -> str:
+    """The blob's MD5 in hex, or its generation for objects GCS keeps no MD5 for (composites)."""
+    if blob.md5_hash:
+        return base64.b64decode(blob.md5_hash).hex()
+    return f"g{blob.generation}"
+
+
+class ScriptCache:
+    """
+    Server scripts downloaded from GCS, kept at
+    <directory>/<bucket>/<version>/<blob name> where the version is the blob's
+    MD5. A script whose version is already on disk is not downloaded again, a
+    changed blob lands in a new version directory, and files are written to a
+    temporary name and renamed so a server never starts from a partial script.
+    Methods are blocking and meant to run in a worker thread.
+    """
+
+    def __init__(self, directory: str = SCRIPT_CACHE_DIR):
+        self.directory = directory
+        self.hits = 0
+        self.downloads = 0
+        self.bytes_downloaded = 0
+        self.pruned = 0
+
+    def path_for(self, bucket_name: str, blob) -> str:
+        root = os.path.join(self.directory, bucket_name)
+        path = os.path.normpath(os.path.join(root, blob_version(blob), blob.name))
+        if not path.startswith(root + os.sep):
+            raise ValueError(f"Blob name {blob.name} escapes the script cache")
+        return path
+
+    def fetch(self, bucket_name: str, blob) -> str:
+        """Returns the local path of the blob's current version, downloading it only if it is not cached."""
+        path = self.path_for(bucket_name, blob)
+        if os.path.exists(path):
+            self.hits += 1
+            return path
+
+        # Pinned to the listed generation, so the content always matches the version it is stored under.
+        content = blob.download_as_bytes(if_generation_match=blob.generation)
+        self._write_atomic(path, content)
+        self.downloads += 1
+        self.bytes_downloaded += len(content)
+        logger.info(f"Downloaded gs://{bucket_name}/{blob.name} ({len(content)} bytes) to {path}")
+        return path
+
+    @staticmethod
+    def _write_atomic(path: str, content: bytes):
+        directory = os.path.dirname(path)
+        os.makedirs(directory, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix=".", suffix=".part")
+        try:
+            with os.fdopen(fd, "wb") as temp_file:
+                temp_file.write(content)
+                temp_file.flush()
+                os.fsync(temp_file.fileno())
+            os.replace(temp_path, path)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+            raise
+
+    def prune(self, bucket_name: str, blobs: Iterable, prefix: str = "", keep_paths: Iterable[str] = ()):
+        """
+        Removes cached scripts under `prefix` that are not the current version of
+        a listed blob, except for `keep_paths`.
+        """
+        root = os.path.join(self.directory, bucket_name)
+        if not os.path.isdir(root):
+            return
+        keep = {self.path_for(bucket_name, blob) for blob in blobs} | set(keep_paths)
+        for version in os.listdir(root):
+            version_dir = os.path.join(root, version)
+            for current, _, files in os.walk(version_dir):
+                for file_name in files:
+                    if file_name.startswith("."):
+                        continue  # a download in progress
+                    path = os.path.join(current, file_name)
+                    if os.path.relpath(path, version_dir).startswith(prefix) and path not in keep:
+                        os.unlink(path)
+                        self.pruned += 1
+            self._remove_empty_dirs(version_dir)
+
+    def forget(self, bucket_name: str, blob_name: str):
+        """Removes every cached version of one blob, e.g. after it was deleted."""
+        root = os.path.join(self.directory, bucket_name)
+        if not os.path.isdir(root):
+            return
+        for version in os.listdir(root):
+            path = os.path.join(root, version, blob_name)
+            if os.path.isfile(path):
+                os.unlink(path)
+                self.pruned += 1
+            self._remove_empty_dirs(os.path.join(root, version))
+
+    @staticmethod
+    def _remove_empty_dirs(directory: str):
+        for current, _, _ in sorted(os.walk(directory), key=lambda entry: len(entry[0]), reverse=True):
+            if not os.listdir(current):
+                os.rmdir(current)
+
+    def stats(self):
+        lookups = self.hits + self.downloads
+        return {
+            "directory": self.directory,
+            "hits": self.hits,
+            "downloads": self.downloads,
+            "bytes_downloaded": self.bytes_downloaded,
+            "pruned": self.pruned,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
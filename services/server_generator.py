@@ -6,11 +6,13 @@ import base64
 import requests
 import time
 import logging
+import tempfile
 from dotenv import load_dotenv
-from google import genai
 from google.genai import types
 from google.cloud import storage
 from schemas.servers import ServerCreate
+from services.llm import get_llm_backend
+from services.tool_manifest import build_manifest, list_script_tools, upload_manifest
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -118,7 +120,7 @@ mcp = FastMCP("{versioned_content_id}_{digital_content_id}")
 #### 1. Function Declaration
 
 * Define **one async function per endpoint**.
-* Use the decorator: `@mcp.tool()`
+* Use the decorator `@mcp.tool(annotations=ToolAnnotations(readOnlyHint=True))` for `GET` and `HEAD` endpoints, and `@mcp.tool(annotations=ToolAnnotations(readOnlyHint=False))` for every other HTTP method.
 * Signature: `async def function_name(...) -> str:`
 * Name the function based on the `operationId` or the endpoint path meaningfully.
 
@@ -161,7 +163,7 @@ mcp = FastMCP("{versioned_content_id}_{digital_content_id}")
 * Set query parameters, path variables, headers, and JSON body from flattened arguments.
 * Handle response:
 
-  * On error: return a string like `"Error: <description>"`
+  * On a non-2xx status or a connection error: `raise Exception(f"<status> - <response text>")`. Do not return the error as a string: a raised exception is reported to the client as a failed tool call, and failed calls are never cached.
   * On success: return the json object of the api response.
 
 ---
@@ -175,11 +177,12 @@ mcp = FastMCP("{versioned_content_id}_{digital_content_id}")
    import aiohttp
    from pydantic import BaseModel
    from mcp.server.fastmcp import FastMCP
+   from mcp.types import ToolAnnotations
    ```
 
 2. **Optional** internal-only Pydantic models
 
-3. **One `@mcp.tool()` function per endpoint**, each with:
+3. **One `@mcp.tool(annotations=ToolAnnotations(readOnlyHint=...))` function per endpoint**, each with:
 
    * Flattened parameters
    * Reconstructed models (if needed)
@@ -220,11 +223,7 @@ mcp = FastMCP("{versioned_content_id}_{digital_content_id}")
 async def generate_code_with_gemini(prompt):
     logger.info("Generating code with Gemini model")
     try:
-        client = genai.Client(
-            vertexai=True,
-            project=PROJECT,
-            location="us-central1",
-        )
+        backend = get_llm_backend(project=PROJECT, location="us-central1")
 
         model = "gemini-2.0-flash-001"
         contents = [
@@ -255,7 +254,7 @@ async def generate_code_with_gemini(prompt):
             )],
         )
 
-        response = client.models.generate_content(
+        response = await backend.generate(
             model=model,
             contents=contents,
             config=generate_content_config,
@@ -267,6 +266,16 @@ async def generate_code_with_gemini(prompt):
         logger.error(f"Gemini code generation failed: {e}")
         raise
 
+async def build_tool_manifest(generated_code, output_filename):
+    """Starts the generated server once to list its tools."""
+    with tempfile.TemporaryDirectory() as directory:
+        script_path = os.path.join(directory, output_filename)
+        with open(script_path, "w") as script_file:
+            script_file.write(generated_code)
+        server_name, tools = await list_script_tools(script_path)
+    return build_manifest(server_name, tools, generated_code.encode("utf-8"))
+
+
 async def generate_mcp_server_from_upload(uploaded_file):
     logger.info(f"Generating MCP server from uploaded file: {uploaded_file.file_name}")
     try:
@@ -303,6 +312,15 @@ async def generate_mcp_server_from_upload(uploaded_file):
         blob.upload_from_string(generated_code, content_type="text/plain")
         gcs_path = f"gs://{bucket_name}/{output_filename}"
 
+        # Step 5: Store the tool manifest next to the script, so servers are registered without being started
+        try:
+            manifest = await build_tool_manifest(generated_code, output_filename)
+            upload_manifest(bucket, output_filename, manifest)
+            logger.info(f"Uploaded tool manifest for {output_filename} with {len(manifest['tools'])} tools")
+        except Exception as e:
+            # The client lists the tools itself on first start and writes the manifest then.
+            logger.warning(f"Could not build the tool manifest of {output_filename}: {e}")
+
         logger.info(f"Upload successful: {gcs_path}")
         return gcs_path
     except Exception as e:
@@ -0,0 +1,317 @@
+import asyncio
+import importlib.util
+import itertools
+import json
+import logging
+import os
+import re
+import sys
+import time
+from contextlib import AsyncExitStack
+from typing import Any, Dict, List, Optional
+
+import anyio
+from mcp import ClientSession, StdioServerParameters
+from mcp.client.stdio import stdio_client
+from mcp.server.fastmcp import FastMCP
+from mcp.server.lowlevel import Server
+from mcp.shared.memory import create_client_server_memory_streams
+from mcp.types import InitializeResult
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+SERVER_HEALTH_TIMEOUT = float(os.environ.get("SERVER_HEALTH_TIMEOUT", "5"))
+
+STDIO = "stdio"
+MEMORY = "memory"
+TRANSPORTS = (STDIO, MEMORY)
+
+# "stdio" runs each generated server in its own interpreter, "memory" imports it into this process.
+SERVER_TRANSPORT = os.environ.get("SERVER_TRANSPORT", STDIO)
+# Per-script overrides, e.g. {"ai-apis_server.py": "memory"}.
+SERVER_TRANSPORTS = json.loads(os.environ.get("SERVER_TRANSPORTS", "{}"))
+
+IDLE = "idle"
+STARTING = "starting"
+RUNNING = "running"
+STOPPING = "stopping"
+STOPPED = "stopped"
+FAILED = "failed"
+EXITED = "exited"
+
+
+def _child_processes() -> List[Dict[str, Any]]:
+    """Direct children of this process from /proc, with their command lines and start ticks."""
+    children = []
+    parent = os.getpid()
+    try:
+        entries = os.listdir("/proc")
+    except OSError:
+        return children
+    for entry in entries:
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as stat_file:
+                # The command name can contain spaces, so fields are counted from its closing parenthesis.
+                fields = stat_file.read().rsplit(")", 1)[1].split()
+            if int(fields[1]) != parent:
+                continue
+            with open(f"/proc/{entry}/cmdline", "rb") as cmdline_file:
+                cmdline = [part.decode(errors="replace") for part in cmdline_file.read().split(b"\0") if part]
+        except (OSError, IndexError, ValueError):
+            continue
+        children.append({"pid": int(entry), "cmdline": cmdline, "started": int(fields[19])})
+    return children
+
+
+def process_rss(pid: Optional[int]) -> Optional[int]:
+    """Resident memory of a process in bytes, or None if it is gone or /proc is not available."""
+    if pid is None:
+        return None
+    try:
+        with open(f"/proc/{pid}/status") as status_file:
+            for line in status_file:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError):
+        return None
+    return None
+
+
+def process_alive(pid: int) -> bool:
+    try:
+        with open(f"/proc/{pid}/stat") as stat_file:
+            return stat_file.read().rsplit(")", 1)[1].split()[0] != "Z"
+    except OSError:
+        return False
+
+
+def server_transport(script_name: str) -> str:
+    """The transport configured for a server script. Only Python scripts can run in this process."""
+    if not script_name.endswith(".py"):
+        return STDIO
+    transport = SERVER_TRANSPORTS.get(script_name, SERVER_TRANSPORT)
+    if transport not in TRANSPORTS:
+        raise ValueError(f"Unknown transport {transport!r} for {script_name}, expected one of {', '.join(TRANSPORTS)}")
+    return transport
+
+
+_module_ids = itertools.count()
+
+
+def load_fastmcp_server(script_path: str, module_name: str) -> Server:
+    """
+    Imports a generated server script as `module_name` and returns the
+    low-level server of the FastMCP instance it defines. The module is
+    registered in sys.modules (pydantic resolves its models there) under a name
+    no other module uses, and its `__main__` block does not run.
+    """
+    spec = importlib.util.spec_from_file_location(module_name, script_path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[module_name] = module
+    try:
+        spec.loader.exec_module(module)
+        servers = [value for value in vars(module).values() if isinstance(value, FastMCP)]
+        if len(servers) != 1:
+            raise ValueError(f"{os.path.basename(script_path)} defines {len(servers)} FastMCP servers, expected one")
+    except BaseException:
+        sys.modules.pop(module_name, None)
+        raise
+    return servers[0]._mcp_server
+
+
+class ServerHandle:
+    """
+    One MCP server: its process, client session and lifecycle state.
+
+    The transport and the session live in an exit stack entered and exited by a
+    dedicated owner task: anyio cancel scopes must be left by the task that
+    entered them, so servers started concurrently cannot share one exit stack,
+    and each server can be stopped or restarted on its own. `start` returns once
+    the session is initialized; `stop` asks the owner task to close the session
+    and terminate the process.
+
+    With the "memory" transport the script (a FastMCP server, `params.args[0]`)
+    is imported into this process instead and served from a task on this event
+    loop over in-memory streams. It then has no PID of its own and its memory
+    is part of this process's.
+    """
+
+    def __init__(self, params: StdioServerParameters, label: str, script: Optional[str] = None,
+                 version: Optional[str] = None, name: Optional[str] = None, transport: str = STDIO):
+        self.params = params
+        self.label = label
+        self.transport = transport
+        self._name = name
+        # Where the server came from (a gs:// path) and which version of it, for reconciling with the bucket.
+        self.script = script
+        self.version = version
+        self.session: Optional[ClientSession] = None
+        self.server_meta: Optional[InitializeResult] = None
+        self.state = STOPPED
+        self.pid: Optional[int] = None
+        self.started_at: Optional[float] = None
+        self.restarts = 0
+        self.last_error: Optional[str] = None
+        # Set for servers registered from their tool list and spawned on their first call.
+        self.on_demand = False
+        self.spawn_s: Optional[float] = None
+        self._ready: Optional[asyncio.Future] = None
+        self._stopping: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def name(self) -> Optional[str]:
+        return self.server_meta.serverInfo.name if self.server_meta else self._name
+
+    @property
+    def running(self) -> bool:
+        if self.session is None or self._task is None or self._task.done():
+            return False
+        if self.pid is not None and not process_alive(self.pid):
+            self.state = EXITED
+            self.last_error = self.last_error or f"process {self.pid} exited"
+            return False
+        return True
+
+    async def start(self, timeout: Optional[float] = None) -> InitializeResult:
+        if self._task is not None and not self._task.done():
+            raise RuntimeError(f"Server {self.name or self.label} is already running")
+        self.state = STARTING
+        self.last_error = None
+        self._ready = asyncio.get_running_loop().create_future()
+        self._stopping = asyncio.Event()
+        self._task = asyncio.create_task(self._run(), name=f"mcp-server:{self.label}")
+        try:
+            return await asyncio.wait_for(asyncio.shield(self._ready), timeout)
+        except asyncio.TimeoutError:
+            # Also how a server that exits before answering initialize() shows up.
+            await self._abandon()
+            self.last_error = f"{self.label} did not initialize within {timeout:g}s"
+            raise TimeoutError(self.last_error)
+        except BaseException as e:
+            await self._abandon()
+            self.last_error = str(e) or type(e).__name__
+            raise
+
+    async def _abandon(self):
+        if not self._ready.done():
+            self._ready.cancel()
+        self._task.cancel()
+        await asyncio.wait({self._task})
+        self.state = FAILED
+        self.pid = None
+
+    async def _run(self):
+        try:
+            async with AsyncExitStack() as stack:
+                if self.transport == MEMORY:
+                    read, write = await self._serve_in_process(stack)
+                else:
+                    known = {child["pid"] for child in _child_processes()}
+                    read, write = await stack.enter_async_context(stdio_client(self.params))
+                    self.pid = self._find_pid(known)
+                session = await stack.enter_async_context(ClientSession(read, write))
+                self.server_meta = await session.initialize()
+                self.session = session
+                self.started_at = time.time()
+                self.state = RUNNING
+                self._ready.set_result(self.server_meta)
+                await self._stopping.wait()
+        except asyncio.CancelledError:
+            if not self._ready.done():
+                self._ready.cancel()
+            raise
+        except BaseException as e:
+            if not self._ready.done():
+                self._ready.set_exception(e)
+            elif not self._ready.cancelled():
+                self.state = EXITED
+                self.last_error = str(e) or type(e).__name__
+                logger.warning(f"Server {self.name or self.label} exited: {e}")
+        finally:
+            self.session = None
+
+    async def _serve_in_process(self, stack: AsyncExitStack):
+        """
+        Imports the script and runs its server in a task group on `stack`,
+        returning the client ends of the in-memory streams. Each start imports a
+        fresh module, which is dropped again when the stack closes.
+        """
+        module_name = f"_dsh_server_{re.sub(r'[^0-9A-Za-z_]', '_', self.label)}_{next(_module_ids)}"
+        # Imported in a worker thread: generated servers run module-level code that may block.
+        server = await asyncio.to_thread(load_fastmcp_server, self.params.args[0], module_name)
+        stack.callback(sys.modules.pop, module_name, None)
+        client_streams, server_streams = await stack.enter_async_context(create_client_server_memory_streams())
+        task_group = await stack.enter_async_context(anyio.create_task_group())
+        # Closed before the task group is left, so leaving it cancels the server instead of waiting for it.
+        stack.callback(task_group.cancel_scope.cancel)
+        task_group.start_soon(
+            lambda: server.run(*server_streams, server.create_initialization_options(), raise_exceptions=False)
+        )
+        return client_streams
+
+    def _find_pid(self, known) -> Optional[int]:
+        """stdio_client does not expose its process, so the PID is that of the new child running our command."""
+        # Matched on the arguments only: a launcher shim may exec the command under another path.
+        expected = list(self.params.args) or [self.params.command]
+        matching = [child for child in _child_processes() if child["cmdline"][-len(expected):] == expected]
+        candidates = [child for child in matching if child["pid"] not in known] or matching
+        return max(candidates, key=lambda child: child["started"])["pid"] if candidates else None
+
+    async def stop(self, timeout: float = 5.0):
+        """Closes the session and the server process, cancelling the owner task if it does not finish in time."""
+        if self._task is None or self._task.done():
+            if self.state != FAILED:
+                self.state = STOPPED
+            return
+        self.state = STOPPING
+        self._stopping.set()
+        if not self._ready.done():
+            self._task.cancel()
+        done, _ = await asyncio.wait({self._task}, timeout=timeout)
+        if not done:
+            logger.warning(f"Server {self.name or self.label} did not stop within {timeout:g}s, cancelling it")
+            self._task.cancel()
+            await asyncio.wait({self._task})
+        self.state = STOPPED
+        self.pid = None
+
+    async def restart(self, timeout: Optional[float] = None) -> InitializeResult:
+        await self.stop()
+        self.restarts += 1
+        return await self.start(timeout)
+
+    async def health(self, timeout: float = SERVER_HEALTH_TIMEOUT) -> Dict[str, Any]:
+        """Pings the server; one that does not answer within `timeout` is reported unhealthy."""
+        if not self.running:
+            return {"healthy": False, "state": self.state, "error": self.last_error}
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(self.session.send_ping(), timeout)
+        except asyncio.TimeoutError:
+            return {"healthy": False, "state": self.state, "error": f"no answer to ping within {timeout:g}s"}
+        except Exception as e:
+            return {"healthy": False, "state": self.state, "error": str(e) or type(e).__name__}
+        return {"healthy": True, "state": self.state, "latency_ms": round((time.perf_counter() - started) * 1000, 2)}
+
+    def describe(self) -> Dict[str, Any]:
+        running = self.running
+        return {
+            "name": self.name,
+            "label": self.label,
+            "transport": self.transport,
+            "script": self.script,
+            "version": self.version,
+            "state": self.state,
+            "pid": self.pid if running else None,
+            "started_at": self.started_at,
+            "uptime_s": round(time.time() - self.started_at, 1) if running and self.started_at else None,
+            "rss_bytes": process_rss(self.pid) if running else None,
+            "restarts": self.restarts,
+            "on_demand": self.on_demand,
+            "spawn_s": self.spawn_s,
+            "last_error": self.last_error,
+        }
@@ -1,6 +1,7 @@
 import os
 
 from google.cloud import storage
+from services.tool_manifest import is_manifest, manifest_name
 from dotenv import load_dotenv
 load_dotenv()
 BUCKET_NAME = os.environ.get("SERVER_BUCKET_NAME")
@@ -25,8 +26,8 @@ def list_gcs_modules( prefix=None):
     # List blobs in the bucket
     blobs = bucket.list_blobs(prefix=prefix)
 
-    # Collect file names
-    file_names = [blob.name for blob in blobs]
+    # Collect file names, leaving out the tool manifests stored next to the scripts
+    file_names = [blob.name for blob in blobs if not is_manifest(blob.name)]
 
     return file_names
 
@@ -48,6 +49,9 @@ def delete_server(server_name):
         # Delete the server file
         blob = bucket.blob(server_name)
         blob.delete()
+        manifest_blob = bucket.get_blob(manifest_name(server_name))
+        if manifest_blob is not None:
+            manifest_blob.delete()
         return True
     except Exception as e:
         print(f"Error deleting server: {e}")
@@ -0,0 +1,59 @@
+import json
+import logging
+import re
+from typing import Any, Dict, Optional
+
+from mcp.types import ToolAnnotations
+
+READ_ONLY_VERBS = {
+    "get", "list", "find", "search", "retrieve", "fetch", "read", "show", "describe",
+    "extract", "check", "count", "lookup", "query", "view", "download",
+}
+
+
+def tool_verb(tool_name: str) -> str:
+    """Returns the leading verb of a camelCase or snake_case tool name."""
+    words = re.sub(r"([a-z0-9])([A-Z])", r"\1 \2", tool_name).replace("_", " ").lower().split()
+    return words[0] if words else ""
+
+
+def is_mutating_tool(tool_name: str, annotations: Optional[ToolAnnotations] = None) -> bool:
+    """
+    Classifies a tool as mutating unless it is known to be read-only.
+
+    An explicit `readOnlyHint` on the tool wins; otherwise the leading verb of the
+    tool name decides, and anything that is not a known read verb counts as mutating.
+    """
+    if annotations is not None and annotations.readOnlyHint is not None:
+        return not annotations.readOnlyHint
+    return tool_verb(tool_name) not in READ_ONLY_VERBS
+
+
+def load_tool_manifest(path: Optional[str]) -> Dict[str, Dict[str, Any]]:
+    """
+    Reads an explicit tool manifest, `{"tools": {"<tool name>": {"read_only": true}}}`,
+    returning the per-tool entries. A missing or unreadable manifest yields {}.
+    """
+    if not path:
+        return {}
+    try:
+        with open(path) as manifest_file:
+            return json.load(manifest_file).get("tools", {})
+    except (OSError, ValueError) as e:
+        logging.getLogger(__name__).error(f"Could not read tool manifest {path}: {e}")
+        return {}
+
+
+def is_read_only_tool(tool_name: str, annotations: Optional[ToolAnnotations] = None,
+                      manifest: Optional[Dict[str, Dict[str, Any]]] = None) -> bool:
+    """
+    Whether a tool is known to be read-only, so its results may be cached.
+
+    Unlike `is_mutating_tool` this never guesses from the name: the tool must be
+    marked read-only in the manifest or carry `readOnlyHint`, which the generator
+    sets from the endpoint's HTTP method. A manifest entry wins over the annotation.
+    """
+    entry = (manifest or {}).get(tool_name)
+    if entry is not None and entry.get("read_only") is not None:
+        return bool(entry["read_only"])
+    return annotations is not None and annotations.readOnlyHint is True
@@ -0,0 +1,142 @@
+import logging
+import math
+import re
+from collections import Counter
+from typing import Any, Dict, Iterable, List, Optional
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+SCORERS = ("bm25", "tfidf", "all")
+
+_STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "get", "in", "is", "it",
+    "of", "on", "or", "the", "this", "to", "with", "str", "none", "optional", "args", "returns",
+}
+
+
+def tokenize(text: str) -> List[str]:
+    """Splits text into lowercase terms, breaking camelCase and snake_case identifiers apart."""
+    if not text:
+        return []
+    text = re.sub(r"([a-z0-9])([A-Z])", r"\1 \2", text)
+    terms = re.findall(r"[a-z0-9]+", text.lower())
+    return [term for term in terms if len(term) > 1 and term not in _STOPWORDS]
+
+
+class ToolSelection:
+    """The tools attached to one query and the full ranking they were taken from."""
+
+    def __init__(self, names: List[str], ranking: List[str], top_k: int):
+        self.names = names
+        self.ranking = ranking
+        self.top_k = top_k
+
+    def recall(self, called_tools: Iterable[str]) -> Optional[float]:
+        """Fraction of the called tools that retrieval ranked within the top-k."""
+        called = set(called_tools)
+        if not called:
+            return None
+        retrieved = set(self.ranking[:self.top_k])
+        return len(called & retrieved) / len(called)
+
+
+class ToolIndex:
+    """
+    A local lexical index over tool names, descriptions and parameter names.
+
+    Supported scorers are "bm25", "tfidf" (cosine over tf-idf vectors) and "all",
+    which disables selection and attaches every tool.
+    """
+
+    def __init__(self, scorer: str = "bm25", k1: float = 1.5, b: float = 0.75):
+        if scorer not in SCORERS:
+            raise ValueError(f"Unknown tool index scorer '{scorer}', expected one of {SCORERS}")
+        self.scorer = scorer
+        self.k1 = k1
+        self.b = b
+        self.documents: Dict[str, Counter] = {}
+        self._doc_freq: Counter = Counter()
+        self._avg_length = 0.0
+
+    def add(self, name: str, description: str = "", parameters: Optional[Dict[str, Any]] = None):
+        """Indexes a tool. Re-adding a tool replaces its previous document."""
+        if name in self.documents:
+            self.remove(name)
+        terms = tokenize(name) * 2 + tokenize(description)
+        for param_name, param_schema in ((parameters or {}).get("properties") or {}).items():
+            terms += tokenize(param_name)
+            if isinstance(param_schema, dict):
+                terms += tokenize(param_schema.get("description", ""))
+        document = Counter(terms)
+        self.documents[name] = document
+        self._doc_freq.update(document.keys())
+        self._update_stats()
+
+    def remove(self, name: str):
+        document = self.documents.pop(name, None)
+        if document is None:
+            return
+        self._doc_freq.subtract(document.keys())
+        self._doc_freq += Counter()
+        self._update_stats()
+
+    def _update_stats(self):
+        total = sum(sum(document.values()) for document in self.documents.values())
+        self._avg_length = total / len(self.documents) if self.documents else 0.0
+
+    def _idf(self, term: str) -> float:
+        n = len(self.documents)
+        df = self._doc_freq.get(term, 0)
+        return math.log(1 + (n - df + 0.5) / (df + 0.5))
+
+    def _bm25(self, query_terms: List[str], document: Counter) -> float:
+        length = sum(document.values())
+        score = 0.0
+        for term in query_terms:
+            tf = document.get(term, 0)
+            if not tf:
+                continue
+            norm = tf + self.k1 * (1 - self.b + self.b * length / (self._avg_length or 1))
+            score += self._idf(term) * tf * (self.k1 + 1) / norm
+        return score
+
+    def _tfidf(self, query_terms: List[str], document: Counter) -> float:
+        query = Counter(query_terms)
+        dot = sum(query[term] * document.get(term, 0) * self._idf(term) ** 2 for term in query)
+        if not dot:
+            return 0.0
+        doc_norm = math.sqrt(sum((tf * self._idf(term)) ** 2 for term, tf in document.items()))
+        query_norm = math.sqrt(sum((tf * self._idf(term)) ** 2 for term, tf in query.items()))
+        return dot / (doc_norm * query_norm or 1)
+
+    def _scores(self, query: str) -> Dict[str, float]:
+        query_terms = tokenize(query)
+        score = self._tfidf if self.scorer == "tfidf" else self._bm25
+        return {name: score(query_terms, document) for name, document in self.documents.items()}
+
+    def rank(self, query: str) -> List[str]:
+        """Returns every indexed tool name, best match first."""
+        scores = self._scores(query)
+        return sorted(scores, key=lambda name: scores[name], reverse=True)
+
+    def best_match(self, query: str) -> Optional[str]:
+        """Returns the tool the query most likely calls, or None if no tool matches at all."""
+        scores = self._scores(query)
+        if not scores:
+            return None
+        name = max(scores, key=lambda name: scores[name])
+        return name if scores[name] > 0 else None
+
+    def select(self, query: str, top_k: int, always_include: Iterable[str] = ()) -> ToolSelection:
+        """
+        Picks the tools to attach to a query: the top-k matches plus any tool in
+        `always_include` (e.g. tools already used in the session).
+        """
+        if self.scorer == "all" or len(self.documents) <= top_k:
+            names = list(self.documents)
+            return ToolSelection(names=names, ranking=names, top_k=len(names))
+        ranking = self.rank(query)
+        names = ranking[:top_k]
+        names += [name for name in always_include if name in self.documents and name not in names]
+        return ToolSelection(names=names, ranking=ranking, top_k=top_k)
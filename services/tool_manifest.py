@@ -0,0 +1,91 @@
+import hashlib
+import json
+import logging
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+from mcp import StdioServerParameters
+from mcp.types import Tool, ToolAnnotations
+
+from services.server_handle import ServerHandle
+from services.tool_classification import is_read_only_tool
+from services.tool_registry import RegisteredTool
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Stored next to the script: foo_server.py -> foo_server.py.manifest.json
+MANIFEST_SUFFIX = ".manifest.json"
+
+
+def manifest_name(script_name: str) -> str:
+    return script_name + MANIFEST_SUFFIX
+
+
+def is_manifest(blob_name: str) -> bool:
+    return blob_name.endswith(MANIFEST_SUFFIX)
+
+
+def tool_entry(name: str, description: Optional[str], input_schema: Dict[str, Any],
+               annotations: Optional[ToolAnnotations]) -> Dict[str, Any]:
+    return {
+        "name": name,
+        "description": description,
+        "inputSchema": input_schema,
+        "annotations": annotations.model_dump(mode="json", exclude_none=True) if annotations else None,
+        "read_only": is_read_only_tool(name, annotations),
+    }
+
+
+def build_manifest(server_name: str, tools: List[Dict[str, Any]], script: bytes) -> Dict[str, Any]:
+    """
+    The tool manifest of one server script. `script_md5` is what GCS reports as
+    the script blob's MD5, so a manifest can be matched to the current script
+    from the bucket listing alone.
+    """
+    return {
+        "server": server_name,
+        "script_md5": hashlib.md5(script).hexdigest(),
+        "script_sha256": hashlib.sha256(script).hexdigest(),
+        "tools": tools,
+    }
+
+
+def manifest_matches(manifest: Optional[Dict[str, Any]], script_version: str) -> bool:
+    """Whether the manifest was built from the script version (see `script_cache.blob_version`)."""
+    return bool(manifest) and manifest.get("script_md5") == script_version and "tools" in manifest
+
+
+def manifest_tools(manifest: Dict[str, Any]) -> List[RegisteredTool]:
+    return [RegisteredTool.from_mcp(Tool.model_validate(tool), manifest["server"]) for tool in manifest["tools"]]
+
+
+def read_manifest(path: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(path) as manifest_file:
+            return json.load(manifest_file)
+    except (OSError, ValueError) as e:
+        logger.warning(f"Could not read tool manifest {path}: {e}")
+        return None
+
+
+def upload_manifest(bucket, script_name: str, manifest: Dict[str, Any]):
+    bucket.blob(manifest_name(script_name)).upload_from_string(
+        json.dumps(manifest, indent=2, sort_keys=True), content_type="application/json"
+    )
+
+
+async def list_script_tools(script_path: str, timeout: float = 60) -> Tuple[str, List[Dict[str, Any]]]:
+    """Starts a server script once to list its tools, for scripts that have no manifest yet."""
+    command = "python" if script_path.endswith(".py") else "node"
+    handle = ServerHandle(
+        StdioServerParameters(command=command, args=[script_path], env=os.environ.copy()),
+        os.path.basename(script_path)
+    )
+    server_meta = await handle.start(timeout=timeout)
+    try:
+        response = await handle.session.list_tools()
+    finally:
+        await handle.stop()
+    tools = [tool_entry(tool.name, tool.description, tool.inputSchema, tool.annotations) for tool in response.tools]
+    return server_meta.serverInfo.name, tools
@@ -0,0 +1,153 @@
+import hashlib
+import json
+import logging
+from types import MappingProxyType
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Tuple
+
+from google.genai import types
+from mcp.types import ToolAnnotations
+
+from utils.schema_validation import ArgumentValidator
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def schema_hash(description: Optional[str], parameters: Dict[str, Any]) -> str:
+    payload = json.dumps({"description": description or "", "parameters": parameters}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+class RegisteredTool:
+    """One tool of a connected server, with its Gemini declaration built once."""
+
+    __slots__ = ("name", "server", "description", "parameters", "annotations", "declaration", "schema_hash",
+                 "validator")
+
+    def __init__(self, name: str, server: str, description: Optional[str], parameters: Dict[str, Any],
+                 annotations: Optional[ToolAnnotations] = None):
+        self.name = name
+        self.server = server
+        self.description = description
+        self.parameters = parameters
+        self.annotations = annotations
+        self.declaration = types.FunctionDeclaration(name=name, description=description, parameters=parameters)
+        self.schema_hash = schema_hash(description, parameters)
+        self.validator = ArgumentValidator(parameters)
+
+    def validate(self, arguments: Dict[str, Any]) -> Tuple[Dict[str, Any], List[str]]:
+        """Coerces the arguments to the input schema, returning them with any errors found."""
+        return self.validator.validate(arguments)
+
+    def signature(self) -> str:
+        """A short reminder of the expected arguments, for validation errors sent to the model."""
+        required = set(self.parameters.get("required") or [])
+        arguments = [
+            f"{name}: {schema.get('type', 'any') if isinstance(schema, dict) else 'any'}{'' if name in required else '?'}"
+            for name, schema in (self.parameters.get("properties") or {}).items()
+        ]
+        return f"{self.name}({', '.join(arguments)})"
+
+    @classmethod
+    def from_mcp(cls, tool, server: str) -> "RegisteredTool":
+        parameters = {
+            k: v for k, v in tool.inputSchema.items()
+            if k not in ["additionalProperties", "$schema"]
+        }
+        return cls(tool.name, server, tool.description, parameters, tool.annotations)
+
+
+class ToolSnapshot:
+    """
+    An immutable version of the tool catalog. Readers take `registry.snapshot`
+    once and see a consistent set of tools for the whole query, whatever is
+    swapped in meanwhile.
+    """
+
+    def __init__(self, version: int, tools: Mapping[str, RegisteredTool]):
+        self.version = version
+        self.tools: Mapping[str, RegisteredTool] = MappingProxyType(dict(tools))
+        by_server: Dict[str, List[str]] = {}
+        for tool in self.tools.values():
+            by_server.setdefault(tool.server, []).append(tool.name)
+        self.by_server: Mapping[str, Tuple[str, ...]] = MappingProxyType(
+            {server: tuple(names) for server, names in by_server.items()}
+        )
+        self._all_tool: Optional[types.Tool] = None
+
+    def get(self, name: str) -> Optional[RegisteredTool]:
+        return self.tools.get(name)
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.tools
+
+    def __len__(self) -> int:
+        return len(self.tools)
+
+    def gemini_tool(self, names: Optional[Iterable[str]] = None) -> Optional[types.Tool]:
+        """One Tool declaring the given functions (all of them by default), or None if there are none."""
+        if names is None:
+            if self._all_tool is None and self.tools:
+                self._all_tool = types.Tool(function_declarations=[tool.declaration for tool in self.tools.values()])
+            return self._all_tool
+        declarations = [self.tools[name].declaration for name in names if name in self.tools]
+        return types.Tool(function_declarations=declarations) if declarations else None
+
+
+class ToolDiff:
+    def __init__(self, added: List[str], removed: List[str], changed: List[str]):
+        self.added = added
+        self.removed = removed
+        self.changed = changed
+
+    def __bool__(self):
+        return bool(self.added or self.removed or self.changed)
+
+    def __repr__(self):
+        return f"ToolDiff(added={self.added}, removed={self.removed}, changed={self.changed})"
+
+
+class ToolRegistry:
+    """
+    The versioned tool catalog. Every change builds a new `ToolSnapshot` and swaps
+    it in with a single assignment, so readers never see a half-updated catalog
+    and a server that reconnects replaces its tools instead of duplicating them.
+    """
+
+    def __init__(self):
+        self.snapshot = ToolSnapshot(0, {})
+
+    def _swap(self, tools: Dict[str, RegisteredTool]) -> ToolDiff:
+        old = self.snapshot.tools
+        diff = ToolDiff(
+            added=[name for name in tools if name not in old],
+            removed=[name for name in old if name not in tools],
+            changed=[name for name, tool in tools.items()
+                     if name in old and (old[name].schema_hash != tool.schema_hash or old[name].server != tool.server)]
+        )
+        if diff:
+            self.snapshot = ToolSnapshot(self.snapshot.version + 1, tools)
+            logger.info(f"Tool registry v{self.snapshot.version}: {len(tools)} tools, {diff}")
+        return diff
+
+    def replace_server(self, server: str, tools: Iterable[RegisteredTool]) -> ToolDiff:
+        """Sets the tools of one server, replacing whatever it registered before."""
+        updated = {name: tool for name, tool in self.snapshot.tools.items() if tool.server != server}
+        for tool in tools:
+            owner = updated.get(tool.name)
+            if owner is not None and owner.server != server:
+                logger.warning(f"Tool {tool.name} of {server} shadows the one registered by {owner.server}")
+            updated[tool.name] = tool
+        return self._swap(updated)
+
+    def remove_servers(self, servers: Iterable[str]) -> ToolDiff:
+        servers = set(servers)
+        return self._swap({name: tool for name, tool in self.snapshot.tools.items() if tool.server not in servers})
+
+    def stats(self):
+        snapshot = self.snapshot
+        return {
+            "version": snapshot.version,
+            "tools": len(snapshot),
+            "servers": {server: len(names) for server, names in snapshot.by_server.items()},
+        }
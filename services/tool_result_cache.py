@@ -0,0 +1,107 @@
+import json
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+SECRET_ARGUMENTS = {"API_KEY"}
+
+
+def _canonical(value: Any) -> Any:
+    # The model sends whole numbers as floats (5.0), which must key the same as 5.
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    if isinstance(value, dict):
+        return {key: _canonical(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_canonical(item) for item in value]
+    return value
+
+
+def tool_result_key(tool_name: str, arguments: Dict[str, Any], user_id: str) -> Tuple[str, str, str]:
+    """(user, tool, canonical JSON of the arguments without credentials)."""
+    canonical = json.dumps(
+        {name: _canonical(value) for name, value in arguments.items()
+         if name not in SECRET_ARGUMENTS and value is not None},
+        sort_keys=True, separators=(",", ":"), default=str
+    )
+    return str(user_id), tool_name, canonical
+
+
+class ToolResultEntry:
+    def __init__(self, server: str, result: str, expires_at: float, size: int):
+        self.server = server
+        self.result = result
+        self.expires_at = expires_at
+        self.size = size
+
+
+class ToolResultCache:
+    """
+    An LRU cache of read-only tool results under a byte budget.
+
+    Entries live for their server's TTL from `server_ttls`, or `default_ttl`;
+    a TTL of 0 disables caching for that server.
+    """
+
+    def __init__(self, max_bytes: int = 16 * 1024 * 1024, default_ttl: int = 60,
+                 server_ttls: Optional[Dict[str, int]] = None):
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self.server_ttls = server_ttls or {}
+        self._entries: "OrderedDict[tuple, ToolResultEntry]" = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key: tuple) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry is not None and entry.expires_at <= time.monotonic():
+            self._remove(key)
+            entry = None
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._entries.move_to_end(key)
+        return entry.result
+
+    def put(self, key: tuple, server: str, result: str):
+        ttl = self.server_ttls.get(server, self.default_ttl)
+        size = len(result) + sum(len(part) for part in key)
+        if ttl <= 0 or size > self.max_bytes:
+            return
+        self._remove(key)
+        self._entries[key] = ToolResultEntry(server, result, time.monotonic() + ttl, size)
+        self.size += size
+        while self.size > self.max_bytes:
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+
+    def invalidate(self, server: Optional[str] = None, user_id: Optional[str] = None):
+        """Drops the entries of one server (optionally only one user's), or everything."""
+        keys = [
+            key for key, entry in self._entries.items()
+            if (server is None or entry.server == server) and (user_id is None or key[0] == str(user_id))
+        ]
+        for key in keys:
+            self._remove(key)
+        self.invalidations += len(keys)
+
+    def _remove(self, key: tuple):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.size -= entry.size
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self.size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
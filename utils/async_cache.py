@@ -0,0 +1,90 @@
+import asyncio
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional
+
+
+class AsyncTTLCache:
+    """
+    A bounded in-memory cache for async lookups.
+
+    Entries expire `ttl` seconds after they were loaded, or `negative_ttl` seconds
+    when the loader returned None, and the least recently used entry is evicted
+    once more than `max_size` are held. Concurrent misses on the same key share a
+    single in-flight load instead of each calling the loader, and a load that
+    races with `invalidate` is not stored. The shared load runs in a task of its
+    own, so a caller that is cancelled does not cancel it for the others.
+    """
+
+    def __init__(self, ttl: float, max_size: int = 1024, negative_ttl: Optional[float] = None):
+        self.ttl = ttl
+        self.negative_ttl = ttl if negative_ttl is None else negative_ttl
+        self.max_size = max_size
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self._epoch = 0
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+
+    async def get(self, key: Hashable, loader: Callable[[], Awaitable[Any]]) -> Any:
+        entry = self._entries.get(key)
+        if entry is not None:
+            value, expires_at = entry
+            if expires_at > time.monotonic():
+                self.hits += 1
+                self._entries.move_to_end(key)
+                return value
+            del self._entries[key]
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self.coalesced += 1
+            return await asyncio.shield(inflight)
+
+        self.misses += 1
+        load = asyncio.ensure_future(self._load(key, loader, self._epoch))
+        # Marks the exception retrieved in case every caller was cancelled meanwhile.
+        load.add_done_callback(lambda task: task.cancelled() or task.exception())
+        self._inflight[key] = load
+        return await asyncio.shield(load)
+
+    async def _load(self, key: Hashable, loader: Callable[[], Awaitable[Any]], epoch: int) -> Any:
+        try:
+            value = await loader()
+        finally:
+            self._inflight.pop(key, None)
+        if epoch == self._epoch:
+            self._store(key, value)
+        return value
+
+    def _store(self, key: Hashable, value: Any):
+        ttl = self.ttl if value is not None else self.negative_ttl
+        if ttl <= 0:
+            return
+        self._entries[key] = (value, time.monotonic() + ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def invalidate(self, key: Hashable = None):
+        """Drops one key, or every entry when no key is given."""
+        self._epoch += 1
+        if key is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(key, None)
+
+    def stats(self):
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            "entries": len(self._entries),
+            "negative_entries": sum(1 for value, _ in self._entries.values() if value is None),
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "evictions": self.evictions,
+            "hit_rate": (self.hits + self.coalesced) / lookups if lookups else 0.0,
+        }
@@ -0,0 +1,136 @@
+import ast
+import json
+import re
+from typing import Any
+
+BASE64_MIN_LENGTH = 256
+_BASE64_RE = re.compile(r"^(data:[\w/+.-]+;base64,)?[A-Za-z0-9+/\s]+={0,2}$")
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count for budgeting, about four characters per token."""
+    return len(text) // 4 + 1
+
+
+def _parse(text: str) -> Any:
+    try:
+        return json.loads(text)
+    except (TypeError, ValueError):
+        pass
+    if text[:1] in "[{":
+        try:
+            return ast.literal_eval(text)
+        except (ValueError, SyntaxError, MemoryError, RecursionError):
+            pass
+    return None
+
+
+def _is_blob(value: str) -> bool:
+    return len(value) >= BASE64_MIN_LENGTH and " " not in value[:BASE64_MIN_LENGTH] and bool(_BASE64_RE.match(value))
+
+
+def _prune(value: Any) -> Any:
+    """Drops nulls and empty containers and replaces base64 blobs with a short marker."""
+    if isinstance(value, dict):
+        pruned = {key: _prune(item) for key, item in value.items()}
+        return {key: item for key, item in pruned.items() if item not in (None, "", [], {})}
+    if isinstance(value, list):
+        pruned = [_prune(item) for item in value]
+        return [item for item in pruned if item not in (None, "", [], {})]
+    if isinstance(value, str) and _is_blob(value):
+        return f"<base64 omitted, {len(value)} chars>"
+    return value
+
+
+def _tabulate(value: Any) -> Any:
+    """Turns arrays of objects sharing most of their keys into {"columns": [...], "rows": [[...]]}."""
+    if isinstance(value, dict):
+        return {key: _tabulate(item) for key, item in value.items()}
+    if not isinstance(value, list):
+        return value
+    items = [_tabulate(item) for item in value]
+    if len(items) < 2 or not all(isinstance(item, dict) for item in items):
+        return items
+    columns = []
+    for item in items:
+        columns += [key for key in item if key not in columns]
+    shared = sum(len(item) for item in items) / (len(items) * len(columns))
+    if shared < 0.5:
+        return items
+    return {"columns": columns, "rows": [[item.get(column) for column in columns] for item in items]}
+
+
+def _dumps(value: Any) -> str:
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False, default=str)
+
+
+def _is_table(value: Any) -> bool:
+    return isinstance(value, dict) and value.keys() == {"columns", "rows"} and isinstance(value["rows"], list)
+
+
+def _longest_list(value: Any, longest=None):
+    """
+    The longest array that can be shortened. Of a table only the list of rows
+    can be: cutting its columns or a single row would put values under the
+    wrong headers.
+    """
+    if _is_table(value):
+        rows = value["rows"]
+        if longest is None or len(rows) > len(longest):
+            longest = rows
+        for row in rows:
+            if isinstance(row, list):
+                for cell in row:
+                    longest = _longest_list(cell, longest)
+        return longest
+    if isinstance(value, dict):
+        for item in value.values():
+            longest = _longest_list(item, longest)
+    elif isinstance(value, list):
+        if longest is None or len(value) > len(longest):
+            longest = value
+        for item in value:
+            longest = _longest_list(item, longest)
+    return longest
+
+
+def _fit(value: Any, max_tokens: int) -> str:
+    """Halves the longest array until the result fits, noting how many items were dropped."""
+    text = _dumps(value)
+    while estimate_tokens(text) > max_tokens:
+        longest = _longest_list(value)
+        if longest is None:
+            break
+        marked = isinstance(longest[-1], str) and longest[-1].startswith("<truncated ")
+        items = len(longest) - 1 if marked else len(longest)
+        if items <= 2:
+            break
+        already_dropped = int(re.search(r"\d+", longest[-1]).group()) if marked else 0
+        keep = items // 2
+        del longest[keep:]
+        longest.append(f"<truncated {already_dropped + items - keep} more items>")
+        text = _dumps(value)
+    return text
+
+
+def compact_tool_result(text: str, max_tokens: int = 4000) -> str:
+    """
+    Shrinks a tool result before it is sent back to the model.
+
+    JSON (or Python literal) results have nulls, empty fields and base64 blobs
+    stripped, arrays of similar objects converted to column/row tables, and their
+    longest arrays trimmed until the result fits `max_tokens`. Anything still over
+    budget is cut off with a note saying how much was left out.
+    """
+    if not text:
+        return text
+    parsed = _parse(text)
+    if isinstance(parsed, (dict, list)):
+        text = _fit(_tabulate(_prune(parsed)), max_tokens)
+    elif isinstance(text, str) and _is_blob(text.strip()):
+        return f"<base64 omitted, {len(text)} chars>"
+
+    if estimate_tokens(text) > max_tokens:
+        limit = max_tokens * 4
+        text = f"{text[:limit]}\n[truncated: {len(text) - limit} of {len(text)} characters omitted to fit the token budget]"
+    return text
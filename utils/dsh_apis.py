@@ -1,19 +1,124 @@
+import asyncio
+import logging
 import os
-import requests
+from typing import Any, Dict, Optional
+
+import aiohttp
 from dotenv import load_dotenv
 from schemas.dsh import ApiDetails
+from utils.async_cache import AsyncTTLCache
 load_dotenv()
 
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
 ADMIN_API_URL = os.environ.get("ADMIN_API_URL")
-def get_api_details(versioned_content_id: str, digital_content_id: str):
+DSH_POOL_SIZE = int(os.environ.get("DSH_POOL_SIZE", "32"))
+DSH_CONNECT_TIMEOUT = float(os.environ.get("DSH_CONNECT_TIMEOUT", "3"))
+DSH_REQUEST_TIMEOUT = float(os.environ.get("DSH_REQUEST_TIMEOUT", "10"))
+DSH_MAX_RETRIES = int(os.environ.get("DSH_MAX_RETRIES", "2"))
+RETRY_STATUSES = {429, 502, 503, 504}
+API_DETAILS_CACHE_TTL = float(os.environ.get("API_DETAILS_CACHE_TTL", "600"))
+API_DETAILS_CACHE_MAX_SIZE = int(os.environ.get("API_DETAILS_CACHE_MAX_SIZE", "1024"))
+CREDENTIALS_CACHE_TTL = float(os.environ.get("CREDENTIALS_CACHE_TTL", "300"))
+CREDENTIALS_NEGATIVE_TTL = float(os.environ.get("CREDENTIALS_NEGATIVE_TTL", "30"))
+CREDENTIALS_CACHE_MAX_SIZE = int(os.environ.get("CREDENTIALS_CACHE_MAX_SIZE", "4096"))
+CREDENTIALS_PREFETCH_CONCURRENCY = int(os.environ.get("CREDENTIALS_PREFETCH_CONCURRENCY", "8"))
+
+
+class DSHAdminClient:
+    """
+    A shared, non-blocking client for the DSH admin API.
+
+    One aiohttp session with a keep-alive connection pool is reused by every
+    request. Each request has connect and total timeouts, and connection errors,
+    timeouts and 429/502/503/504 responses are retried with exponential backoff.
+    """
+
+    def __init__(self, base_url: Optional[str] = ADMIN_API_URL, pool_size: int = DSH_POOL_SIZE,
+                 connect_timeout: float = DSH_CONNECT_TIMEOUT, request_timeout: float = DSH_REQUEST_TIMEOUT,
+                 max_retries: int = DSH_MAX_RETRIES, backoff: float = 0.2):
+        self.base_url = base_url
+        self.pool_size = pool_size
+        self.timeout = aiohttp.ClientTimeout(total=request_timeout, connect=connect_timeout)
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self._session: Optional[aiohttp.ClientSession] = None
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        # Created lazily so the session binds to the running event loop.
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self.pool_size, keepalive_timeout=60, ttl_dns_cache=300)
+            self._session = aiohttp.ClientSession(connector=connector, timeout=self.timeout)
+        return self._session
+
+    async def request(self, method: str, url: str, **kwargs) -> Dict[str, Any]:
+        if url.startswith("/"):
+            url = f"{self.base_url}{url}"
+        if "headers" in kwargs:
+            # Like requests, leave out headers whose value is unset (e.g. a missing API key env var).
+            kwargs["headers"] = {name: value for name, value in kwargs["headers"].items() if value is not None}
+        for attempt in range(self.max_retries + 1):
+            try:
+                async with self._get_session().request(method, url, **kwargs) as response:
+                    if response.status in RETRY_STATUSES and attempt < self.max_retries:
+                        logger.warning(f"DSH admin API returned {response.status} for {url}, retrying")
+                    else:
+                        return await response.json(content_type=None)
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                if attempt >= self.max_retries:
+                    raise
+                logger.warning(f"DSH admin API request to {url} failed ({e!r}), retrying")
+            await asyncio.sleep(self.backoff * 2 ** attempt)
+
+    async def fetch_credentials(self, email_id: str, versioned_content_id: str, apikey: str,
+                                url: str = "/api/v1/digital-content/apis/fetch-credentials") -> Optional[str]:
+        """Returns the client ID of the user's subscription to the API, or None if they are not subscribed."""
+        headers = {
+            "accept": "application/json, text/plain, */*",
+            "apikey": apikey,
+            "content-type": "application/json"
+        }
+        data = {
+            "emailId": email_id,
+            "apiVersionedContentId": versioned_content_id
+        }
+        response_json = await self.request("POST", url, headers=headers, json=data)
+        if response_json.get('data') is None:
+            return None
+        return response_json.get('data', {}).get('productCredentials', [])[0].get('clientId', None)
+
+    async def close(self):
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+
+dsh_client = DSHAdminClient()
+api_details_cache = AsyncTTLCache(ttl=API_DETAILS_CACHE_TTL, max_size=API_DETAILS_CACHE_MAX_SIZE)
+# Keyed by (email, versioned_content_id). "Not subscribed" is cached for the shorter
+# negative TTL so a user who subscribes mid-session is picked up quickly.
+credentials_cache = AsyncTTLCache(
+    ttl=CREDENTIALS_CACHE_TTL, max_size=CREDENTIALS_CACHE_MAX_SIZE, negative_ttl=CREDENTIALS_NEGATIVE_TTL
+)
+
+
+async def get_api_details(versioned_content_id: str, digital_content_id: str):
+    """Returns the API details, served from `api_details_cache` while they are fresh."""
+    return await api_details_cache.get(
+        (versioned_content_id, digital_content_id),
+        lambda: fetch_api_details(versioned_content_id, digital_content_id)
+    )
+
+
+async def fetch_api_details(versioned_content_id: str, digital_content_id: str):
     """"""
 
-    url = f"{ADMIN_API_URL}/api/v1/digital-content/detail?digitalContentId={digital_content_id}&versionedContentId={versioned_content_id}"
+    url = f"/api/v1/digital-content/detail?digitalContentId={digital_content_id}&versionedContentId={versioned_content_id}"
     apikey =os.environ.get("DIGITAL_CONTENT_API_KEY")
     headers = {"Content-Type": "application/json", "apikey": apikey}
 
-    api_response = requests.get(url, headers=headers)
-    digital_content_details = api_response.json()
+    digital_content_details = await dsh_client.request("GET", url, headers=headers)
 
     if digital_content_details.get('data') is None:
         api_name = None
@@ -33,30 +138,45 @@ def get_api_details(versioned_content_id: str, digital_content_id: str):
     return api_details
 # ApiDetails()
 
-def get_user_subscription_details(user_id: str, versioned_content_id: str):
+async def get_user_subscription_details(user_id: str, versioned_content_id: str):
+    """Returns the user's client ID for the API, served from `credentials_cache` while fresh."""
+    return await credentials_cache.get(
+        (user_id, versioned_content_id),
+        lambda: fetch_user_subscription_details(user_id, versioned_content_id)
+    )
+
+
+async def fetch_user_subscription_details(user_id: str, versioned_content_id: str):
     """"""
     FETCH_CRED_API_KEY = os.environ.get("DIGITAL_CONTENT_API_KEY")
-    url = f"{ADMIN_API_URL}/api/v1/digital-content/apis/fetch-credentials"
-    headers = {
-        "accept": "application/json, text/plain, */*",
-        "apikey": FETCH_CRED_API_KEY,
-        "content-type": "application/json"
-    }
-    data = {
-        "emailId": user_id,
-        "apiVersionedContentId": versioned_content_id
-    }
-    response = requests.post(url, headers=headers, json=data)
-    response_json = response.json()
-    # print(response_json)
-    if response_json.get('data') is None:
-        return None
-    api_key = response_json.get('data', {}).get('productCredentials', [])[0].get('clientId', None)
+    api_key = await dsh_client.fetch_credentials(
+        email_id=user_id,
+        versioned_content_id=versioned_content_id,
+        apikey=FETCH_CRED_API_KEY
+    )
+    logger.debug(f"Fetched credentials for {user_id} on {versioned_content_id}: subscribed={api_key is not None}")
     return api_key
 
 
+async def prefetch_user_subscriptions(user_id: str, versioned_content_ids, concurrency: int = CREDENTIALS_PREFETCH_CONCURRENCY):
+    """
+    Warms `credentials_cache` for every API the user may call. The admin API has
+    no bulk endpoint, so the lookups are fanned out with bounded concurrency.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def prefetch(versioned_content_id):
+        async with semaphore:
+            return await get_user_subscription_details(user_id, versioned_content_id)
+
+    results = await asyncio.gather(*(prefetch(vcid) for vcid in versioned_content_ids), return_exceptions=True)
+    subscribed = sum(1 for result in results if result is not None and not isinstance(result, BaseException))
+    failed = sum(1 for result in results if isinstance(result, BaseException))
+    logger.info(f"Prefetched credentials for {user_id}: {subscribed}/{len(results)} subscribed, {failed} failed")
+
+
 # get_api_details(digital_content_id="67ee58c548930c2ef15bedb8", versioned_content_id="67ee58c548930c2ef15bedb9")
 # api_key = get_user_subscription_details(user_id="mansoor.b@digitalapicraft.com", versioned_content_id="67ee58c548930c2ef15bedb9")
 # print(api_key)
 #
-# get_api_details(digital_content_id="681dcc59df8c3b27225caf4c", versioned_content_id="681dcc58df8c3b27225caf4b")
\ No newline at end of file
+# get_api_details(digital_content_id="681dcc59df8c3b27225caf4c", versioned_content_id="681dcc58df8c3b27225caf4b")
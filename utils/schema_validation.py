@@ -0,0 +1,227 @@
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# A compiled check: takes a value and its path, returns the (possibly coerced)
+# value and appends any problems to `errors`.
+Check = Callable[[Any, str, List[str]], Any]
+
+# Type-list alternatives are tried in this order. One that accepts the value as is
+# always wins (see `_first_match`), so the order only decides between conversions.
+_TYPE_ORDER = ["null", "string", "boolean", "integer", "number", "array", "object"]
+_TRUE = {"true", "1", "yes"}
+_FALSE = {"false", "0", "no"}
+
+
+def _describe(value: Any) -> str:
+    text = repr(value)
+    return text if len(text) <= 40 else text[:37] + "..."
+
+
+def _check_integer(value, path, errors):
+    if isinstance(value, bool):
+        errors.append(f"{path}: expected integer, got boolean")
+        return value
+    if isinstance(value, int):
+        return value
+    # The model sends whole numbers as floats (5.0) and sometimes as strings.
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    if isinstance(value, str):
+        try:
+            return int(value.strip())
+        except ValueError:
+            try:
+                number = float(value)
+                if number.is_integer():
+                    return int(number)
+            except ValueError:
+                pass
+    errors.append(f"{path}: expected integer, got {_describe(value)}")
+    return value
+
+
+def _check_number(value, path, errors):
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return value
+    if isinstance(value, str):
+        try:
+            return float(value.strip())
+        except ValueError:
+            pass
+    errors.append(f"{path}: expected number, got {_describe(value)}")
+    return value
+
+
+def _check_boolean(value, path, errors):
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, str) and value.strip().lower() in _TRUE | _FALSE:
+        return value.strip().lower() in _TRUE
+    if isinstance(value, (int, float)) and value in (0, 1):
+        return bool(value)
+    errors.append(f"{path}: expected boolean, got {_describe(value)}")
+    return value
+
+
+def _check_string(value, path, errors):
+    if isinstance(value, str):
+        return value
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return str(int(value)) if isinstance(value, float) and value.is_integer() else str(value)
+    errors.append(f"{path}: expected string, got {_describe(value)}")
+    return value
+
+
+def _check_null(value, path, errors):
+    if value is not None:
+        errors.append(f"{path}: expected null, got {_describe(value)}")
+    return value
+
+
+def _compile_array(schema: Dict[str, Any]) -> Check:
+    item_check = compile_schema(schema["items"]) if isinstance(schema.get("items"), dict) else None
+    min_items = schema.get("minItems")
+    max_items = schema.get("maxItems")
+
+    def check(value, path, errors):
+        if isinstance(value, tuple):
+            value = list(value)
+        if not isinstance(value, list):
+            errors.append(f"{path}: expected array, got {_describe(value)}")
+            return value
+        if min_items is not None and len(value) < min_items:
+            errors.append(f"{path}: expected at least {min_items} items, got {len(value)}")
+        if max_items is not None and len(value) > max_items:
+            errors.append(f"{path}: expected at most {max_items} items, got {len(value)}")
+        if item_check is None:
+            return value
+        return [item_check(item, f"{path}[{index}]", errors) for index, item in enumerate(value)]
+
+    return check
+
+
+def _compile_object(schema: Dict[str, Any]) -> Check:
+    properties = {name: compile_schema(sub) for name, sub in (schema.get("properties") or {}).items()}
+    required = list(schema.get("required") or [])
+
+    def check(value, path, errors):
+        if not isinstance(value, dict):
+            errors.append(f"{path}: expected object, got {_describe(value)}")
+            return value
+        result = dict(value)
+        for name in required:
+            if name not in result:
+                errors.append(f"{_join(path, name)}: required argument is missing")
+        for name, property_check in properties.items():
+            if name in result:
+                result[name] = property_check(result[name], _join(path, name), errors)
+        return result
+
+    return check
+
+
+def _join(path: str, name: str) -> str:
+    return f"{path}.{name}" if path else name
+
+
+_SCALAR_CHECKS = {
+    "integer": _check_integer,
+    "number": _check_number,
+    "boolean": _check_boolean,
+    "string": _check_string,
+    "null": _check_null,
+}
+
+
+def _compile_type(type_name: str, schema: Dict[str, Any]) -> Check:
+    if type_name == "object":
+        return _compile_object(schema)
+    if type_name == "array":
+        return _compile_array(schema)
+    return _SCALAR_CHECKS.get(type_name, lambda value, path, errors: value)
+
+
+def _unchanged(value: Any, coerced: Any) -> bool:
+    """Whether a check passed the value through as is, down to the types of nested items."""
+    if type(value) is not type(coerced):
+        return False
+    if isinstance(value, dict):
+        return value.keys() == coerced.keys() and all(_unchanged(value[key], coerced[key]) for key in value)
+    if isinstance(value, list):
+        return len(value) == len(coerced) and all(map(_unchanged, value, coerced))
+    return value == coerced
+
+
+def _first_match(checks: List[Check], expected: str) -> Check:
+    """
+    Accepts the value as the first alternative that takes it without conversion,
+    e.g. 5 stays an integer for ["integer", "string"] and anyOf [string, integer].
+    Only if none does is it converted by the first alternative that can.
+    """
+    def check(value, path, errors):
+        converted = None
+        for alternative in checks:
+            alternative_errors = []
+            coerced = alternative(value, path, alternative_errors)
+            if alternative_errors:
+                continue
+            if _unchanged(value, coerced):
+                return coerced
+            if converted is None:
+                converted = (coerced,)
+        if converted is not None:
+            return converted[0]
+        errors.append(f"{path}: expected {expected}, got {_describe(value)}")
+        return value
+
+    return check
+
+
+def compile_schema(schema: Optional[Dict[str, Any]]) -> Check:
+    """
+    Compiles a JSON schema into a check function once, so validating a call is
+    only a walk over the arguments. Supports the subset tool schemas use: type
+    (including lists), properties, required, items, enum, anyOf/oneOf and
+    min/maxItems. Anything else, such as $ref, is accepted as is.
+    """
+    if not isinstance(schema, dict):
+        return lambda value, path, errors: value
+
+    alternatives = schema.get("anyOf") or schema.get("oneOf")
+    if alternatives:
+        expected = " or ".join(sub.get("type", "any") for sub in alternatives if isinstance(sub, dict))
+        check = _first_match([compile_schema(sub) for sub in alternatives], expected)
+    elif isinstance(schema.get("type"), list):
+        types = sorted(
+            (type_name for type_name in schema["type"] if type_name in _TYPE_ORDER), key=_TYPE_ORDER.index
+        )
+        check = _first_match([_compile_type(type_name, schema) for type_name in types], " or ".join(types))
+    elif "type" in schema:
+        check = _compile_type(schema["type"], schema)
+    elif "properties" in schema:
+        check = _compile_object(schema)
+    else:
+        check = lambda value, path, errors: value
+
+    enum = schema.get("enum")
+    if enum is None:
+        return check
+
+    def check_enum(value, path, errors):
+        value = check(value, path, errors)
+        if value not in enum:
+            errors.append(f"{path}: must be one of {enum}, got {_describe(value)}")
+        return value
+
+    return check_enum
+
+
+class ArgumentValidator:
+    """Validates and coerces one tool's arguments against its compiled input schema."""
+
+    def __init__(self, schema: Optional[Dict[str, Any]]):
+        self._check = compile_schema(schema if schema else {"type": "object"})
+
+    def validate(self, arguments: Dict[str, Any]) -> Tuple[Dict[str, Any], List[str]]:
+        errors: List[str] = []
+        coerced = self._check(arguments, "", errors)
+        return coerced, errors
@@ -9,24 +9,17 @@ class DigitalContent:
 #     pass
 
 
-from google.cloud import logging
+from services.audit import audit_pipeline, audit_record
 
 # Generic Logging function
-from datetime import datetime
 def auditing_logs(versioned_content_id, tool_name, tool_args,api_name,user_id,
                      severity="INFO", error="NA" ):
-
-    log_client = logging.Client()
-    logger = log_client.logger('DSH_ASSISTANT')
-    log_text = "AUDIT LOG"
-    tool_args.pop('API_KEY')
-    logger.log_text(log_text, severity=severity,
-                    labels={
-                        "api_versioned_contentid": versioned_content_id,
-                        "user_id": str(user_id),
-                        "tool_name": str(tool_name),
-                        "tool_args": str(tool_args),
-                        "api_name":str(api_name),
-                        "time_stamp": str(datetime.now())
-                    }
-                    )
+    """Queues an audit record; `audit_pipeline` writes it to Cloud Logging in the background."""
+    audit_pipeline.log(audit_record(
+        versioned_content_id=versioned_content_id,
+        tool_name=tool_name,
+        tool_args=tool_args,
+        api_name=api_name,
+        user_id=user_id,
+        severity=severity
+    ))